@@ -0,0 +1,32 @@
+#!/bin/sh
+# Start the API in the mode selected by DJANGO_SERVER:
+#   runserver - Django development server (default)
+#   wsgi      - gunicorn with threaded workers on realestate.wsgi
+#   asgi      - gunicorn with uvicorn workers on realestate.asgi; also serves
+#               the live property changes WebSocket (/api/ws/properties/)
+# Worker counts, threads and timeouts are read by gunicorn.conf.py.
+set -e
+
+if [ "${DJANGO_SERVER:-runserver}" != runserver ]; then
+    # The shared property response cache defaults to the database backend
+    # (see CACHES in realestate/settings.py); this is a no-op for the others.
+    python manage.py createcachetable
+fi
+
+case "${DJANGO_SERVER:-runserver}" in
+    wsgi)
+        exec gunicorn -c gunicorn.conf.py realestate.wsgi:application
+        ;;
+    asgi)
+        exec gunicorn -c gunicorn.conf.py \
+            --worker-class "${GUNICORN_WORKER_CLASS:-uvicorn.workers.UvicornWorker}" \
+            realestate.asgi:application
+        ;;
+    runserver)
+        exec python manage.py runserver 0.0.0.0:8000
+        ;;
+    *)
+        echo "Unknown DJANGO_SERVER '${DJANGO_SERVER}' (expected runserver, wsgi or asgi)" >&2
+        exit 1
+        ;;
+esac
@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration for the production API server.
+
+Everything is driven by environment variables so the same image can be
+tuned per host:
+
+    GUNICORN_BIND             address to listen on (default 0.0.0.0:8000)
+    GUNICORN_WORKERS          worker processes (default 2 * CPUs + 1)
+    GUNICORN_THREADS          threads per worker for the gthread worker (default 4)
+    GUNICORN_WORKER_CLASS     gthread (WSGI, default) or
+                              uvicorn.workers.UvicornWorker (ASGI)
+    GUNICORN_TIMEOUT          seconds before a stuck request's worker is killed (default 30)
+    GUNICORN_GRACEFUL_TIMEOUT seconds workers get to finish in-flight requests
+                              on reload/shutdown (default 30)
+    GUNICORN_KEEPALIVE        keep-alive seconds behind nginx (default 5)
+    GUNICORN_MAX_REQUESTS     recycle a worker after this many requests, 0 disables (default 2000)
+
+Send SIGHUP to the master process for a graceful reload: new workers are
+started with the new code and old ones drain their in-flight requests.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+# Spread worker recycling so they do not all restart at once.
+max_requests_jitter = max_requests // 10
+
+# The application is deliberately not preloaded in the master (preload_app):
+# each worker imports it, so the SIGHUP reload above picks up new code.
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+forwarded_allow_ips = '*'
@@ -0,0 +1,78 @@
+"""
+Agents directory (/api/agents/).
+
+Every agent is listed with the number of listings they are assigned, the
+price range of those listings and the newest few of them. A page of
+agents costs two queries, however many listings the agents have:
+- the agents, annotated with Count/Min/Max over the Agent.properties link
+  table in one GROUP BY (see AgentProperty for its indexes);
+- the newest TOP_LISTINGS listings of every agent on the page, ranked per
+  agent with ROW_NUMBER() over the link table.
+
+The listing filters (?type=, ?price_min=, ?location=, ... as for
+/api/properties/) narrow the directory to agents with matching listings,
+and the counts, price ranges and top listings then cover those listings
+only. ?name= matches the agent's name or email.
+"""
+from django.db.models import Count, F, Max, Min, Q
+from django.db.models.functions import RowNumber
+from django.db.models.expressions import Window
+from django_filters.utils import translate_validation
+from .filters import PropertyFilter
+from .models import AgentProperty, Property
+
+TOP_LISTINGS = 3
+
+
+def listing_filter(request):
+    """The properties matching the request's listing filters, or None if there are none."""
+    params = {name for name, values in request.query_params.lists() if any(values)}
+    if not params & set(PropertyFilter.base_filters):
+        return None
+    filterset = PropertyFilter(request.query_params, queryset=Property.objects.all(), request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs.order_by()
+
+
+def directory(queryset, request):
+    """`queryset` of agents filtered and annotated with their listing stats."""
+    name = request.query_params.get('name', '').strip()
+    if name:
+        queryset = queryset.filter(Q(name__icontains=name) | Q(email__icontains=name))
+    listings = listing_filter(request)
+    if listings is not None:
+        # Filtering before annotating makes the aggregates use the same
+        # (filtered) join instead of adding a second one.
+        queryset = queryset.filter(properties__in=listings.values('pk'))
+    return queryset.annotate(
+        listing_count=Count('properties'),
+        price_min=Min('properties__price_value'),
+        price_max=Max('properties__price_value'),
+    )
+
+
+def attach_top_listings(agents, request):
+    """Set `top_listings` on each agent, in one query for all of them."""
+    by_id = {agent.pk: agent for agent in agents}
+    for agent in agents:
+        agent.top_listings = []
+    if not by_id:
+        return agents
+    links = AgentProperty.objects.filter(agent_id__in=by_id)
+    listings = listing_filter(request)
+    if listings is not None:
+        links = links.filter(property__in=listings.values('pk'))
+    # Listing cards only need the card columns, not the long text ones.
+    links = links.select_related('property').defer(
+        'property__description', 'property__search_text', 'property__search_vector',
+    ).annotate(
+        rank=Window(
+            RowNumber(),
+            partition_by=[F('agent_id')],
+            order_by=[F('property__created_at').desc(), F('property_id').desc()],
+        ),
+    ).filter(rank__lte=TOP_LISTINGS).order_by('agent_id', 'rank')
+    for link in links:
+        by_id[link.agent_id].top_listings.append(link.property)
+    return agents
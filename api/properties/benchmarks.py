@@ -0,0 +1,336 @@
+"""
+API benchmark scenarios for `manage.py benchmark`.
+
+Every scenario is a rotation of requests against one endpoint (listing
+filters and pages, detail, map, favorites, gallery updates, login,
+registration). It is run either in process through Django's test client or
+over HTTP against a running server. The in-process client also counts the
+SQL queries of every request.
+
+Runs are meant to be compared with each other, so they are as repeatable
+as possible:
+- the data comes from properties.generator;
+- the requests rotate over fixed samples of that data;
+- write scenarios undo themselves (a favorite is added then removed, a
+  gallery alternates between two versions);
+- in process, the whole run is rolled back.
+
+A result can be saved as a baseline; later runs are compared with it to
+flag more queries, or slower responses beyond a tolerance.
+
+run_login_load measures something else: listing latency while other
+clients log in back to back, i.e. how much a login burst (password
+hashing) slows down browsing on the same server.
+"""
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from . import generator
+from .models import Property
+
+# Viewport around greater Tunis: many points, several clusters.
+MAP_BBOX = '9.9,36.6,10.5,37.0'
+LIST_FILTERS = [
+    '?type=Appartement',
+    '?type=Villa&price_min=500000&price_max=2000000',
+    '?rooms_min=3&baths_min=2&ordering=price_value',
+    '?location=sousse',
+    '?search=piscine',
+    '?type=Maison&type=Villa&ordering=-price_value',
+]
+LIST_PAGES = 10
+SAMPLE_SIZE = 50
+# Seconds a refused login waits before retrying (the views send Retry-After: 1).
+LOGIN_RETRY_AFTER = 1.0
+
+
+@contextmanager
+def uncached_responses():
+    """Point the property response cache at a dummy backend, so every request renders."""
+    caches = {**settings.CACHES, 'benchmark': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    with override_settings(CACHES=caches, PROPERTY_CACHE_ALIAS='benchmark'):
+        yield
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+# Transports
+
+class ClientTransport:
+    """Requests through Django's test client, with per-request query counts."""
+    counts_queries = True
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        data = json.dumps(body) if body is not None else None
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.generic(method, path, data=data or '', content_type='application/json', **headers)
+        try:
+            payload = json.loads(response.content) if response.content else None
+        except ValueError:
+            payload = None
+        return response.status_code, payload, len(captured.captured_queries)
+
+
+class HttpTransport:
+    """Requests over HTTP against a running server; queries are not counted."""
+    counts_queries = False
+
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Accept': 'application/json'}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, content = e.code, e.read()
+        except (urllib.error.URLError, OSError) as e:
+            return type(e).__name__, None, None
+        try:
+            payload = json.loads(content) if content else None
+        except ValueError:
+            payload = None
+        return status, payload, None
+
+
+# Scenarios
+
+class Scenario:
+    """
+    A named rotation of requests. `build(i)` returns the i-th request as
+    (method, path, body); requests with `auth` carry the benchmark user's
+    token. `max_requests` caps slow scenarios (password hashing).
+    """
+
+    def __init__(self, name, build, auth=False, max_requests=None, expect=(200,)):
+        self.name = name
+        self.build = build
+        self.auth = auth
+        self.max_requests = max_requests
+        self.expect = expect
+
+
+def build_scenarios(context):
+    ids = context['property_ids']
+    pages = context['list_pages']
+    run = context['run_id']
+
+    def favorite(i):
+        # Add on even requests, remove on odd ones: the data ends as it started.
+        return ('POST' if i % 2 == 0 else 'DELETE', f'/api/properties/{ids[i // 2 % len(ids)]}/favorite/', None)
+
+    def gallery(i):
+        property_id = ids[i // 2 % len(ids)]
+        urls = [generator.IMAGE_URL.format(number=f'benchmark-{property_id}', index=index) for index in range(4)]
+        # Alternate between two orders of the same images.
+        return 'POST', f'/api/properties/{property_id}/update_images/', {'images': urls if i % 2 == 0 else urls[::-1]}
+
+    def register(i):
+        name = f'bench-{run}-{i}'
+        return 'POST', '/api/auth/register/', {
+            'username': name, 'email': f'{name}@users.example.com', 'password': context['password'],
+        }
+
+    return [
+        Scenario('list', lambda i: ('GET', '/api/properties/', None)),
+        Scenario('list filtered', lambda i: ('GET', '/api/properties/' + LIST_FILTERS[i % len(LIST_FILTERS)], None)),
+        Scenario('list pages', lambda i: ('GET', pages[i % len(pages)], None)),
+        Scenario('detail', lambda i: ('GET', f'/api/properties/{ids[i % len(ids)]}/', None)),
+        Scenario('map points', lambda i: ('GET', f'/api/properties/map/?bbox={MAP_BBOX}', None)),
+        Scenario('map clusters', lambda i: ('GET', f'/api/properties/map/?bbox={MAP_BBOX}&zoom={8 + i % 4}', None)),
+        Scenario('facets', lambda i: ('GET', '/api/properties/facets/' + LIST_FILTERS[i % len(LIST_FILTERS)], None)),
+        Scenario('favorites', lambda i: ('GET', '/api/properties/favorites/', None), auth=True),
+        Scenario('favorite toggle', favorite, auth=True),
+        Scenario('update images', gallery),
+        Scenario('login', lambda i: ('POST', '/api/auth/login/', {
+            'username': context['username'], 'password': context['password'],
+        }), max_requests=20),
+        Scenario('register', register, max_requests=20, expect=(201,)),
+    ]
+
+
+def prepare(transport, password):
+    """
+    Untimed setup: the benchmark user, its token, a sample of property ids
+    and the cursor links of the first listing pages.
+    """
+    if not Property.objects.exists():
+        raise BenchmarkError('No properties found; generate some first (see generate_properties)')
+    generator.create_users(0, 1, password)
+    username = generator.USER_NAME.format(number=1)
+    status, payload, _ = transport.request('POST', '/api/auth/login/', {'username': username, 'password': password})
+    if status != 200:
+        raise BenchmarkError(f'Could not log in as {username} (HTTP {status}); check --password')
+
+    # Evenly spread over the table.
+    count = Property.objects.count()
+    step = max(1, count // SAMPLE_SIZE)
+    property_ids = list(Property.objects.order_by('id').values_list('id', flat=True)[::step][:SAMPLE_SIZE])
+
+    pages = ['/api/properties/']
+    while len(pages) < LIST_PAGES:
+        status, payload_page, _ = transport.request('GET', pages[-1])
+        next_link = (payload_page or {}).get('next') if status == 200 else None
+        if not next_link:
+            break
+        pages.append(next_link[next_link.index('/api/'):])
+
+    return {
+        'username': username,
+        'password': password,
+        'token': payload['token'],
+        'property_ids': property_ids,
+        'list_pages': pages,
+        'run_id': uuid.uuid4().hex[:8],
+        'properties': count,
+    }
+
+
+# Running
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+def run_scenario(transport, scenario, context, requests, concurrency=1, warmup=2):
+    """Time one scenario; returns its summary dict."""
+    requests = min(requests, scenario.max_requests or requests)
+    # Even, so paired writes (add/remove, gallery A/B) leave the data as it was.
+    requests = max(2, requests - requests % 2)
+    token = context['token'] if scenario.auth else None
+    errors = []
+    latencies = []
+    queries = []
+    lock = threading.Lock()
+
+    def send(i):
+        method, path, body = scenario.build(i)
+        started = time.perf_counter()
+        status, _, query_count = transport.request(method, path, body, token)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if query_count is not None:
+                queries.append(query_count)
+            if status not in scenario.expect:
+                errors.append(f'{method} {path}: {status}')
+
+    # Warm-up requests come from past the end of the timed ones.
+    for i in range(warmup * 2):
+        method, path, body = scenario.build(requests + i)
+        transport.request(method, path, body, token)
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        for i in range(requests):
+            send(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(send, range(requests)))
+    wall_time = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_samples': errors[:3],
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'rps': round(len(latencies) / wall_time, 1),
+        # The most frequent count: pages and filters can differ by one.
+        'queries': statistics.mode(queries) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def run_login_load(transport, scenario, context, login_clients, requests, concurrency=1):
+    """
+    Time `scenario` while `login_clients` threads log in back to back; its
+    summary gains the login rate and how many logins were refused (503)
+    or failed otherwise.
+    """
+    stop = threading.Event()
+    statuses = Counter()
+    lock = threading.Lock()
+    credentials = {'username': context['username'], 'password': context['password']}
+
+    def log_in():
+        while not stop.is_set():
+            status, _, _ = transport.request('POST', '/api/auth/login/', credentials)
+            with lock:
+                statuses[status] += 1
+            if status == 503:
+                # Back off like a client honouring Retry-After.
+                stop.wait(LOGIN_RETRY_AFTER)
+
+    threads = [threading.Thread(target=log_in, daemon=True) for _ in range(login_clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        result = run_scenario(transport, scenario, context, requests, concurrency)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    result.update({
+        'login_clients': login_clients,
+        'logins_per_s': round(statuses[200] / elapsed, 1),
+        'logins_refused': statuses[503],
+        'login_errors': sum(count for status, count in statuses.items() if status not in (200, 503)),
+    })
+    return result
+
+
+def compare(results, baseline, latency_tolerance):
+    """
+    Regressions of `results` against a saved baseline: any scenario that
+    issues more queries, or (when latency_tolerance is not None) whose p95
+    grew by more than that fraction.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        if result['errors']:
+            regressions.append(f'{name}: {result["errors"]} failed requests, e.g. {result["error_samples"][0]}')
+        if result['max_queries'] is not None and before.get('max_queries') is not None \
+                and result['max_queries'] > before['max_queries']:
+            regressions.append(f'{name}: {result["max_queries"]} queries per request, baseline {before["max_queries"]}')
+        if latency_tolerance is not None and result['p95_ms'] > before['p95_ms'] * (1 + latency_tolerance):
+            regressions.append(
+                f'{name}: p95 {result["p95_ms"]:.1f} ms, baseline {before["p95_ms"]:.1f} ms '
+                f'(+{result["p95_ms"] / before["p95_ms"] - 1:.0%}, tolerance {latency_tolerance:.0%})'
+            )
+    return regressions
@@ -0,0 +1,300 @@
+"""
+Bulk import and export of properties as CSV or JSON Lines.
+
+A row holds the Property columns in FIELDS plus its features, image URLs
+(the first one is the primary image) and the e-mail addresses of its
+agents. In CSV those three are '|'-separated; in JSON Lines they are
+lists. Export writes the same shape, so an export can be imported again.
+
+Import reads rows lazily and handles them in batches. Each row is validated
+with the model's own checks, without database queries. Slugs and agent
+e-mails are then resolved with one query per batch, and the valid rows are
+written with bulk_create inside one transaction per batch. Invalid rows are
+skipped and reported with their line number. The derived data that signals
+maintain for single saves is filled in before the insert (search
+documents) or once per batch (listing-card columns, the map cluster cells
+of the batch, cached listings).
+"""
+import codecs
+import csv
+import json
+import uuid
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.db.models.functions import Lower
+from django.utils.text import slugify
+from . import changelog, clusters, events, search
+from .cache import property_cache
+from .models import Agent, Property, PropertyFeature, PropertyImage
+
+FORMATS = ('csv', 'jsonl')
+FIELDS = [
+    'title', 'price_value', 'location', 'rooms', 'baths', 'surface', 'dimensions',
+    'sqft', 'property_type', 'description', 'lat', 'lng',
+]
+LIST_FIELDS = ['features', 'images', 'agent_emails']
+COLUMNS = FIELDS + LIST_FIELDS
+LIST_SEPARATOR = '|'
+# Fields left to their defaults (or filled in per batch, like slug) are not validated per row.
+NOT_IMPORTED = {field.name for field in Property._meta.fields} - set(FIELDS)
+DEFAULT_BATCH_SIZE = 1000
+
+
+# Reading
+
+def decode_lines(byte_lines):
+    """Text lines from an iterable of byte lines (e.g. a request or binary file)."""
+    return codecs.iterdecode(byte_lines, 'utf-8-sig')
+
+
+def read_rows(lines, file_format):
+    """Yield (line number, row dict or None, error or None) for each record."""
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        missing = [column for column in ('title', 'price_value', 'property_type')
+                   if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f'CSV header is missing required columns: {", ".join(missing)}')
+        unknown = [column for column in reader.fieldnames if column not in COLUMNS]
+        if unknown:
+            raise ValueError(f'CSV header has unknown columns: {", ".join(unknown)}')
+        for row in reader:
+            yield reader.line_num, row, None
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, {'__all__': [f'Invalid JSON: {e}']}
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, {'__all__': ['Each line must be a JSON object']}
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unsupported format {file_format!r}; use one of: {", ".join(FORMATS)}')
+
+
+# Validation
+
+def _list_value(row, name):
+    value = row.get(name)
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return [item.strip() for item in value if item.strip()]
+    raise ValidationError({name: ['Must be a list of strings']})
+
+
+def build_property(row):
+    """An unsaved, validated Property plus its related values, or ValidationError."""
+    values = {}
+    for name in FIELDS:
+        value = row.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value == '' and name not in ('title', 'property_type'):
+            value = None
+        values[name] = value
+    if None in row:
+        # csv.DictReader puts surplus values under the key None.
+        raise ValidationError({'__all__': ['Row has more values than the header']})
+    unknown = set(row) - set(COLUMNS)
+    if unknown:
+        raise ValidationError({'__all__': [f'Unknown columns: {", ".join(sorted(unknown))}']})
+
+    related = {name: _list_value(row, name) for name in LIST_FIELDS}
+    errors = {}
+    for url in related['images']:
+        if len(url) > PropertyImage._meta.get_field('image_url').max_length:
+            errors['images'] = ['Image URLs are limited to 255 characters']
+    for feature in related['features']:
+        if len(feature) > PropertyFeature._meta.get_field('feature').max_length:
+            errors['features'] = ['Features are limited to 255 characters']
+
+    property_obj = Property(**values)
+    try:
+        # Field checks and Property.clean(), without queries.
+        property_obj.full_clean(exclude=NOT_IMPORTED, validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        errors = {**e.message_dict, **errors}
+    if errors:
+        raise ValidationError(errors)
+    return property_obj, related
+
+
+def _agents_by_email(emails):
+    agents = {}
+    # The lowest id wins when several agents share an address.
+    rows = Agent.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails) \
+        .order_by('-id').values_list('id', 'email_lower')
+    for agent_id, email in rows:
+        agents[email] = agent_id
+    return agents
+
+
+def _unique_slugs(properties):
+    candidates = [slugify(p.title)[:240] or 'property' for p in properties]
+    taken = set(Property.objects.filter(slug__in=candidates).values_list('slug', flat=True))
+    for property_obj, slug in zip(properties, candidates):
+        if slug in taken:
+            slug = f'{slug}-{uuid.uuid4().hex[:8]}'
+        taken.add(slug)
+        property_obj.slug = slug
+
+
+# Import
+
+class BulkImporter:
+    """
+    Imports rows from read_rows(). `errors` collects up to `max_errors`
+    per-row errors as {'line': n, 'errors': {field: [messages]}}; `failed`
+    counts all of them. With `update_clusters=False` the map clusters are
+    left to the caller, which then has to rebuild them.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, max_errors=None, on_error=None,
+                 update_clusters=True):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.update_clusters = update_clusters
+        self.max_errors = max_errors
+        self.on_error = on_error
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, rows):
+        batch = []
+        for line_number, row, error in rows:
+            if error is not None:
+                self.error(line_number, error)
+                continue
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        return self.result()
+
+    def result(self):
+        errors = sorted(self.errors, key=lambda entry: entry['line'])
+        return {'created': self.created, 'failed': self.failed, 'errors': errors}
+
+    def error(self, line_number, errors):
+        self.failed += 1
+        entry = {'line': line_number, 'errors': errors}
+        if self.on_error is not None:
+            self.on_error(entry)
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append(entry)
+
+    def import_batch(self, batch):
+        valid = []
+        for line_number, row in batch:
+            try:
+                property_obj, related = build_property(row)
+            except ValidationError as e:
+                self.error(line_number, e.message_dict)
+                continue
+            valid.append((line_number, property_obj, related))
+
+        emails = {email.lower() for _, _, related in valid for email in related['agent_emails']}
+        agents = _agents_by_email(emails) if emails else {}
+        ready = []
+        for line_number, property_obj, related in valid:
+            unknown = [email for email in related['agent_emails'] if email.lower() not in agents]
+            if unknown:
+                self.error(line_number, {'agent_emails': [f'Unknown agent: {email}' for email in unknown]})
+                continue
+            ready.append((property_obj, related))
+        if not ready or self.dry_run:
+            self.created += len(ready)
+            return
+
+        for property_obj, related in ready:
+            # Computed here so the rows are inserted complete.
+            search.set_document(property_obj, related['features'])
+        with transaction.atomic():
+            _unique_slugs([property_obj for property_obj, _ in ready])
+            properties = Property.objects.bulk_create([property_obj for property_obj, _ in ready])
+            features, images, links = [], [], []
+            for property_obj, related in ready:
+                features += [PropertyFeature(property=property_obj, feature=feature) for feature in related['features']]
+                images += [
+                    PropertyImage(property=property_obj, image_url=url, is_primary=index == 0, position=index)
+                    for index, url in enumerate(related['images'])
+                ]
+                links += [
+                    Agent.properties.through(agent_id=agents[email.lower()], property_id=property_obj.pk)
+                    for email in dict.fromkeys(related['agent_emails'])
+                ]
+            PropertyFeature.objects.bulk_create(features, batch_size=self.batch_size)
+            PropertyImage.objects.bulk_create(images, batch_size=self.batch_size)
+            Agent.properties.through.objects.bulk_create(links, batch_size=self.batch_size, ignore_conflicts=True)
+
+            # bulk_create bypasses the signal handlers.
+            Property.objects.filter(pk__in=[property_obj.pk for property_obj in properties]).refresh_card_fields()
+            changelog.record([property_obj.pk for property_obj in properties])
+            events.created([property_obj.pk for property_obj in properties])
+            if self.update_clusters:
+                clusters.add_points(
+                    (property_obj.lat, property_obj.lng, property_obj.price_value)
+                    for property_obj in properties
+                    if None not in (property_obj.lat, property_obj.lng, property_obj.price_value)
+                )
+        property_cache.invalidate_lists()
+        self.created += len(properties)
+
+
+# Export
+
+def export_rows(queryset, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield one row dict per property, loading `batch_size` properties at a time."""
+    queryset = queryset.order_by('id').prefetch_related(
+        'features',
+        Prefetch('images', queryset=PropertyImage.objects.order_by('-is_primary', 'position', 'id')),
+        Prefetch('agents', queryset=Agent.objects.only('id', 'email').order_by('id')),
+    )
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        for property_obj in batch:
+            row = {name: getattr(property_obj, name) for name in FIELDS}
+            row['features'] = [feature.feature for feature in property_obj.features.all()]
+            row['images'] = [image.image_url for image in property_obj.images.all() if image.image_url]
+            row['agent_emails'] = [agent.email for agent in property_obj.agents.all()]
+            yield row
+        last_id = batch[-1].id
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def render_rows(rows, file_format):
+    """Yield the text of an export, one record at a time."""
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(COLUMNS)
+        for row in rows:
+            yield writer.writerow([
+                LIST_SEPARATOR.join(row[name]) if name in LIST_FIELDS else ('' if row[name] is None else row[name])
+                for name in COLUMNS
+            ])
+    elif file_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+    else:
+        raise ValueError(f'Unsupported format {file_format!r}; use one of: {", ".join(FORMATS)}')
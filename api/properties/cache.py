@@ -0,0 +1,219 @@
+"""
+Versioned response cache for the property endpoints.
+
+Every entry is stored together with a version - one for listing responses
+and one per property for detail responses - and writes replace the relevant
+versions once they commit (see properties.signals). A read fetches the
+current version and the entry in a single get_many() round trip (one query
+on the database backend) and only uses the entry if the versions match; the
+next store overwrites a stale entry in place. Nothing expires on a timer:
+correctness comes from the versions alone, and entries for requests nobody
+makes any more are culled by the backend when it needs room (MAX_ENTRIES, or
+Redis' maxmemory policy).
+
+A version is replaced with a fresh random token rather than incremented:
+set() is atomic on every backend, whereas incr() on the file and database
+backends is a read followed by a write, so two concurrent bumps could
+produce the same value and one invalidation would be lost.
+
+The backend is whatever Django cache alias PROPERTY_CACHE_ALIAS points at
+(see CACHES in realestate/settings.py): local memory under runserver and in
+tests, or a backend shared by all workers (database, Redis, files).
+"""
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'properties'
+
+
+class CacheStats:
+    """
+    Per-process hit/miss/eviction counters.
+
+    An eviction is a miss on a key this process stored earlier that is no
+    longer in the backend at all, i.e. the backend dropped it (culling,
+    restart, LRU) rather than it being invalidated by a write.
+    """
+    tracked_keys_limit = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stored = OrderedDict()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.stores = 0
+            self.evictions = 0
+            self.invalidations = 0
+            self._stored.clear()
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self, key, evicted):
+        with self._lock:
+            self.misses += 1
+            if self._stored.pop(key, None) is not None and evicted:
+                self.evictions += 1
+
+    def record_store(self, key):
+        with self._lock:
+            self.stores += 1
+            self._stored[key] = True
+            self._stored.move_to_end(key)
+            while len(self._stored) > self.tracked_keys_limit:
+                self._stored.popitem(last=False)
+
+    def record_invalidation(self, count=1):
+        with self._lock:
+            self.invalidations += count
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+class CacheKey:
+    """
+    A cache entry and the version scope it belongs to. get() records the
+    version it saw, and set() stores the payload under that version.
+    """
+    __slots__ = ('scope', 'key', 'version')
+
+    def __init__(self, scope, key):
+        self.scope = scope
+        self.key = key
+        self.version = None
+
+    def __repr__(self):
+        return f'CacheKey({self.scope!r}, {self.key!r})'
+
+
+class PropertyResponseCache:
+    def __init__(self, alias=None):
+        self._alias = alias
+        self.stats = CacheStats()
+
+    @property
+    def alias(self):
+        return self._alias or getattr(settings, 'PROPERTY_CACHE_ALIAS', 'default')
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    # Version counters
+
+    def _version_key(self, scope):
+        return f'{KEY_PREFIX}:version:{scope}'
+
+    @staticmethod
+    def _new_version():
+        # Never reused, so a version that was culled can never come back at a
+        # value old entries were stored under.
+        return uuid.uuid4().hex
+
+    def _get_version(self, scope):
+        key = self._version_key(scope)
+        version = self.backend.get(key)
+        if version is None:
+            self.backend.add(key, self._new_version(), timeout=None)
+            version = self.backend.get(key)
+        return version
+
+    def _bump(self, scope):
+        self.backend.set(self._version_key(scope), self._new_version(), timeout=None)
+
+    # Invalidations take effect when the current transaction commits (right
+    # away outside one). Bumped earlier, a concurrent reader could still see
+    # the old rows and cache them under the new version, where nothing
+    # would invalidate them again.
+
+    def invalidate_property(self, property_id):
+        """A property changed: drop its detail entries and every listing."""
+        self.invalidate_properties([property_id])
+
+    def invalidate_properties(self, property_ids):
+        property_ids = set(property_ids)
+        transaction.on_commit(lambda: self._invalidate(property_ids))
+
+    def invalidate_lists(self):
+        """Properties were added: only listings can be stale."""
+        transaction.on_commit(lambda: self._invalidate(()))
+
+    def _invalidate(self, property_ids):
+        for property_id in property_ids:
+            self._bump(f'property:{property_id}')
+        self._bump('list')
+        self.stats.record_invalidation(len(property_ids) + 1)
+
+    # Keys
+
+    @staticmethod
+    def normalize_params(query_params):
+        """Stable, order-independent representation of the query string."""
+        items = []
+        for name in sorted(query_params.keys()):
+            values = sorted(value for value in query_params.getlist(name) if value != '')
+            if values:
+                items.append((name, values))
+        return repr(items)
+
+    def _digest(self, request):
+        # The host is part of the key because paginated payloads embed
+        # absolute "next" links.
+        raw = f'{request.get_host()}|{self.normalize_params(request.query_params)}'
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def list_key(self, request, name='list'):
+        return CacheKey('list', f'{KEY_PREFIX}:{name}:{self._digest(request)}')
+
+    def detail_key(self, request, property_id, name='detail'):
+        return CacheKey(
+            f'property:{property_id}',
+            f'{KEY_PREFIX}:{name}:{property_id}:{self._digest(request)}',
+        )
+
+    # Payloads
+
+    def get(self, key):
+        version_key = self._version_key(key.scope)
+        found = self.backend.get_many([version_key, key.key])
+        version = found.get(version_key)
+        if version is None:
+            # First read of this scope (or the backend dropped the version).
+            version = self._get_version(key.scope)
+        key.version = version
+        entry = found.get(key.key)
+        if entry is not None and entry[0] == version:
+            self.stats.record_hit()
+            return entry[1]
+        self.stats.record_miss(key.key, evicted=entry is None)
+        return None
+
+    def set(self, key, data):
+        """Store data under the version get() saw for this key."""
+        if key.version is None:
+            key.version = self._get_version(key.scope)
+        self.backend.set(key.key, (key.version, data), timeout=None)
+        self.stats.record_store(key.key)
+
+
+property_cache = PropertyResponseCache()
@@ -0,0 +1,145 @@
+"""
+Change feed for delta synchronization: /api/properties/changes/?since=<cursor>.
+
+Writing: the signal handlers (properties.signals) and the bulk importer
+call record() and record_deleted() inside the transaction that changes
+the property, its images, features or agents (see
+models.ChangeLoggedModel). An entry therefore exists exactly when its
+change committed.
+
+Cursors are entry ids, and a reader must never see them commit out of
+order. Otherwise it could read id 11, move past it, and miss id 10 when
+that commits later. So writers are serialized: on PostgreSQL every
+transaction that adds entries first takes a transaction-level advisory
+lock, held until it commits; SQLite already allows one writer at a time.
+Entries are written after the rows they describe, so the lock is held
+briefly, and property writes are rare next to reads.
+
+Reading: changes_since() returns the entries after a cursor, keeping only
+the last one per property in the page. Each upsert comes with the current
+listing card. A property deleted since then is left out: its tombstone
+follows later in the log.
+
+Compaction (manage.py compact_property_changes) deletes every entry
+superseded by a later entry for the same property. It also deletes
+tombstones older than PROPERTY_CHANGES_TOMBSTONE_DAYS. Afterwards the log
+holds at most one entry per property plus recent tombstones, so a new
+client can bootstrap by reading from cursor 0. A cursor below the newest
+dropped tombstone (the horizon) may have missed deletes and cannot be
+resumed. The endpoint answers 410 for it, and the client resyncs from 0,
+dropping whatever it did not receive again.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+from .models import Property, PropertyChange, PropertyChangeCompaction
+from .serializers import PropertyListSerializer
+
+# pg_advisory_xact_lock key serializing change log writers ("prop").
+ADVISORY_LOCK_KEY = 0x70726f70
+
+
+def _serialize_writers():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ADVISORY_LOCK_KEY])
+
+
+def record(property_ids, action=PropertyChange.UPSERT):
+    """Log a change of each property, in the current transaction."""
+    property_ids = list(dict.fromkeys(pk for pk in property_ids if pk is not None))
+    if not property_ids:
+        return
+    with transaction.atomic(savepoint=False):
+        _serialize_writers()
+        PropertyChange.objects.bulk_create([PropertyChange(property_id=pk, action=action) for pk in property_ids])
+
+
+def record_deleted(property_ids):
+    record(property_ids, PropertyChange.DELETE)
+
+
+# Reading
+
+def horizon():
+    """Cursors below this cannot be resumed (see the module docstring)."""
+    return PropertyChangeCompaction.objects.order_by('-id').values_list('horizon', flat=True).first() or 0
+
+
+def changes_since(cursor, limit):
+    """
+    Up to `limit` log entries after `cursor`, as
+    (changes, next_cursor, has_more).
+    """
+    entries = list(
+        PropertyChange.objects.filter(pk__gt=cursor).order_by('pk')
+        .values_list('pk', 'property_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for pk, property_id, action in entries:
+        # Re-inserted, so the changes stay in log order.
+        latest.pop(property_id, None)
+        latest[property_id] = (pk, action)
+
+    upserted = [property_id for property_id, (_, action) in latest.items() if action == PropertyChange.UPSERT]
+    cards = {}
+    for property_obj in Property.objects.filter(pk__in=upserted):
+        card = PropertyListSerializer(property_obj).data
+        # Per-user state is not part of the feed.
+        card.pop('is_favorite', None)
+        cards[property_obj.pk] = card
+
+    changes = []
+    for property_id, (pk, action) in latest.items():
+        if action == PropertyChange.DELETE:
+            changes.append({'cursor': pk, 'id': property_id, 'action': action})
+        elif property_id in cards:
+            changes.append({'cursor': pk, 'id': property_id, 'action': action, 'property': cards[property_id]})
+    return changes, entries[-1][0] if entries else cursor, has_more
+
+
+# Maintenance
+
+def compact(tombstone_days=None):
+    """
+    Delete superseded entries and expired tombstones; returns
+    {'superseded': n, 'tombstones': n, 'horizon': cursor}.
+    """
+    if tombstone_days is None:
+        tombstone_days = getattr(settings, 'PROPERTY_CHANGES_TOMBSTONE_DAYS', 30)
+    newer = PropertyChange.objects.filter(property_id=OuterRef('property_id'), pk__gt=OuterRef('pk'))
+    with transaction.atomic():
+        superseded, _ = PropertyChange.objects.filter(Exists(newer)).delete()
+
+        expired = PropertyChange.objects.filter(
+            action=PropertyChange.DELETE, created_at__lt=timezone.now() - timedelta(days=tombstone_days),
+        )
+        newest_expired = expired.aggregate(newest=Max('pk'))['newest']
+        tombstones, _ = expired.delete()
+        new_horizon = max(horizon(), newest_expired or 0)
+        PropertyChangeCompaction.objects.create(horizon=new_horizon, removed=superseded + tombstones)
+    return {'superseded': superseded, 'tombstones': tombstones, 'horizon': new_horizon}
+
+
+def backfill(batch_size=1000):
+    """
+    Log an upsert for every property without an entry (properties created
+    before the log existed), so clients can bootstrap from cursor 0.
+    Returns the number of entries added.
+    """
+    missing = Property.objects.exclude(pk__in=PropertyChange.objects.values('property_id')) \
+        .order_by('pk').values_list('pk', flat=True)
+    added = 0
+    while True:
+        # Logged properties drop out of `missing`, so always take the first batch.
+        property_ids = list(missing[:batch_size])
+        if not property_ids:
+            return added
+        with transaction.atomic():
+            record(property_ids)
+        added += len(property_ids)
@@ -0,0 +1,201 @@
+"""
+Incrementally maintained map marker clusters.
+
+For every zoom level in CLUSTER_ZOOMS each located property is counted in
+exactly one MapCluster grid cell, which stores the count, coordinate sums
+(for the centroid) and the min/max price of its properties. Creating,
+moving or deleting a Property adjusts the affected cells with a couple of
+UPDATE statements (see properties.signals) instead of re-clustering per
+request; the bulk importer adds a whole batch with add_points(). Other
+bulk writes that bypass Property.save()/delete() must be followed by
+`manage.py rebuild_map_clusters`.
+"""
+from collections import defaultdict
+from django.db import connection, transaction
+from django.db.models import F, Max, Min, Q, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from .geo import cell_bounds, cell_for, cell_range
+from .models import MapCluster, Property
+
+CLUSTER_ZOOMS = range(0, 16)
+MAX_CLUSTER_ZOOM = CLUSTER_ZOOMS[-1]
+
+
+def _cells(lat, lng):
+    # Cells nest: the parent of cell (x, y) one zoom level up is (x >> 1, y >> 1).
+    x, y = cell_for(lat, lng, MAX_CLUSTER_ZOOM)
+    return [
+        (zoom, x >> (MAX_CLUSTER_ZOOM - zoom), y >> (MAX_CLUSTER_ZOOM - zoom))
+        for zoom in CLUSTER_ZOOMS
+    ]
+
+
+def _cells_filter(cells):
+    query = Q()
+    for zoom, x, y in cells:
+        query |= Q(zoom=zoom, cell_x=x, cell_y=y)
+    return query
+
+
+def _aggregate(rows):
+    """{(zoom, x, y): [count, lat_sum, lng_sum, min_price, max_price]} for (lat, lng, price) rows."""
+    cells = {}
+    for lat, lng, price in rows:
+        for key in _cells(lat, lng):
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [1, lat, lng, price, price]
+            else:
+                cell[0] += 1
+                cell[1] += lat
+                cell[2] += lng
+                cell[3] = min(cell[3], price)
+                cell[4] = max(cell[4], price)
+    return cells
+
+
+def add_point(lat, lng, price):
+    """Count a property located at (lat, lng) in its cell at every zoom level."""
+    cells = _cells(lat, lng)
+    with transaction.atomic():
+        MapCluster.objects.bulk_create(
+            [MapCluster(zoom=zoom, cell_x=x, cell_y=y) for zoom, x, y in cells],
+            ignore_conflicts=True,
+        )
+        MapCluster.objects.filter(_cells_filter(cells)).update(
+            count=F('count') + 1,
+            lat_sum=F('lat_sum') + lat,
+            lng_sum=F('lng_sum') + lng,
+            min_price=Coalesce(Least(F('min_price'), Value(price)), Value(price)),
+            max_price=Coalesce(Greatest(F('max_price'), Value(price)), Value(price)),
+        )
+
+
+def _add_sql():
+    """The UPDATE of add_point() with the deltas as parameters, for executemany()."""
+    quote = connection.ops.quote_name
+    least, greatest = ('MIN', 'MAX') if connection.vendor == 'sqlite' else ('LEAST', 'GREATEST')
+    count, lat_sum, lng_sum, min_price, max_price = (
+        quote(name) for name in ('count', 'lat_sum', 'lng_sum', 'min_price', 'max_price')
+    )
+    return (
+        f'UPDATE {quote(MapCluster._meta.db_table)} SET '
+        f'{count} = {count} + %s, {lat_sum} = {lat_sum} + %s, {lng_sum} = {lng_sum} + %s, '
+        f'{min_price} = COALESCE({least}({min_price}, %s), %s), '
+        f'{max_price} = COALESCE({greatest}({max_price}, %s), %s) '
+        f'WHERE {quote("zoom")} = %s AND {quote("cell_x")} = %s AND {quote("cell_y")} = %s'
+    )
+
+
+def add_points(points, batch_size=1000):
+    """
+    Count many properties, given as (lat, lng, price) rows, in the cells
+    they fall into. Each touched cell is updated once, with the same
+    arithmetic as add_point(); the other cells are left alone.
+    """
+    cells = _aggregate(points)
+    if not cells:
+        return 0
+    # Updated in a fixed order, so concurrent imports cannot deadlock.
+    cells = sorted(cells.items())
+    with transaction.atomic():
+        MapCluster.objects.bulk_create(
+            [MapCluster(zoom=zoom, cell_x=x, cell_y=y) for (zoom, x, y), _ in cells],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(_add_sql(), [
+                (count, lat_sum, lng_sum, low, low, high, high, zoom, x, y)
+                for (zoom, x, y), (count, lat_sum, lng_sum, low, high) in cells
+            ])
+    return len(cells)
+
+
+def remove_point(lat, lng, price):
+    """
+    Uncount a property that was located at (lat, lng). The Property row must
+    already be deleted or moved, since min/max prices of the affected cells
+    are recomputed from the remaining rows.
+    """
+    cells = _cells(lat, lng)
+    with transaction.atomic():
+        clusters = MapCluster.objects.filter(_cells_filter(cells))
+        clusters.update(
+            count=F('count') - 1,
+            lat_sum=F('lat_sum') - lat,
+            lng_sum=F('lng_sum') - lng,
+        )
+        clusters.filter(count__lte=0).delete()
+        # Min/max cannot be decremented; recompute them only for the cells
+        # where the removed price was an extreme. Those form a chain from the
+        # finest zoom up, so only the finest cell is recomputed from Property
+        # rows (a small area); each coarser cell is derived from its four
+        # children, never by scanning its whole, possibly country-sized, area.
+        extremes = {
+            (zoom, x, y): pk
+            for zoom, x, y, pk in clusters.filter(Q(min_price=price) | Q(max_price=price))
+            .values_list('zoom', 'cell_x', 'cell_y', 'pk')
+        }
+        for zoom, x, y in reversed(cells):
+            pk = extremes.get((zoom, x, y))
+            if pk is None:
+                continue
+            if zoom == MAX_CLUSTER_ZOOM:
+                min_lat, min_lng, max_lat, max_lng = cell_bounds(x, y, zoom)
+                prices = Property.objects.filter(
+                    lat__gt=min_lat, lat__lte=max_lat, lng__gte=min_lng, lng__lt=max_lng,
+                ).aggregate(low=Min('price_value'), high=Max('price_value'))
+            else:
+                prices = MapCluster.objects.filter(
+                    zoom=zoom + 1, cell_x__in=(2 * x, 2 * x + 1), cell_y__in=(2 * y, 2 * y + 1),
+                ).aggregate(low=Min('min_price'), high=Max('max_price'))
+            MapCluster.objects.filter(pk=pk).update(min_price=prices['low'], max_price=prices['high'])
+
+
+def aggregate_points(rows, zoom):
+    """Cluster (lat, lng, price) rows in Python, for filtered queries."""
+    cells = defaultdict(lambda: [0, 0.0, 0.0, None, None])
+    for lat, lng, price in rows:
+        cell = cells[cell_for(lat, lng, zoom)]
+        cell[0] += 1
+        cell[1] += lat
+        cell[2] += lng
+        cell[3] = price if cell[3] is None else min(cell[3], price)
+        cell[4] = price if cell[4] is None else max(cell[4], price)
+    return [
+        [lat_sum / count, lng_sum / count, count, low, high]
+        for count, lat_sum, lng_sum, low, high in cells.values()
+    ]
+
+
+def clusters_in(bounds, zoom):
+    """Pre-aggregated clusters intersecting a bbox at the given zoom level."""
+    (min_x, max_x), (min_y, max_y) = cell_range(bounds, zoom)
+    rows = MapCluster.objects.filter(
+        zoom=zoom, cell_x__range=(min_x, max_x), cell_y__range=(min_y, max_y), count__gt=0,
+    ).values_list('count', 'lat_sum', 'lng_sum', 'min_price', 'max_price')
+    return [
+        [lat_sum / count, lng_sum / count, count, low, high]
+        for count, lat_sum, lng_sum, low, high in rows
+    ]
+
+
+def rebuild(batch_size=5000):
+    """Recompute every cluster from the Property table."""
+    rows = Property.objects.filter(lat__isnull=False, lng__isnull=False) \
+        .order_by().values_list('lat', 'lng', 'price_value').iterator(chunk_size=batch_size)
+    cells = _aggregate(rows)
+
+    with transaction.atomic():
+        MapCluster.objects.all().delete()
+        MapCluster.objects.bulk_create(
+            (
+                MapCluster(
+                    zoom=zoom, cell_x=x, cell_y=y, count=count,
+                    lat_sum=lat_sum, lng_sum=lng_sum, min_price=low, max_price=high,
+                )
+                for (zoom, x, y), (count, lat_sum, lng_sum, low, high) in cells.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(cells)
@@ -0,0 +1,77 @@
+"""
+ETag / Last-Modified validators for the property endpoints.
+
+Validators are derived from Property.updated_at (and the row count for
+collections) with one aggregate query, so a conditional request can be
+answered without serializing anything. Every write that changes a
+representation - including image, feature and agent changes - touches the
+parent property's updated_at (see properties.signals), which keeps the
+validators correct.
+"""
+import hashlib
+from calendar import timegm
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def collection_token(queryset):
+    """(token, last_modified) for a filtered collection, ignoring pagination."""
+    stats = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    last_modified = stats['last_modified']
+    token = f"{stats['count']}:{last_modified.isoformat() if last_modified else ''}"
+    return token, _timestamp(last_modified)
+
+
+def object_token(queryset, pk):
+    """
+    (token, last_modified) for a single property, or (None, None) if it
+    does not exist. Raises Http404 for a pk that is not a valid id.
+    """
+    try:
+        updated_at = queryset.filter(pk=pk).values_list('updated_at', flat=True).first()
+    except (TypeError, ValueError, ValidationError):
+        raise Http404
+    if updated_at is None:
+        return None, None
+    return f"{pk}:{updated_at.isoformat()}", _timestamp(updated_at)
+
+
+def make_etag(request, token, *parts):
+    """
+    Strong ETag for one representation: the validator token plus anything
+    else the rendered bytes depend on (query string, renderer format).
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = '|'.join([
+        token,
+        request.get_full_path(),
+        getattr(renderer, 'format', '') or '',
+        *[str(part) for part in parts],
+    ])
+    return quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+
+def not_modified_response(request, etag, last_modified):
+    """Return a 304 response if the request's preconditions match, else None."""
+    response = get_conditional_response(
+        getattr(request, '_request', request), etag=etag, last_modified=last_modified,
+    )
+    if response is not None:
+        set_validator_headers(response, etag, last_modified)
+    return response
+
+
+def set_validator_headers(response, etag, last_modified):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    return timegm(value.utctimetuple())
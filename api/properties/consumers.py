@@ -0,0 +1,148 @@
+"""
+WebSocket endpoint for live property changes: /api/ws/properties/.
+
+Client messages (JSON):
+- {"action": "subscribe", "filters": {...}, "bbox": "..."}: receive the
+  changes of properties matching the listing filters and/or map viewport
+  (see properties.events.Subscription); subscribing again replaces them.
+- {"action": "unsubscribe"}
+- {"action": "authenticate", "token": "<access token>"}: also receive the
+  user's favorite changes. The token is checked once, when sent.
+
+Server messages:
+- {"type": "changes", "changes": [...]}: each change is one of
+  {"event": "created" | "updated", "id": 1, "property": {listing card}},
+  {"event": "deleted" | "removed", "id": 1} ("removed": it no longer
+  matches the subscription), or {"event": "favorited" | "unfavorited", "id": 1};
+- {"type": "reload"}: too many changes to list; fetch the listing again;
+- {"type": "subscribed"}, {"type": "unsubscribed"},
+  {"type": "authenticated", "user_id": 1} and {"type": "error", "error": "..."}.
+
+Changes are coalesced per connection: they are held for
+PROPERTY_EVENTS_FLUSH_SECONDS and only the last change of each property is
+sent. More than PROPERTY_EVENTS_MAX_BATCH pending properties turn into a
+single reload, so a bulk import does not flood clients.
+"""
+import asyncio
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from users.authentication import ClaimsJWTAuthentication
+from . import events
+
+
+def _authenticate(raw_token):
+    authentication = ClaimsJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+
+
+class PropertyEventsConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        self.subscription = None
+        self.user_id = None
+        self.pending = {}
+        self.reload = False
+        self.flush_task = None
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.subscription is not None:
+            await self.channel_layer.group_discard(events.GROUP, self.channel_name)
+        if self.user_id is not None:
+            await self.channel_layer.group_discard(events.user_group(self.user_id), self.channel_name)
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+
+    @classmethod
+    async def decode_json(cls, text_data):
+        try:
+            return await super().decode_json(text_data)
+        except ValueError:
+            return None
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action') if isinstance(content, dict) else None
+        if action == 'subscribe':
+            try:
+                subscription = events.Subscription(content.get('filters'), content.get('bbox'))
+            except events.SubscriptionError as e:
+                await self.send_json({'type': 'error', 'error': str(e)})
+                return
+            if self.subscription is None:
+                await self.channel_layer.group_add(events.GROUP, self.channel_name)
+            self.subscription = subscription
+            await self.send_json({'type': 'subscribed'})
+        elif action == 'unsubscribe':
+            if self.subscription is not None:
+                await self.channel_layer.group_discard(events.GROUP, self.channel_name)
+                self.subscription = None
+            await self.send_json({'type': 'unsubscribed'})
+        elif action == 'authenticate':
+            user = await database_sync_to_async(_authenticate)(str(content.get('token') or ''))
+            if user is None:
+                await self.send_json({'type': 'error', 'error': 'Invalid or expired token'})
+                return
+            if self.user_id is not None:
+                await self.channel_layer.group_discard(events.user_group(self.user_id), self.channel_name)
+            self.user_id = user.pk
+            await self.channel_layer.group_add(events.user_group(self.user_id), self.channel_name)
+            await self.send_json({'type': 'authenticated', 'user_id': self.user_id})
+        else:
+            await self.send_json({'type': 'error', 'error': 'Expected a JSON object with action subscribe, unsubscribe or authenticate'})
+
+    # Channel layer messages (properties.events)
+
+    async def property_changes(self, message):
+        if self.subscription is None:
+            return
+        for change in message['changes']:
+            if change['event'] == 'deleted':
+                self.queue(change['id'], change)
+            elif self.subscription.matches(change['match']):
+                self.queue(change['id'], {key: change[key] for key in ('event', 'id', 'property')})
+            elif change['event'] == 'updated':
+                # It may have matched before the update.
+                self.queue(change['id'], {'event': 'removed', 'id': change['id']})
+
+    async def property_reload(self, message):
+        if self.subscription is not None:
+            self.reload = True
+            self.pending.clear()
+            self.schedule_flush()
+
+    async def favorite_changes(self, message):
+        for change in message['changes']:
+            self.queue(('favorite', change['id']), change)
+
+    # Coalescing
+
+    def queue(self, key, change):
+        if self.reload:
+            return
+        # Last change wins, moved to the end to keep the order of the latest changes.
+        self.pending.pop(key, None)
+        self.pending[key] = change
+        if len(self.pending) > events.max_batch():
+            self.reload = True
+            self.pending.clear()
+        self.schedule_flush()
+
+    def schedule_flush(self):
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(getattr(settings, 'PROPERTY_EVENTS_FLUSH_SECONDS', 0.25))
+        self.flush_task = None
+        if self.reload:
+            self.reload = False
+            self.pending.clear()
+            await self.send_json({'type': 'reload'})
+        elif self.pending:
+            changes, self.pending = list(self.pending.values()), {}
+            await self.send_json({'type': 'changes', 'changes': changes})
@@ -0,0 +1,191 @@
+"""
+Property change events for WebSocket clients (properties.consumers).
+
+Publishing: the signal handlers (properties.signals), the bulk importer
+and properties.favorites report changes through created(), updated(),
+deleted() and favorite(). Nothing is sent before the transaction commits,
+so clients never hear about rolled-back changes and can fetch anything
+they are told about. On commit, the listing cards of the changed
+properties are loaded in one query and sent to the channel layer as one
+message. A batch of more than PROPERTY_EVENTS_MAX_BATCH properties (a bulk
+import) is sent as a single "reload" instead. When no consumer in this
+process listens (always the case under WSGI with the in-memory layer),
+nothing is loaded or sent.
+
+Matching: a client subscribes with listing filters (the PropertyFilter
+parameters except `search`) and/or a map viewport. Subscription evaluates
+them in memory against the column values carried by each event, so the
+fan-out costs no query however many clients are connected.
+
+Events name the property and carry its listing card. Its `is_favorite`
+is left out: favorites are per user and arrive as their own events.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils.datastructures import MultiValueDict
+from .filters import PropertyFilter
+from .geo import BoundsError, parse_bbox
+from .models import Property
+from .serializers import PropertyListSerializer
+
+GROUP = 'properties'
+# Columns the subscription filters look at, sent along with every card.
+MATCH_FIELDS = tuple(sorted(
+    {f.field_name for f in PropertyFilter.base_filters.values() if not f.method} | {'lat', 'lng'}
+))
+
+
+def user_group(user_id):
+    return f'properties.user.{user_id}'
+
+
+def max_batch():
+    return getattr(settings, 'PROPERTY_EVENTS_MAX_BATCH', 100)
+
+
+def _layer_for(group):
+    """The channel layer, or None when nobody could receive on `group`."""
+    layer = get_channel_layer()
+    if layer is None:
+        return None
+    if isinstance(layer, InMemoryChannelLayer) and not layer.groups.get(group):
+        # Process-local layer and no consumer of this process listens.
+        return None
+    return layer
+
+
+# Publishing
+
+def created(property_ids):
+    _on_commit('created', property_ids)
+
+
+def updated(property_ids):
+    _on_commit('updated', property_ids)
+
+
+def deleted(property_ids):
+    _on_commit('deleted', property_ids)
+
+
+def favorite(user_id, property_id, is_favorite):
+    group = user_group(user_id)
+
+    def send():
+        layer = _layer_for(group)
+        if layer is not None:
+            async_to_sync(layer.group_send)(group, {
+                'type': 'favorite.changes',
+                'changes': [{'event': 'favorited' if is_favorite else 'unfavorited', 'id': property_id}],
+            })
+
+    transaction.on_commit(send)
+
+
+def _on_commit(event, property_ids):
+    property_ids = list(dict.fromkeys(pk for pk in property_ids if pk is not None))
+    if property_ids:
+        transaction.on_commit(lambda: publish(event, property_ids))
+
+
+def publish(event, property_ids):
+    """Send one message for `property_ids` now; see the module docstring."""
+    layer = _layer_for(GROUP)
+    if layer is None:
+        return
+    if len(property_ids) > max_batch():
+        async_to_sync(layer.group_send)(GROUP, {'type': 'property.reload'})
+        return
+    async_to_sync(layer.group_send)(GROUP, {'type': 'property.changes', 'changes': changes(event, property_ids)})
+
+
+def changes(event, property_ids):
+    """Event dicts for `property_ids`; properties that no longer exist are reported deleted."""
+    found = {}
+    if event != 'deleted':
+        for property_obj in Property.objects.filter(pk__in=property_ids):
+            card = PropertyListSerializer(property_obj).data
+            card.pop('is_favorite', None)
+            found[property_obj.pk] = {
+                'event': event,
+                'id': property_obj.pk,
+                'property': card,
+                'match': {field: getattr(property_obj, field) for field in MATCH_FIELDS},
+            }
+    return [found.get(pk) or {'event': 'deleted', 'id': pk} for pk in property_ids]
+
+
+# Matching
+
+class SubscriptionError(ValueError):
+    pass
+
+
+class Subscription:
+    """
+    Listing filters ({"type": ["Villa"], "price_max": 900000, ...}) and an
+    optional viewport ("min_lng,min_lat,max_lng,max_lat", as for the map
+    endpoint), validated like the listing's query parameters.
+    """
+
+    def __init__(self, filters=None, bbox=None):
+        filters = filters or {}
+        if not isinstance(filters, dict):
+            raise SubscriptionError('filters must be an object')
+        unknown = sorted(set(filters) - set(PropertyFilter.base_filters))
+        if unknown:
+            raise SubscriptionError(f'Unknown filter(s): {", ".join(unknown)}')
+        data = MultiValueDict({
+            name: [str(item) for item in value] if isinstance(value, list) else [str(value)]
+            for name, value in filters.items()
+        })
+        filterset = PropertyFilter(data, queryset=Property.objects.none())
+        if not filterset.form.is_valid():
+            raise SubscriptionError(
+                '; '.join(f'{name}: {" ".join(errors)}' for name, errors in filterset.form.errors.items())
+            )
+
+        self.tests = []
+        for name, value in filterset.form.cleaned_data.items():
+            if value in (None, '', [], ()):
+                continue
+            declared = filterset.filters[name]
+            if declared.method:
+                raise SubscriptionError(f'The {name} filter cannot be used for live updates')
+            self.tests.append((declared.field_name, declared.lookup_expr, value))
+
+        try:
+            self.bounds = parse_bbox(bbox) if bbox else None
+        except BoundsError as e:
+            raise SubscriptionError(str(e))
+
+    def matches(self, values):
+        """Whether a property with these MATCH_FIELDS values belongs to the subscription."""
+        for field, lookup, expected in self.tests:
+            if not _compare(values.get(field), lookup, expected):
+                return False
+        if self.bounds is not None:
+            lat, lng = values.get('lat'), values.get('lng')
+            if lat is None or lng is None:
+                return False
+            min_lat, min_lng, max_lat, max_lng = self.bounds
+            if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+                return False
+        return True
+
+
+def _compare(actual, lookup, expected):
+    # As in SQL, a NULL column matches no filter.
+    if actual is None:
+        return False
+    if isinstance(expected, (list, tuple)):
+        return actual in expected
+    if lookup == 'gte':
+        return actual >= expected
+    if lookup == 'lte':
+        return actual <= expected
+    if lookup == 'icontains':
+        return expected.casefold() in str(actual).casefold()
+    return actual == expected
@@ -0,0 +1,68 @@
+"""
+Facet counts for the listing filter panel.
+
+Each facet is counted over the properties matching every *other* active
+filter (disjunctive faceting), so selecting "Villa" still shows how many
+"Maison" listings there are. Every facet is a single grouped aggregate
+query; nothing is counted in Python.
+"""
+from django.db.models import Count, Q
+from django_filters.utils import translate_validation
+from .filters import PropertyFilter
+from .models import Property
+
+PRICE_BUCKETS = [0, 100000, 250000, 500000, 1000000, 2000000, None]
+TOP_LOCATIONS = 10
+
+# Query parameters that each facet ignores when counting.
+FACET_PARAMS = {
+    'type': ['type'],
+    'price': ['price_min', 'price_max'],
+    'rooms': ['rooms_min', 'rooms_max'],
+    'baths': ['baths_min', 'baths_max'],
+    'location': ['location'],
+}
+
+
+def filtered_queryset(request, exclude=()):
+    params = request.query_params.copy()
+    for name in exclude:
+        params.pop(name, None)
+    filterset = PropertyFilter(params, queryset=Property.objects.all(), request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs.order_by()
+
+
+def value_counts(queryset, field, limit=None):
+    rows = queryset.exclude(**{f'{field}__isnull': True}) \
+        .values(field).annotate(count=Count('id')).order_by('-count', field)
+    if limit:
+        rows = rows[:limit]
+    return [{'value': row[field], 'count': row['count']} for row in rows]
+
+
+def price_buckets(queryset):
+    buckets = list(zip(PRICE_BUCKETS, PRICE_BUCKETS[1:]))
+    counts = queryset.aggregate(**{
+        f'bucket_{i}': Count('id', filter=Q(price_value__gte=low) & (Q(price_value__lt=high) if high else Q()))
+        for i, (low, high) in enumerate(buckets)
+    })
+    return [
+        {'min': low, 'max': high, 'count': counts[f'bucket_{i}']}
+        for i, (low, high) in enumerate(buckets)
+    ]
+
+
+def compute_facets(request):
+    def scope(facet):
+        return filtered_queryset(request, exclude=FACET_PARAMS[facet])
+
+    return {
+        'total': filtered_queryset(request).count(),
+        'type': value_counts(scope('type'), 'property_type'),
+        'price': price_buckets(scope('price')),
+        'rooms': sorted(value_counts(scope('rooms'), 'rooms'), key=lambda row: row['value']),
+        'baths': sorted(value_counts(scope('baths'), 'baths'), key=lambda row: row['value']),
+        'location': value_counts(scope('location'), 'location', limit=TOP_LOCATIONS),
+    }
@@ -0,0 +1,131 @@
+"""
+Per-user favorites.
+
+Favorite rows are not part of a property's shared representation: list and
+detail payloads are cached and validated with `is_favorite` false, then
+the current user's state is overlaid with one query per response
+(mark_favorites). Adding or removing a favorite therefore touches neither
+the Property row nor the response cache. The user's favorites token is
+part of the ETag instead.
+
+Users are only referred to by pk, so the token-backed users of
+users.authentication work without loading the User row. Every change is
+also pushed to the user's open WebSocket connections (properties.events).
+"""
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from . import events
+from .models import Favorite, Property
+
+
+def favorite_ids(user, property_ids):
+    """The subset of property_ids the user has favorited, in one query."""
+    if not user.is_authenticated or not property_ids:
+        return set()
+    return set(
+        Favorite.objects.filter(user_id=user.pk, property_id__in=property_ids).values_list('property_id', flat=True)
+    )
+
+
+def favorites_token(user):
+    """Changes whenever the user adds or removes a favorite; '' for anonymous users."""
+    if not user.is_authenticated:
+        return ''
+    stats = Favorite.objects.filter(user_id=user.pk).aggregate(count=Count('id'), last=Max('created_at'))
+    last = stats['last'].isoformat() if stats['last'] else ''
+    return f"{user.pk}:{stats['count']}:{last}"
+
+
+def _table_names():
+    quote = connection.ops.quote_name
+    return quote(Favorite._meta.db_table), quote(Property._meta.db_table), quote
+
+
+def _insert_sql(extra_condition=''):
+    """
+    INSERT ... SELECT that only adds the row if the property exists, so a
+    missing property is never a foreign key violation (which PostgreSQL
+    only reports at commit, the constraints being deferred).
+    Parameters: user id, created_at, property id.
+    """
+    favorites, properties, quote = _table_names()
+    return (
+        f'INSERT INTO {favorites} ({quote("user_id")}, {quote("property_id")}, {quote("created_at")}) '
+        f'SELECT %s, {quote("id")}, %s FROM {properties} WHERE {quote("id")} = %s{extra_condition} '
+        f'ON CONFLICT DO NOTHING'
+    )
+
+
+def _now():
+    return connection.ops.adapt_datetimefield_value(timezone.now())
+
+
+def add_favorite(user, property_id):
+    """
+    Idempotently favorite a property with a single INSERT.
+
+    Returns False if the property does not exist.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_insert_sql(), [user.pk, _now(), property_id])
+        added = cursor.rowcount
+    # Nothing inserted: already a favorite, or no such property.
+    if not added and not Property.objects.filter(pk=property_id).exists():
+        return False
+    events.favorite(user.pk, property_id, True)
+    return True
+
+
+def remove_favorite(user, property_id):
+    """Idempotently unfavorite a property with a single DELETE."""
+    Favorite.objects.filter(user_id=user.pk, property_id=property_id).delete()
+    events.favorite(user.pk, property_id, False)
+
+
+def toggle_favorite(user, property_id):
+    """Remove the favorite if present, else add it. Returns the new state, or None if no such property."""
+    if connection.vendor == 'postgresql':
+        # One statement: the INSERT only runs if the DELETE removed nothing.
+        favorites, _, quote = _table_names()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH deleted AS (DELETE FROM {favorites} WHERE {quote("user_id")} = %s '
+                f'AND {quote("property_id")} = %s RETURNING 1), '
+                f'added AS ({_insert_sql(" AND NOT EXISTS (SELECT 1 FROM deleted)")} RETURNING 1) '
+                f'SELECT EXISTS (SELECT 1 FROM deleted), EXISTS (SELECT 1 FROM added)',
+                [user.pk, property_id, user.pk, _now(), property_id],
+            )
+            deleted, added = cursor.fetchone()
+    else:
+        # SQLite has no DELETE in WITH; it serializes writers anyway.
+        with transaction.atomic():
+            deleted, _ = Favorite.objects.filter(user_id=user.pk, property_id=property_id).delete()
+            added = False
+            if not deleted:
+                with connection.cursor() as cursor:
+                    cursor.execute(_insert_sql(), [user.pk, _now(), property_id])
+                    added = cursor.rowcount
+    if deleted:
+        events.favorite(user.pk, property_id, False)
+        return False
+    # Neither: a concurrent request added it first, or no such property.
+    if not added and not Property.objects.filter(pk=property_id).exists():
+        return None
+    events.favorite(user.pk, property_id, True)
+    return True
+
+
+def mark_favorites(data, user):
+    """
+    Copy of a list ({'results': [...]}) or detail payload with `is_favorite`
+    set for the user.
+    """
+    if not user.is_authenticated:
+        return data
+    items = data['results'] if 'results' in data else [data]
+    favorited = favorite_ids(user, [item['id'] for item in items])
+    marked = [{**item, 'is_favorite': item['id'] in favorited} for item in items]
+    if 'results' in data:
+        return {**data, 'results': marked}
+    return marked[0]
@@ -0,0 +1,39 @@
+from django_filters import rest_framework as filters
+from .models import Property
+from .search import apply_search
+
+
+class PropertyFilter(filters.FilterSet):
+    """
+    Query-parameter filters for the property listing.
+
+    Supported parameters:
+    - search: full-text query over title, location, features and description
+      (accent-insensitive, relevance-ranked; see properties.search)
+    - type: one or more property types, e.g. ?type=Villa&type=Maison
+    - price_min / price_max
+    - rooms_min / rooms_max
+    - baths_min / baths_max
+    - surface_min / surface_max
+    - location: case-insensitive substring of the location
+    """
+    search = filters.CharFilter(method='filter_search')
+    # A plain column, so no join can duplicate rows: skip the filter's
+    # default DISTINCT, which would defeat the (property_type, ...) indexes.
+    type = filters.MultipleChoiceFilter(field_name='property_type', choices=Property.PROPERTY_TYPES, distinct=False)
+    price_min = filters.NumberFilter(field_name='price_value', lookup_expr='gte')
+    price_max = filters.NumberFilter(field_name='price_value', lookup_expr='lte')
+    rooms_min = filters.NumberFilter(field_name='rooms', lookup_expr='gte')
+    rooms_max = filters.NumberFilter(field_name='rooms', lookup_expr='lte')
+    baths_min = filters.NumberFilter(field_name='baths', lookup_expr='gte')
+    baths_max = filters.NumberFilter(field_name='baths', lookup_expr='lte')
+    surface_min = filters.NumberFilter(field_name='surface', lookup_expr='gte')
+    surface_max = filters.NumberFilter(field_name='surface', lookup_expr='lte')
+    location = filters.CharFilter(field_name='location', lookup_expr='icontains')
+
+    class Meta:
+        model = Property
+        fields = []
+
+    def filter_search(self, queryset, name, value):
+        return apply_search(queryset, value)
@@ -0,0 +1,106 @@
+"""
+Replace the image galleries of one or more properties.
+
+The requested gallery is diffed against the stored images, matched by
+URL. Rows that still exist are kept, with their variants, and only their
+primary flag and position are rewritten. Missing rows are inserted and the
+remaining ones deleted. All properties in a call are changed inside one
+transaction with a fixed number of statements, so readers only ever see
+the old or the new gallery, never an empty one.
+
+The propertyimage_single_primary constraint allows one primary image per
+property. Statements run in an order that keeps it satisfied: deletes
+first, then clearing old primary flags, then setting new ones.
+"""
+from collections import defaultdict
+from django.db import transaction
+from .models import PropertyImage
+from .signals import batched_refresh, refresh_cards
+
+
+class GalleryError(ValueError):
+    pass
+
+
+def parse_gallery(images_data):
+    """
+    Normalize an `images` payload to [(image_url, is_primary), ...].
+
+    Accepts a list of URLs (the first one is primary) or a list of
+    {"image_url": ..., "is_primary": ...} objects. Without an explicit
+    primary image, the first one is made primary.
+    """
+    if not isinstance(images_data, list) or not images_data:
+        raise GalleryError('At least one image is required')
+    max_length = PropertyImage._meta.get_field('image_url').max_length
+    gallery = []
+    for index, item in enumerate(images_data):
+        if isinstance(item, str):
+            url, is_primary = item, index == 0
+        elif isinstance(item, dict):
+            url, is_primary = item.get('image_url'), bool(item.get('is_primary', False))
+        else:
+            raise GalleryError('Images must be URLs or objects with an image_url')
+        if not isinstance(url, str) or not url.strip():
+            raise GalleryError(f'Image {index + 1} has no image_url')
+        if len(url) > max_length:
+            raise GalleryError(f'Image {index + 1}: image_url is limited to {max_length} characters')
+        gallery.append((url.strip(), is_primary))
+
+    primaries = sum(1 for _, is_primary in gallery if is_primary)
+    if primaries > 1:
+        raise GalleryError('Only one image can be primary')
+    if primaries == 0:
+        gallery[0] = (gallery[0][0], True)
+    return gallery
+
+
+def replace_galleries(galleries):
+    """
+    Make {property_id: [(image_url, is_primary), ...]} the stored galleries.
+
+    Returns {'created': n, 'updated': n, 'deleted': n}.
+    """
+    with transaction.atomic(), batched_refresh():
+        existing = defaultdict(lambda: defaultdict(list))
+        rows = PropertyImage.objects.select_for_update() \
+            .filter(property_id__in=list(galleries)).order_by('id') \
+            .only('id', 'property_id', 'image_url', 'is_primary', 'position')
+        for image in rows:
+            existing[image.property_id][image.image_url].append(image)
+
+        to_create, to_update, keep_ids, demote_ids = [], [], set(), []
+        for property_id, gallery in galleries.items():
+            by_url = existing[property_id]
+            for position, (url, is_primary) in enumerate(gallery):
+                matches = by_url.get(url)
+                if not matches:
+                    to_create.append(PropertyImage(
+                        property_id=property_id, image_url=url, is_primary=is_primary, position=position,
+                    ))
+                    continue
+                image = matches.pop(0)
+                keep_ids.add(image.pk)
+                if image.is_primary and not is_primary:
+                    demote_ids.append(image.pk)
+                if image.is_primary != is_primary or image.position != position:
+                    image.is_primary, image.position = is_primary, position
+                    to_update.append(image)
+
+        to_delete = [
+            image.pk
+            for by_url in existing.values() for images in by_url.values() for image in images
+            if image.pk not in keep_ids
+        ]
+        if to_delete:
+            PropertyImage.objects.filter(pk__in=to_delete).delete()
+        if demote_ids:
+            PropertyImage.objects.filter(pk__in=demote_ids).update(is_primary=False)
+        if to_update:
+            PropertyImage.objects.bulk_update(to_update, ['is_primary', 'position'])
+        if to_create:
+            PropertyImage.objects.bulk_create(to_create)
+        # Signal handlers only see the deletes; queue every property.
+        refresh_cards(list(galleries))
+
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(to_delete)}
@@ -0,0 +1,246 @@
+"""
+Deterministic synthetic listings for load and benchmark testing.
+
+Property number n is generated from its own random stream, seeded with
+(seed, n). The same seed therefore always gives the same rows, and any range
+of numbers can be generated on its own - by several processes at once, or
+to extend an existing dataset with --start. Rows have the shape that
+bulk.read_rows() yields and are written by bulk.BulkImporter, so they get
+the same validation, search documents and listing-card columns as an
+import.
+
+Distributions are rough approximations of the Tunisian market: listings
+cluster around cities weighted by size, prices are log-normal around a
+per-type base scaled by the city, and land has a surface but no rooms.
+Agents, users and favorites are generated the same way; favorites are
+skewed towards a minority of popular listings.
+"""
+import math
+import random
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from . import bulk, clusters
+from .cache import property_cache
+from .models import Agent, Favorite, Property
+
+# (name, latitude, longitude, weight, price factor, spread in km)
+CITIES = [
+    ('Tunis', 36.8065, 10.1815, 30, 1.2, 6),
+    ('Ariana', 36.8625, 10.1956, 6, 1.0, 4),
+    ('La Marsa', 36.8782, 10.3247, 5, 1.8, 3),
+    ('Sidi Bou Said', 36.8687, 10.3416, 2, 2.2, 1.5),
+    ('Gammarth', 36.9180, 10.2870, 2, 2.0, 2),
+    ('Les Berges du Lac', 36.8380, 10.2400, 4, 1.9, 2),
+    ('Hammamet', 36.4000, 10.6167, 5, 1.5, 5),
+    ('Nabeul', 36.4561, 10.7376, 4, 1.0, 4),
+    ('Sousse', 35.8256, 10.6411, 10, 1.1, 6),
+    ('Monastir', 35.7643, 10.8113, 4, 1.0, 4),
+    ('Mahdia', 35.5047, 11.0622, 3, 0.9, 4),
+    ('Sfax', 34.7406, 10.7603, 10, 0.9, 7),
+    ('Bizerte', 37.2744, 9.8739, 4, 0.9, 5),
+    ('Djerba', 33.8750, 10.8575, 3, 1.3, 8),
+    ('Kairouan', 35.6781, 10.0963, 3, 0.6, 5),
+    ('Gabès', 33.8815, 10.0982, 2, 0.7, 5),
+    ('Tabarka', 36.9544, 8.7580, 1, 1.0, 3),
+]
+
+# type -> (weight, base price, rooms range)
+TYPES = {
+    'Appartement': (40, 350000, (1, 5)),
+    'Maison': (20, 500000, (2, 6)),
+    'Villa': (15, 1100000, (3, 8)),
+    'Résidence': (10, 700000, (2, 6)),
+    'Terrain': (15, None, None),
+}
+
+FEATURES = {
+    'common': [
+        'Climatisation', 'Chauffage central', 'Cuisine équipée', 'Double vitrage',
+        'Système de sécurité', 'Parking', 'Proche des commodités', 'Vue dégagée',
+    ],
+    'Appartement': ['Ascenseur', 'Balcon', 'Concierge', 'Résidence fermée'],
+    'Résidence': ['Ascenseur', 'Piscine commune', 'Gardiennage 24/7', 'Salle de sport'],
+    'Maison': ['Jardin', 'Garage', 'Terrasse', 'Puits'],
+    'Villa': ['Piscine privée', 'Jardin paysager', 'Vue sur mer', 'Garage double', 'Domotique'],
+    'Terrain': ['Titre bleu', 'Viabilisé', 'Constructible', 'Accès goudronné', 'Vue sur mer'],
+}
+
+FIRST_NAMES = ['Amira', 'Youssef', 'Sarra', 'Mehdi', 'Ines', 'Karim', 'Nour', 'Walid', 'Lina', 'Sami', 'Rania', 'Omar']
+LAST_NAMES = ['Ben Ali', 'Trabelsi', 'Jaziri', 'Gharbi', 'Hammami', 'Bouazizi', 'Mansouri', 'Chaabane', 'Khelifi', 'Sassi']
+
+IMAGE_URL = 'https://images.example.com/properties/{number}/{index}.jpg'
+AGENT_EMAIL = 'agent-{number:05d}@agents.example.com'
+USER_NAME = 'loadtest-{number:07d}'
+USER_EMAIL = 'loadtest-{number:07d}@users.example.com'
+
+
+def _weighted(rng, table):
+    names = list(table)
+    weights = [table[name] for name in names]
+    return rng.choices(names, weights=weights)[0]
+
+
+_CITY_WEIGHTS = {city[0]: city[3] for city in CITIES}
+_CITIES = {city[0]: city for city in CITIES}
+_TYPE_WEIGHTS = {name: spec[0] for name, spec in TYPES.items()}
+
+
+def property_row(seed, number, agent_count=0):
+    """The row for property `number`; the same arguments always give the same row."""
+    rng = random.Random(f'{seed}:property:{number}')
+    property_type = _weighted(rng, _TYPE_WEIGHTS)
+    city, lat, lng, _, price_factor, spread = _CITIES[_weighted(rng, _CITY_WEIGHTS)]
+    lat += rng.gauss(0, spread / 111.0)
+    lng += rng.gauss(0, spread / (111.0 * math.cos(math.radians(lat))))
+
+    _, base_price, rooms_range = TYPES[property_type]
+    if property_type == 'Terrain':
+        surface = rng.randrange(150, 3000, 10)
+        price = surface * rng.randrange(150, 600) * price_factor
+        rooms = baths = None
+        title = f'Terrain de {surface} m² à {city}'
+    else:
+        rooms = rng.randint(*rooms_range)
+        baths = max(1, min(rooms - 1, round(rooms / 2 + rng.uniform(-0.5, 0.5))))
+        surface = rooms * rng.randrange(25, 60) + rng.randrange(20, 60)
+        price = base_price * price_factor * (0.6 + rooms / 5) * rng.lognormvariate(0, 0.35)
+        title = f'{property_type} S+{rooms} à {city}'
+
+    pool = FEATURES['common'] + FEATURES[property_type]
+    features = rng.sample(pool, rng.randint(0, min(8, len(pool))))
+    images = [IMAGE_URL.format(number=number, index=index) for index in range(rng.choices(
+        range(1, 9), weights=[6, 10, 16, 18, 16, 14, 10, 10],
+    )[0])]
+    agents = []
+    if agent_count:
+        agents.append(AGENT_EMAIL.format(number=rng.randint(1, agent_count)))
+        if rng.random() < 0.2:
+            agents.append(AGENT_EMAIL.format(number=rng.randint(1, agent_count)))
+
+    return {
+        # The reference keeps titles, and so slugs, unique.
+        'title': f'{title} (réf. {number:07d})',
+        'price_value': max(1000, round(price, -3)),
+        'location': city,
+        'rooms': rooms,
+        'baths': baths,
+        'surface': surface,
+        'sqft': round(surface * 10.764),
+        'property_type': property_type,
+        'description': (
+            f'{property_type} de {surface} m² situé(e) à {city}. '
+            + (f'{len(features)} atouts : {", ".join(features).lower()}.' if features else '')
+        ),
+        'lat': round(lat, 6),
+        'lng': round(lng, 6),
+        'features': features,
+        'images': images,
+        'agent_emails': agents,
+    }
+
+
+def property_rows(seed, start, stop, agent_count=0):
+    """Rows for property numbers start..stop-1, as bulk.read_rows() yields them."""
+    for number in range(start, stop):
+        yield number, property_row(seed, number, agent_count), None
+
+
+def create_agents(seed, count):
+    """Create agents 1..count that do not exist yet; returns how many were created."""
+    existing = set(Agent.objects.filter(email__endswith='@agents.example.com').values_list('email', flat=True))
+    agents = []
+    for number in range(1, count + 1):
+        email = AGENT_EMAIL.format(number=number)
+        if email in existing:
+            continue
+        rng = random.Random(f'{seed}:agent:{number}')
+        agents.append(Agent(
+            name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            phone=f'+216 {rng.randint(20, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}',
+            email=email,
+        ))
+    Agent.objects.bulk_create(agents, batch_size=1000)
+    return len(agents)
+
+
+def create_properties(seed, start, stop, agent_count=0, batch_size=bulk.DEFAULT_BATCH_SIZE):
+    """
+    Insert properties start..stop-1. Map clusters are left to the caller,
+    which rebuilds them once after all ranges are done.
+    """
+    importer = bulk.BulkImporter(batch_size=batch_size, update_clusters=False)
+    batch = []
+    for line_number, row, _ in property_rows(seed, start, stop, agent_count):
+        batch.append((line_number, row))
+        if len(batch) >= batch_size:
+            importer.import_batch(batch)
+            batch = []
+    if batch:
+        importer.import_batch(batch)
+    return importer.result()
+
+
+def create_properties_in_worker(seed, start, stop, agent_count, batch_size):
+    """
+    create_properties() in a forked worker process. The parent closes its
+    connections before forking, so the worker opens its own.
+    """
+    try:
+        return create_properties(seed, start, stop, agent_count, batch_size)
+    finally:
+        connections.close_all()
+
+
+def finish_properties():
+    """Derived data that is rebuilt once after a generation run."""
+    clusters.rebuild()
+    property_cache.invalidate_lists()
+
+
+def create_users(seed, count, password, batch_size=bulk.DEFAULT_BATCH_SIZE):
+    """Create users 1..count that do not exist yet, all with `password`; returns how many were created."""
+    User = get_user_model()
+    # One hash for every user: hashing is deliberately slow.
+    password_hash = make_password(password)
+    created = 0
+    for start in range(1, count + 1, batch_size):
+        numbers = range(start, min(start + batch_size, count + 1))
+        existing = set(User.objects.filter(
+            username__in=[USER_NAME.format(number=number) for number in numbers],
+        ).values_list('username', flat=True))
+        users = [
+            User(username=USER_NAME.format(number=number), email=USER_EMAIL.format(number=number), password=password_hash)
+            for number in numbers if USER_NAME.format(number=number) not in existing
+        ]
+        created += len(User.objects.bulk_create(users))
+    return created
+
+
+def create_favorites(seed, user_count, per_user, batch_size=bulk.DEFAULT_BATCH_SIZE):
+    """
+    Give generated users 1..user_count about `per_user` favorites each;
+    returns how many were added (existing ones are kept).
+
+    Picks are skewed towards the oldest listings, so a few properties are
+    favorited by many users, as in real traffic.
+    """
+    User = get_user_model()
+    property_ids = list(Property.objects.order_by('id').values_list('id', flat=True))
+    if not property_ids or not per_user:
+        return 0
+    names = [USER_NAME.format(number=number) for number in range(1, user_count + 1)]
+    before = Favorite.objects.count()
+    favorites = []
+    for start in range(0, len(names), batch_size):
+        users = User.objects.filter(username__in=names[start:start + batch_size]).values_list('id', 'username')
+        for user_id, username in users:
+            rng = random.Random(f'{seed}:favorites:{username}')
+            count = min(len(property_ids), max(0, round(rng.gauss(per_user, per_user / 3))))
+            picks = {property_ids[int(len(property_ids) * rng.random() ** 3)] for _ in range(count)}
+            favorites += [Favorite(user_id=user_id, property_id=property_id) for property_id in picks]
+            if len(favorites) >= batch_size:
+                Favorite.objects.bulk_create(favorites, ignore_conflicts=True)
+                favorites = []
+    Favorite.objects.bulk_create(favorites, ignore_conflicts=True)
+    return Favorite.objects.count() - before
@@ -0,0 +1,95 @@
+"""Small geographic helpers for the map endpoints."""
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+MAX_RADIUS_KM = 500
+
+
+class BoundsError(ValueError):
+    pass
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points, in kilometres."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def radius_bbox(lat, lng, radius_km):
+    """
+    Smallest (min_lat, min_lng, max_lat, max_lng) box containing the circle,
+    used as the indexable prefilter before the exact haversine check.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(lat))
+    lng_delta = 180.0 if cos_lat < 1e-6 else min(180.0, radius_km / (KM_PER_DEGREE_LAT * cos_lat))
+    return (
+        max(-90.0, lat - lat_delta),
+        max(-180.0, lng - lng_delta),
+        min(90.0, lat + lat_delta),
+        min(180.0, lng + lng_delta),
+    )
+
+
+def parse_bbox(value):
+    """
+    Parse "min_lng,min_lat,max_lng,max_lat" (the usual map-viewport order)
+    into (min_lat, min_lng, max_lat, max_lng).
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise BoundsError('bbox must be "min_lng,min_lat,max_lng,max_lat"')
+    if not (-90 <= min_lat <= max_lat <= 90) or not (-180 <= min_lng <= max_lng <= 180):
+        raise BoundsError('bbox is out of range or inverted')
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def parse_radius(lat, lng, radius):
+    """Parse center/radius query values into floats (radius in kilometres)."""
+    try:
+        lat, lng, radius = float(lat), float(lng), float(radius)
+    except (TypeError, ValueError):
+        raise BoundsError('lat, lng and radius must be numbers')
+    if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+        raise BoundsError('lat/lng out of range')
+    if not (0 < radius <= MAX_RADIUS_KM):
+        raise BoundsError(f'radius must be between 0 and {MAX_RADIUS_KM} km')
+    return lat, lng, radius
+
+
+# Clustering grid: each web-map tile at zoom z is split into
+# 2**CELL_SHIFT x 2**CELL_SHIFT cells (64px cells for 256px tiles).
+CELL_SHIFT = 2
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def cell_for(lat, lng, zoom):
+    """(x, y) of the grid cell containing a point at the given zoom level."""
+    cells = 1 << (zoom + CELL_SHIFT)
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    x = int((lng + 180.0) / 360.0 * cells)
+    sin_lat = math.sin(math.radians(lat))
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * cells)
+    return min(max(x, 0), cells - 1), min(max(y, 0), cells - 1)
+
+
+def cell_range(bounds, zoom):
+    """Inclusive ((min_x, max_x), (min_y, max_y)) cell ranges covering a bbox."""
+    min_lat, min_lng, max_lat, max_lng = bounds
+    min_x, min_y = cell_for(max_lat, min_lng, zoom)  # y grows southwards
+    max_x, max_y = cell_for(min_lat, max_lng, zoom)
+    return (min_x, max_x), (min_y, max_y)
+
+
+def cell_bounds(x, y, zoom):
+    """(min_lat, min_lng, max_lat, max_lng) of a grid cell."""
+    cells = 1 << (zoom + CELL_SHIFT)
+
+    def lat_at(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / cells))))
+
+    return lat_at(y + 1), x / cells * 360.0 - 180.0, lat_at(y), (x + 1) / cells * 360.0 - 180.0
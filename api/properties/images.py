@@ -0,0 +1,129 @@
+"""
+Background processing of uploaded property images.
+
+upload_image stores the original and returns straight away; the image is
+then queued here and resized into the VARIANTS below, each saved as WebP
+and JPEG next to the original. Variants are re-encoded from pixel data
+only, so EXIF (GPS position, camera serial, ...) is stripped - after the
+EXIF orientation has been applied. The resulting URLs are recorded on
+PropertyImage.variants and served by the list/detail serializers.
+
+The original keeps its metadata and is never published: an uploaded image
+has no image_url until it is processed, and then image_url is the largest
+JPEG variant (ORIGINAL_REPLACEMENT).
+
+Work runs on an in-process thread pool (Pillow releases the GIL while
+resampling and encoding), so no broker is needed. Jobs only start once the
+upload's transaction commits. A job lost to a worker restart leaves its
+image pending; `manage.py process_images` picks those up.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from .models import PropertyImage
+
+logger = logging.getLogger(__name__)
+
+# name -> longest edge in pixels
+VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'gallery': 1280,
+    'full': 2048,
+}
+# Served as image_url in place of the original upload.
+ORIGINAL_REPLACEMENT = ('full', 'jpeg')
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2),
+                    thread_name_prefix='image-processing',
+                )
+    return _executor
+
+
+def enqueue(image):
+    """Mark an uploaded image pending and process it once the transaction commits."""
+    PropertyImage.objects.filter(pk=image.pk).update(processing_status='pending')
+    image.processing_status = 'pending'
+    if getattr(settings, 'IMAGE_PROCESSING_SYNC', False):
+        transaction.on_commit(lambda: process(image.pk))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, image.pk))
+
+
+def _run_in_worker(image_id):
+    try:
+        process(image_id)
+    finally:
+        # Worker threads are not request threads: release their connection.
+        close_old_connections()
+
+
+def process(image_id):
+    """Generate all variants of one image. Returns True if it was processed."""
+    claimed = PropertyImage.objects.filter(
+        pk=image_id, processing_status__in=['pending', 'failed'],
+    ).update(processing_status='processing')
+    if not claimed:
+        return False
+
+    image = PropertyImage.objects.get(pk=image_id)
+    try:
+        variants = build_variants(image)
+    except Exception:
+        logger.exception('Processing image %s failed', image_id)
+        PropertyImage.objects.filter(pk=image_id).update(processing_status='failed')
+        return False
+
+    image.variants = variants
+    name, key = ORIGINAL_REPLACEMENT
+    image.image_url = variants[name][key]
+    image.processing_status = 'done'
+    # A regular save, so the signal handlers refresh the property's card
+    # columns and invalidate cached responses.
+    image.save(update_fields=['variants', 'image_url', 'processing_status'])
+    return True
+
+
+def build_variants(image):
+    with image.image.open('rb') as original:
+        source = Image.open(original)
+        source = ImageOps.exif_transpose(source)
+        source.load()
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+
+    base, _ = os.path.splitext(image.image.name)
+    variants = {}
+    for name, size in VARIANTS.items():
+        resized = source.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        urls = {}
+        for key, (pil_format, options) in FORMATS.items():
+            encoded = resized.convert('RGB') if pil_format == 'JPEG' else resized
+            buffer = io.BytesIO()
+            encoded.save(buffer, pil_format, **options)
+            path = default_storage.save(f'{base}_{name}.{key}', ContentFile(buffer.getvalue()))
+            urls[key] = default_storage.url(path)
+        variants[name] = {**urls, 'width': resized.width, 'height': resized.height}
+    return variants
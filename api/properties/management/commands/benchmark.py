@@ -0,0 +1,219 @@
+import json
+import platform
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from properties import benchmarks, generator
+from properties.models import Property
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the API endpoints (listing, detail, map, facets, favorites, '
+        'gallery updates, login, registration) in process or against a running '
+        'server. Reports latency percentiles, requests/s and SQL queries per '
+        'request, and can save the result as a baseline or compare with one. '
+        'With --login-load, measures listing latency under concurrent logins.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url',
+            help='Benchmark a running server over HTTP instead of the in-process client (no query counts)',
+        )
+        parser.add_argument('--requests', type=int, default=100, help='Timed requests per scenario (default: 100)')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Concurrent clients per scenario; --base-url only (default: 1)',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            help='Only run the named scenario; repeat for several (default: all)',
+        )
+        parser.add_argument(
+            '--generate',
+            type=int,
+            default=0,
+            help='Generate properties (see generate_properties) until there are at least this many',
+        )
+        parser.add_argument(
+            '--password',
+            default='loadtest-password',
+            help='Password of the benchmark user, created by generate_properties --users',
+        )
+        parser.add_argument(
+            '--with-cache',
+            action='store_true',
+            help='Keep the response cache; by default in-process runs bypass it so every request renders',
+        )
+        parser.add_argument('--save-baseline', metavar='FILE', help='Write the results to FILE as JSON')
+        parser.add_argument(
+            '--baseline',
+            metavar='FILE',
+            help='Compare with a saved baseline (e.g. benchmarks/baseline.json); fail on regressions',
+        )
+        parser.add_argument(
+            '--latency-tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed p95 growth over the baseline as a fraction (default: 0.25)',
+        )
+        parser.add_argument(
+            '--login-load',
+            type=int,
+            action='append',
+            metavar='CLIENTS',
+            help=(
+                'Instead of the scenarios, time the listing alone and then while CLIENTS threads log in '
+                'back to back; repeat for several levels. --base-url only'
+            ),
+        )
+        parser.add_argument(
+            '--queries-only',
+            action='store_true',
+            help='Compare query counts and errors only, for runs on different hardware than the baseline',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--requests and --concurrency must be positive')
+        if options['concurrency'] > 1 and not options['base_url']:
+            raise CommandError('--concurrency needs --base-url; the in-process client runs one request at a time')
+        if options['login_load']:
+            if not options['base_url']:
+                raise CommandError('--login-load needs --base-url; it measures a server under concurrent load')
+            if options['baseline'] or options['save_baseline'] or options['scenarios']:
+                raise CommandError('--login-load cannot be combined with --scenario or baselines')
+            if any(clients < 0 for clients in options['login_load']):
+                raise CommandError('--login-load must not be negative')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read the baseline: {e}')
+
+        if options['generate'] > Property.objects.count():
+            existing = Property.objects.count()
+            generator.create_agents(0, 50)
+            generator.create_properties(0, existing + 1, options['generate'] + 1, agent_count=50)
+            generator.finish_properties()
+
+        if options['login_load']:
+            self.run_login_load(benchmarks.HttpTransport(options['base_url']), options)
+            return
+
+        if options['base_url']:
+            transport = benchmarks.HttpTransport(options['base_url'])
+            results, context = self.run(transport, options)
+        else:
+            transport = benchmarks.ClientTransport()
+            # Writes are rolled back, so every run sees the same data.
+            with transaction.atomic():
+                if options['with_cache']:
+                    results, context = self.run(transport, options)
+                else:
+                    with benchmarks.uncached_responses():
+                        results, context = self.run(transport, options)
+                transaction.set_rollback(True)
+
+        self.report(results, transport.counts_queries)
+
+        if options['save_baseline']:
+            document = {
+                'meta': {
+                    'created_at': timezone.now().isoformat(),
+                    'mode': 'http' if options['base_url'] else 'client',
+                    'database': connection.vendor,
+                    'properties': context['properties'],
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                    'cache': bool(options['base_url'] or options['with_cache']),
+                    'python': platform.python_version(),
+                },
+                'scenarios': results,
+            }
+            with open(options['save_baseline'], 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(f'Baseline written to {options["save_baseline"]}')
+
+        if baseline is not None:
+            tolerance = None if options['queries_only'] else options['latency_tolerance']
+            regressions = benchmarks.compare(results, baseline, tolerance)
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def run(self, transport, options):
+        try:
+            context = benchmarks.prepare(transport, options['password'])
+        except benchmarks.BenchmarkError as e:
+            raise CommandError(str(e))
+        scenarios = benchmarks.build_scenarios(context)
+        if options['scenarios']:
+            known = {scenario.name: scenario for scenario in scenarios}
+            unknown = [name for name in options['scenarios'] if name not in known]
+            if unknown:
+                raise CommandError(f'Unknown scenario(s): {", ".join(unknown)}; choose from: {", ".join(known)}')
+            scenarios = [known[name] for name in options['scenarios']]
+
+        self.stdout.write(
+            f'{context["properties"]:,} properties, {connection.vendor}, '
+            f'{"HTTP " + options["base_url"] if options["base_url"] else "in-process client"}\n'
+        )
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = benchmarks.run_scenario(
+                transport, scenario, context, options['requests'], options['concurrency'],
+            )
+        return results, context
+
+    def run_login_load(self, transport, options):
+        try:
+            context = benchmarks.prepare(transport, options['password'])
+        except benchmarks.BenchmarkError as e:
+            raise CommandError(str(e))
+        listing = next(scenario for scenario in benchmarks.build_scenarios(context) if scenario.name == 'list')
+        self.stdout.write(f'{context["properties"]:,} properties, HTTP {options["base_url"]}\n')
+        self.stdout.write(
+            f'{"login clients":<15}{"logins/s":>10}{"refused":>9}{"list p50":>10}{"list p95":>10}'
+            f'{"list p99":>10}{"list req/s":>12}'
+        )
+        levels = [0] + sorted(set(options['login_load']) - {0})
+        for clients in levels:
+            result = benchmarks.run_login_load(
+                transport, listing, context, clients, options['requests'], options['concurrency'],
+            )
+            line = (
+                f'{clients:<15}{result["logins_per_s"]:>10.1f}{result["logins_refused"]:>9}'
+                f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}{result["rps"]:>12.1f}'
+            )
+            failed = result['errors'] or result['login_errors']
+            self.stdout.write(self.style.ERROR(line) if failed else line)
+            for sample in result['error_samples']:
+                self.stdout.write(self.style.ERROR(f'    {sample}'))
+            if result['login_errors']:
+                self.stdout.write(self.style.ERROR(f'    {result["login_errors"]} logins failed'))
+
+    def report(self, results, counts_queries):
+        self.stdout.write(
+            f'{"scenario":<18}{"reqs":>6}{"errors":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+            f'{"req/s":>9}{"queries":>9}'
+        )
+        for name, result in results.items():
+            queries = f'{result["queries"]}' if counts_queries else '-'
+            if counts_queries and result['max_queries'] != result['queries']:
+                queries += f'-{result["max_queries"]}'
+            line = (
+                f'{name:<18}{result["requests"]:>6}{result["errors"]:>8}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}{result["rps"]:>9.1f}{queries:>9}'
+            )
+            self.stdout.write(self.style.ERROR(line) if result['errors'] else line)
+            for sample in result['error_samples']:
+                self.stdout.write(self.style.ERROR(f'    {sample}'))
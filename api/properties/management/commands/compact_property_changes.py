@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from properties import changelog
+
+class Command(BaseCommand):
+    help = (
+        'Compacts the property change feed log: deletes entries superseded by a later change of the same '
+        'property and tombstones older than the retention. Run it periodically, e.g. daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tombstone-days',
+            type=int,
+            default=settings.PROPERTY_CHANGES_TOMBSTONE_DAYS,
+            help=(
+                'Days to keep tombstones of deleted properties; clients that synced less recently must '
+                f'start over (default: PROPERTY_CHANGES_TOMBSTONE_DAYS, {settings.PROPERTY_CHANGES_TOMBSTONE_DAYS})'
+            ),
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='First log every property that has no entry yet, e.g. after upgrading an existing database',
+        )
+
+    def handle(self, *args, **options):
+        if options['tombstone_days'] < 0:
+            raise CommandError('--tombstone-days must not be negative')
+        if options['backfill']:
+            self.stdout.write(f'Logged {changelog.backfill()} properties')
+        result = changelog.compact(options['tombstone_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {result["superseded"]} superseded entries and {result["tombstones"]} tombstones; '
+            f'cursors below {result["horizon"]} have expired'
+        ))
@@ -0,0 +1,172 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from properties import benchmarks, generator
+from properties.models import AgentProperty, Favorite, Property, PropertyImage
+
+# (name, path); {id} is replaced by a property id from the middle of the table.
+SCENARIOS = [
+    ('list', '/api/properties/'),
+    ('list by price', '/api/properties/?ordering=price_value'),
+    ('filter type', '/api/properties/?type=Villa'),
+    ('filter type + price, by price', '/api/properties/?type=Villa&price_min=300000&price_max=900000&ordering=-price_value'),
+    ('filter rooms/baths', '/api/properties/?rooms_min=3&baths_min=2'),
+    ('filter location', '/api/properties/?location=sousse'),
+    ('search', '/api/properties/?search=piscine'),
+    ('facets', '/api/properties/facets/?type=Villa'),
+    ('detail', '/api/properties/{id}/'),
+    ('agents', '/api/agents/'),
+    ('agents by listings, filter type', '/api/agents/?ordering=-listing_count&type=Villa'),
+]
+
+
+def _indexes():
+    """Names of the indexes the properties models declare."""
+    names = []
+    for model in (Property, PropertyImage, Favorite, AgentProperty):
+        names += [index.name for index in model._meta.indexes]
+        # Conditional unique constraints are created as (partial) indexes.
+        names += [constraint.name for constraint in model._meta.constraints if constraint.condition is not None]
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the SQL behind the main property endpoints (list, filters, facets, '
+        'detail, agents directory) and prints each query with its EXPLAIN plan and timings. With '
+        '--compare the same scenarios are run again after dropping the indexes '
+        'declared on the properties models, inside a transaction that is rolled '
+        'back, to show what the indexes buy. Run it against a copy of the data: '
+        'the dropped indexes lock their tables until the run ends.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Generate properties (see generate_properties) until the table holds at least this many rows',
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query (default: 5)')
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Use EXPLAIN ANALYZE on PostgreSQL (executes the query once more)',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also run every scenario without the model indexes and print both timings',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            help='Only run the named scenario; repeat for several (default: all)',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0:
+            raise CommandError('--repeat must be positive')
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'EXPLAIN output is only supported on PostgreSQL and SQLite, not {connection.vendor}')
+
+        scenarios = SCENARIOS
+        if options['scenarios']:
+            known = dict(SCENARIOS)
+            unknown = [name for name in options['scenarios'] if name not in known]
+            if unknown:
+                raise CommandError(f'Unknown scenario(s): {", ".join(unknown)}; choose from: {", ".join(known)}')
+            scenarios = [(name, known[name]) for name in options['scenarios']]
+
+        if options['seed']:
+            self.seed(options['seed'])
+        count = Property.objects.count()
+        if not count:
+            raise CommandError('No properties found; use --seed to generate some')
+        middle = Property.objects.order_by('id').values_list('id', flat=True)[count // 2]
+        scenarios = [(name, path.format(id=middle)) for name, path in scenarios]
+        self.stdout.write(f'{count:,} properties, {connection.vendor}\n')
+
+        with_indexes = self.run(scenarios, options)
+        if not options['compare']:
+            return
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for name in _indexes():
+                    cursor.execute(f'DROP INDEX IF EXISTS {connection.ops.quote_name(name)}')
+            self.stdout.write(self.style.MIGRATE_HEADING('\nWithout model indexes\n'))
+            without_indexes = self.run(scenarios, options)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nSummary (SQL time per request, median ms)'))
+        self.stdout.write(f'{"scenario":<34}{"without":>10}{"with":>10}{"speed-up":>10}')
+        for name, _ in scenarios:
+            before, after = without_indexes[name], with_indexes[name]
+            speedup = f'{before / after:.1f}x' if after else '-'
+            self.stdout.write(f'{name:<34}{before:>10.2f}{after:>10.2f}{speedup:>10}')
+
+    def run(self, scenarios, options):
+        """Print every scenario's queries and plans; returns {name: total median ms}."""
+        totals = {}
+        with benchmarks.uncached_responses():
+            client = Client()
+            for name, path in scenarios:
+                with CaptureQueriesContext(connection) as captured:
+                    response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f'{name}: GET {path} returned {response.status_code}')
+                queries = [query['sql'] for query in captured.captured_queries
+                           if query['sql'].lstrip().upper().startswith('SELECT')]
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: GET {path} ({len(queries)} queries)'))
+                total = 0
+                for sql in queries:
+                    elapsed = self.time_query(sql, options['repeat'])
+                    total += elapsed
+                    self.stdout.write(f'  {elapsed:8.2f} ms  {sql}')
+                    for line in self.explain(sql, options['analyze']):
+                        self.stdout.write(f'              {line}')
+                totals[name] = total
+        return totals
+
+    def time_query(self, sql, repeat):
+        timings = []
+        with connection.cursor() as cursor:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def explain(self, sql, analyze):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {"(ANALYZE, BUFFERS) " if analyze else ""}{sql}')
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            # (id, parent, notused, detail); indent by depth.
+            depth = {0: -1}
+            lines = []
+            for node, parent, _, detail in cursor.fetchall():
+                depth[node] = depth.get(parent, -1) + 1
+                lines.append('  ' * depth[node] + detail)
+            return lines
+
+    def seed(self, target):
+        existing = Property.objects.count()
+        if existing >= target:
+            return
+        self.stdout.write(f'Generating {target - existing:,} properties...')
+        started = time.perf_counter()
+        # Continue the generator's numbering, so re-runs add the same rows.
+        result = generator.create_properties(0, existing + 1, target + 1)
+        generator.finish_properties()
+        if result['failed']:
+            raise CommandError(f'{result["failed"]} generated rows were rejected: {result["errors"][:3]}')
+        self.stdout.write(f'Generated {result["created"]:,} properties in {time.perf_counter() - started:.1f}s\n')
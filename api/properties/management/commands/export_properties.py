@@ -0,0 +1,36 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from properties import bulk
+from properties.models import Property
+
+class Command(BaseCommand):
+    help = 'Exports all properties as CSV or JSON Lines, in the format import_properties reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file (default: '-', standard output)")
+        parser.add_argument(
+            '--format',
+            choices=bulk.FORMATS,
+            help='Output format (default: from the file extension, else csv)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=bulk.DEFAULT_BATCH_SIZE,
+            help=f'Properties loaded per query (default: {bulk.DEFAULT_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        rows = bulk.export_rows(Property.objects.all(), batch_size=options['batch_size'])
+        output = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+        try:
+            for chunk in bulk.render_rows(rows, file_format):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,97 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from properties import bulk, generator
+
+class Command(BaseCommand):
+    help = (
+        'Generates deterministic synthetic properties (with features, images and '
+        'agents), and optionally users with favorites, for load and benchmark '
+        'testing. The same --seed and numbers always produce the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Number of properties to generate')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument(
+            '--start',
+            type=int,
+            default=1,
+            help='Number of the first property, to extend an earlier run with the same seed (default: 1)',
+        )
+        parser.add_argument('--agents', type=int, default=50, help='Agents to spread the properties over (default: 50)')
+        parser.add_argument('--users', type=int, default=0, help='Users to generate (default: 0)')
+        parser.add_argument('--favorites', type=int, default=20, help='Average favorites per user (default: 20)')
+        parser.add_argument(
+            '--password',
+            default='loadtest-password',
+            help='Password of the generated users, for authenticated benchmarks',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes inserting properties in parallel; PostgreSQL only (default: 1)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=bulk.DEFAULT_BATCH_SIZE,
+            help=f'Properties per transaction (default: {bulk.DEFAULT_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        count, start, workers = options['count'], options['start'], options['workers']
+        if count < 0 or start < 1 or options['agents'] < 0 or options['users'] < 0 or options['favorites'] < 0:
+            raise CommandError('Counts must not be negative and --start must be at least 1')
+        if workers <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--workers and --batch-size must be positive')
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; using a single worker'))
+            workers = 1
+        seed = options['seed']
+
+        started = time.perf_counter()
+        agents = generator.create_agents(seed, options['agents'])
+        if agents:
+            self.stdout.write(f'Created {agents} agents')
+
+        if count:
+            stop = start + count
+            if workers == 1:
+                results = [generator.create_properties(seed, start, stop, options['agents'], options['batch_size'])]
+            else:
+                results = self.run_workers(seed, start, stop, options['agents'], options['batch_size'], workers)
+            generator.finish_properties()
+            created = sum(result['created'] for result in results)
+            failed = sum(result['failed'] for result in results)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Created {created:,} properties in {elapsed:.1f}s ({created / max(elapsed, 1e-9):,.0f}/s)'
+            )
+            if failed:
+                errors = [error for result in results for error in result['errors']][:5]
+                raise CommandError(f'{failed} generated properties were rejected, e.g. {errors}')
+
+        if options['users']:
+            users = generator.create_users(seed, options['users'], options['password'], options['batch_size'])
+            favorites = generator.create_favorites(seed, options['users'], options['favorites'], options['batch_size'])
+            self.stdout.write(f'Created {users:,} users and {favorites:,} favorites')
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+
+    def run_workers(self, seed, start, stop, agent_count, batch_size, workers):
+        # Contiguous ranges in whole batches, one per worker.
+        per_worker = -(-(stop - start) // workers)
+        per_worker = -(-per_worker // batch_size) * batch_size
+        ranges = [(low, min(low + per_worker, stop)) for low in range(start, stop, per_worker)]
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=len(ranges), mp_context=multiprocessing.get_context('fork')) as pool:
+            futures = [
+                pool.submit(generator.create_properties_in_worker, seed, low, high, agent_count, batch_size)
+                for low, high in ranges
+            ]
+            return [future.result() for future in futures]
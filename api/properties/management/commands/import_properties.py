@@ -0,0 +1,53 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from properties import bulk
+
+class Command(BaseCommand):
+    help = 'Imports properties with their features, images and agent links from CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input")
+        parser.add_argument(
+            '--format',
+            choices=bulk.FORMATS,
+            help='Input format (default: from the file extension, else csv)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=bulk.DEFAULT_BATCH_SIZE,
+            help=f'Rows validated and written per transaction (default: {bulk.DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        def report(entry):
+            messages = '; '.join(
+                f'{field}: {" ".join(errors)}' for field, errors in entry['errors'].items()
+            )
+            self.stderr.write(f"Line {entry['line']}: {messages}")
+
+        importer = bulk.BulkImporter(
+            batch_size=options['batch_size'], dry_run=options['dry_run'], max_errors=0, on_error=report,
+        )
+        started = time.perf_counter()
+        source = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            importer.run(bulk.read_rows(bulk.decode_lines(source), file_format))
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {importer.created} properties in {time.perf_counter() - started:.1f}s '
+            f'({importer.failed} rows rejected)'
+        ))
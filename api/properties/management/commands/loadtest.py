@@ -0,0 +1,96 @@
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = [
+    '/api/properties/',
+    '/api/properties/?type=Villa&price_max=1500000',
+    '/api/properties/?ordering=price_value&page_size=50',
+]
+
+class Command(BaseCommand):
+    help = (
+        'Fires a fixed, repeatable mix of GET requests at a running API server and '
+        'reports throughput and latency percentiles. Run it once against '
+        'DJANGO_SERVER=runserver and once against DJANGO_SERVER=wsgi to compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Server to test')
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Path to request; repeat for a mix (default: a list/filter/ordering mix)',
+        )
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients (default: 16)')
+        parser.add_argument('--requests', type=int, default=2000, help='Total requests (default: 2000)')
+        parser.add_argument('--warmup', type=int, default=50, help='Untimed warm-up requests (default: 50)')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] <= 0 or options['requests'] <= 0:
+            raise CommandError('--concurrency and --requests must be positive')
+
+        base_url = options['base_url'].rstrip('/')
+        paths = options['paths'] or DEFAULT_PATHS
+        # Round-robin over the paths so every run issues the same sequence.
+        urls = [base_url + paths[i % len(paths)] for i in range(options['requests'])]
+        timeout = options['timeout']
+
+        for i in range(options['warmup']):
+            self.fetch(base_url + paths[i % len(paths)], timeout)
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def run(url):
+            started = time.perf_counter()
+            error = self.fetch(url, timeout)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if error:
+                    errors.append(error)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(run, urls))
+        wall_time = time.perf_counter() - started
+
+        self.report(latencies, errors, wall_time, options['concurrency'])
+
+    def fetch(self, url, timeout):
+        request = urllib.request.Request(url, headers={'Accept': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            return f'HTTP {e.code}'
+        except (urllib.error.URLError, OSError) as e:
+            return type(e).__name__
+        return None
+
+    def report(self, latencies, errors, wall_time, concurrency):
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))] * 1000
+
+        self.stdout.write(f'Requests:     {len(latencies)} ({concurrency} concurrent)')
+        self.stdout.write(f'Wall time:    {wall_time:.2f}s')
+        self.stdout.write(f'Throughput:   {len(latencies) / wall_time:.1f} req/s')
+        self.stdout.write(
+            f'Latency (ms): mean {statistics.mean(latencies) * 1000:.1f}  '
+            f'p50 {percentile(50):.1f}  p95 {percentile(95):.1f}  p99 {percentile(99):.1f}'
+        )
+        if errors:
+            kinds = {kind: errors.count(kind) for kind in set(errors)}
+            self.stdout.write(self.style.WARNING(f'Errors:       {len(errors)} {kinds}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Errors:       0'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from properties import images
+from properties.models import PropertyImage
+
+class Command(BaseCommand):
+    help = 'Generates variants for uploaded images that are still pending (e.g. after a worker restart)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also retry images whose processing failed',
+        )
+        parser.add_argument(
+            '--reset-stuck',
+            action='store_true',
+            help="Also requeue images left in 'processing' by a crashed worker",
+        )
+
+    def handle(self, *args, **options):
+        statuses = ['pending']
+        if options['retry_failed']:
+            statuses.append('failed')
+        if options['reset_stuck']:
+            PropertyImage.objects.filter(processing_status='processing').update(processing_status='pending')
+
+        processed = failed = 0
+        image_ids = list(
+            PropertyImage.objects.filter(processing_status__in=statuses).values_list('id', flat=True)
+        )
+        for image_id in image_ids:
+            if images.process(image_id):
+                processed += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Image {image_id} was not processed'))
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} images ({failed} skipped or failed)'))
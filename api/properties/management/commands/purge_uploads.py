@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from properties import uploads
+from properties.models import ImageUpload
+
+class Command(BaseCommand):
+    help = 'Deletes resumable image uploads that have not received a chunk recently, with their staged files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=24,
+            help='Hours since the last chunk after which an upload is abandoned (default: 24)',
+        )
+
+    def handle(self, *args, **options):
+        if options['older_than'] <= 0:
+            raise CommandError('--older-than must be positive')
+        cutoff = timezone.now() - timedelta(hours=options['older_than'])
+        purged = 0
+        for upload in ImageUpload.objects.filter(updated_at__lt=cutoff):
+            uploads.discard_upload(upload)
+            purged += 1
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} abandoned uploads'))
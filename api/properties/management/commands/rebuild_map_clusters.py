@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from properties import clusters
+
+class Command(BaseCommand):
+    help = 'Recomputes the pre-aggregated map marker clusters from the Property table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows read and clusters inserted per batch (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        cells = clusters.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} map clusters'))
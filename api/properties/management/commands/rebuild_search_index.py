@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from properties import search
+from properties.models import Property
+
+class Command(BaseCommand):
+    help = 'Recomputes the full-text search document of every property'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Properties processed per UPDATE batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        updated = search.refresh_documents(Property.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search documents for {updated} properties'))
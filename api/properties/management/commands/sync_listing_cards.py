@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from properties.models import Property, card_field_expressions
+
+CARD_FIELDS = ['primary_image_url', 'primary_image_variants', 'feature_count', 'primary_agent_id']
+
+class Command(BaseCommand):
+    help = 'Backfills or verifies the denormalized listing-card columns on Property'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report properties whose card columns are out of sync; do not write',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of property ids processed per UPDATE/SELECT (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        bounds = Property.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write(self.style.WARNING('No properties found'))
+            return
+
+        if options['verify']:
+            self.verify(bounds['low'], bounds['high'], batch_size)
+        else:
+            self.backfill(bounds['low'], bounds['high'], batch_size)
+
+    def batches(self, low, high, batch_size):
+        for start in range(low, high + 1, batch_size):
+            yield Property.objects.filter(id__gte=start, id__lt=start + batch_size)
+
+    def backfill(self, low, high, batch_size):
+        updated = 0
+        for batch in self.batches(low, high, batch_size):
+            updated += batch.refresh_card_fields()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed listing-card columns for {updated} properties'))
+
+    def verify(self, low, high, batch_size):
+        expected = {f'expected_{name}': value for name, value in card_field_expressions().items()}
+        mismatched = []
+        for batch in self.batches(low, high, batch_size):
+            rows = batch.annotate(**expected).values('id', *CARD_FIELDS, *expected)
+            for row in rows:
+                if (row['primary_image_url'] != row['expected_primary_image_url']
+                        or row['primary_image_variants'] != row['expected_primary_image_variants']
+                        or row['feature_count'] != row['expected_feature_count']
+                        or row['primary_agent_id'] != row['expected_primary_agent']):
+                    mismatched.append(row['id'])
+
+        if mismatched:
+            preview = ', '.join(str(pk) for pk in mismatched[:20])
+            raise CommandError(
+                f'{len(mismatched)} properties have stale listing-card columns (ids: {preview}'
+                f'{", ..." if len(mismatched) > 20 else ""}). Run sync_listing_cards to fix them.'
+            )
+        self.stdout.write(self.style.SUCCESS('All listing-card columns are in sync'))
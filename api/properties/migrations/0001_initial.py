@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import properties.models
+
+
+class Migration(migrations.Migration):
+    """
+    The schema the project started from. Databases created earlier with
+    `migrate --run-syncdb` have these tables but no migration records.
+    Record users' initial migration by hand, since admin's migrations were
+    applied before it:
+        INSERT INTO django_migrations (app, name, applied)
+        VALUES ('users', '0001_initial', CURRENT_TIMESTAMP);
+    then run `manage.py migrate --fake-initial`.
+    """
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Property',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('slug', models.SlugField(blank=True, max_length=255, unique=True)),
+                ('price_value', models.IntegerField()),
+                ('location', models.CharField(blank=True, max_length=255, null=True)),
+                ('rooms', models.IntegerField(blank=True, null=True)),
+                ('baths', models.IntegerField(blank=True, null=True)),
+                ('surface', models.FloatField(blank=True, null=True)),
+                ('dimensions', models.CharField(blank=True, max_length=255, null=True)),
+                ('sqft', models.IntegerField(blank=True, null=True)),
+                ('property_type', models.CharField(choices=[('Terrain', 'Terrain'), ('Appartement', 'Appartement'), ('Villa', 'Villa'), ('Maison', 'Maison'), ('Résidence', 'Résidence')], max_length=50)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('lat', models.FloatField(blank=True, null=True)),
+                ('lng', models.FloatField(blank=True, null=True)),
+                ('is_favorite', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Properties',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PropertyImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to=properties.models.get_image_path)),
+                ('image_url', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_primary', models.BooleanField(default=False)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='properties.property')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PropertyFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feature', models.CharField(max_length=255)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='features', to='properties.property')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Agent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('phone', models.CharField(max_length=50)),
+                ('email', models.EmailField(max_length=254)),
+                ('image_url', models.CharField(blank=True, max_length=255, null=True)),
+                ('properties', models.ManyToManyField(blank=True, related_name='agents', to='properties.property')),
+            ],
+        ),
+    ]
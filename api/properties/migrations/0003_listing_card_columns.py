@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def fill_listing_cards(apps, schema_editor):
+    # The same subqueries as models.card_field_expressions(), on the historical models.
+    Property = apps.get_model('properties', 'Property')
+    PropertyImage = apps.get_model('properties', 'PropertyImage')
+    PropertyFeature = apps.get_model('properties', 'PropertyFeature')
+    AgentLink = apps.get_model('properties', 'Agent').properties.through
+    primary_image = PropertyImage.objects.filter(
+        property=models.OuterRef('pk'), is_primary=True,
+    ).order_by('id').values('image_url')[:1]
+    feature_count = PropertyFeature.objects.filter(
+        property=models.OuterRef('pk'),
+    ).order_by().values('property').annotate(count=models.Count('id')).values('count')
+    primary_agent = AgentLink.objects.filter(property=models.OuterRef('pk')).order_by('agent_id').values('agent_id')[:1]
+    Property.objects.update(
+        primary_image_url=models.Subquery(primary_image),
+        feature_count=Coalesce(models.Subquery(feature_count), 0),
+        primary_agent=models.Subquery(primary_agent),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='feature_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='primary_agent',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='primary_properties', to='properties.agent'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='primary_image_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_listing_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0003_listing_card_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['lat', 'lng'], name='property_lat_lng_idx'),
+        ),
+    ]
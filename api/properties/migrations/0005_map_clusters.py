@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0004_lat_lng_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('lat_sum', models.FloatField(default=0)),
+                ('lng_sum', models.FloatField(default=0)),
+                ('min_price', models.IntegerField(null=True)),
+                ('max_price', models.IntegerField(null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='mapcluster',
+            constraint=models.UniqueConstraint(fields=('zoom', 'cell_x', 'cell_y'), name='mapcluster_cell_unique'),
+        ),
+    ]
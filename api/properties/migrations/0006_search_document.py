@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:58
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+from properties.models import USES_POSTGRES
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_map_clusters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # As in Property.Meta, the GIN index only exists on PostgreSQL.
+        *([migrations.AddIndex(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='property_search_vector_idx'),
+        )] if USES_POSTGRES else []),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+def keep_one_primary(apps, schema_editor):
+    # Demote all but the oldest primary image of each property, so the
+    # constraint below can be created.
+    PropertyImage = apps.get_model('properties', 'PropertyImage')
+    oldest = PropertyImage.objects.filter(
+        property=models.OuterRef('property'), is_primary=True,
+    ).order_by('id').values('id')[:1]
+    PropertyImage.objects.filter(is_primary=True).exclude(id=models.Subquery(oldest)).update(is_primary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0008_image_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(keep_one_primary, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='propertyimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_primary', True)), fields=('property',), name='propertyimage_single_primary'),
+        ),
+    ]
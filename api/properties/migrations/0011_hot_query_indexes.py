@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_favorites'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'created_at', 'id'], name='property_type_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'price_value', 'id'], name='property_type_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['location'], name='property_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['updated_at'], name='property_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyimage',
+            index=models.Index(fields=['property', '-is_primary', 'position', 'id'], name='propertyimage_gallery_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyimage',
+            index=models.Index(condition=models.Q(('processing_status__in', ['pending', 'processing', 'failed'])), fields=['processing_status'], name='propertyimage_pending_idx'),
+        ),
+    ]
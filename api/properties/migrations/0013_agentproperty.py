@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def adopt_link_table(apps, schema_editor):
+    """
+    Replace the indexes Django created for the implicit link table (a
+    unique (agent_id, property_id) constraint and one index per foreign
+    key) with those AgentProperty declares. The table and its rows stay.
+    """
+    AgentProperty = apps.get_model('properties', 'AgentProperty')
+    table = AgentProperty._meta.db_table
+    declared = AgentProperty._meta.constraints + AgentProperty._meta.indexes
+    connection = schema_editor.connection
+
+    def existing():
+        with connection.cursor() as cursor:
+            return connection.introspection.get_constraints(cursor, table)
+
+    for name, info in existing().items():
+        # Declared ones are kept, so migrating forward again (after a
+        # rollback, whose reverse is a no-op) works.
+        if any(item.name == name for item in declared):
+            continue
+        if info['primary_key'] or info['foreign_key'] or info['check'] or not (info['unique'] or info['index']):
+            continue
+        template = schema_editor.sql_delete_unique if info['unique'] else schema_editor.sql_delete_index
+        schema_editor.execute(template % {
+            'table': schema_editor.quote_name(table),
+            'name': schema_editor.quote_name(name),
+        })
+    for constraint in AgentProperty._meta.constraints:
+        if constraint.name not in existing():
+            schema_editor.add_constraint(AgentProperty, constraint)
+    # SQLite adds a constraint by rebuilding the table, declared indexes
+    # included, so look again.
+    for index in AgentProperty._meta.indexes:
+        if index.name not in existing():
+            schema_editor.add_index(AgentProperty, index)
+
+
+class Migration(migrations.Migration):
+    """
+    Agent.properties gets an explicit through model, AgentProperty, on the
+    existing properties_agent_properties table. The autodetector would drop
+    and recreate the table (losing every assignment), so the state change
+    and the database change are declared separately: the state gains the
+    model, and the database only swaps indexes.
+    """
+
+    dependencies = [
+        ('properties', '0012_change_log'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='AgentProperty',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('agent', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='properties.agent')),
+                        ('property', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='properties.property')),
+                    ],
+                    options={
+                        'db_table': 'properties_agent_properties',
+                        'indexes': [models.Index(fields=['property', 'agent'], name='agentproperty_property_idx')],
+                        'constraints': [models.UniqueConstraint(fields=('agent', 'property'), name='agentproperty_agent_uniq')],
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='agent',
+                    name='properties',
+                    field=models.ManyToManyField(blank=True, related_name='agents', through='properties.AgentProperty', to='properties.property'),
+                ),
+            ],
+        ),
+        migrations.RunPython(adopt_link_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+def unpublish_originals(apps, schema_editor):
+    # Uploaded images used to be served from the original file, EXIF and all:
+    # point them at their largest JPEG variant, or at nothing until processed.
+    Property = apps.get_model('properties', 'Property')
+    PropertyImage = apps.get_model('properties', 'PropertyImage')
+    uploaded = PropertyImage.objects.exclude(image='')
+    for image in uploaded.iterator():
+        url = (image.variants or {}).get('full', {}).get('jpeg')
+        if image.image_url != url:
+            PropertyImage.objects.filter(pk=image.pk).update(image_url=url)
+    # The same subquery as models.card_field_expressions().
+    primary_image = PropertyImage.objects.filter(
+        property=models.OuterRef('pk'), is_primary=True,
+    ).order_by('id').values('image_url')[:1]
+    Property.objects.filter(pk__in=uploaded.values('property')).update(
+        primary_image_url=models.Subquery(primary_image),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0013_agentproperty'),
+    ]
+
+    operations = [
+        migrations.RunPython(unpublish_originals, migrations.RunPython.noop),
+    ]
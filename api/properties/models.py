@@ -1,4 +1,10 @@
-from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
 import os
 import uuid
@@ -9,7 +15,66 @@ def get_image_path(instance, filename):
     filename = f"{uuid.uuid4()}.{ext}"
     return os.path.join('properties', str(instance.property.id), filename)
 
-class Property(models.Model):
+# GIN indexes only exist on PostgreSQL; other backends use the plain
+# search_text fallback (see properties.search).
+USES_POSTGRES = settings.DATABASES['default']['ENGINE'].endswith('postgresql')
+
+class PropertyQuerySet(models.QuerySet):
+    def for_detail(self):
+        """Load everything PropertyDetailSerializer needs in a fixed number of queries."""
+        return self.select_related('primary_agent').prefetch_related(
+            'features',
+            models.Prefetch('images', queryset=PropertyImage.objects.order_by('-is_primary', 'position', 'id')),
+        )
+
+    def refresh_card_fields(self):
+        """
+        Recompute the denormalized listing-card columns (primary_image_url,
+        primary_image_variants, feature_count, primary_agent) for every property in this queryset
+        with a single UPDATE. updated_at is touched as well, since the
+        related rows they derive from just changed.
+        """
+        return self.update(**card_field_expressions(), updated_at=timezone.now())
+
+    def touch(self):
+        """Mark properties as modified without running save()/full_clean()."""
+        return self.update(updated_at=timezone.now())
+
+def card_field_expressions():
+    """Subquery expressions that compute the listing-card columns from the related tables."""
+    primary_image = PropertyImage.objects.filter(
+        property=models.OuterRef('pk'), is_primary=True,
+    ).order_by('id').values('image_url')[:1]
+    feature_count = PropertyFeature.objects.filter(
+        property=models.OuterRef('pk'),
+    ).order_by().values('property').annotate(count=models.Count('id')).values('count')
+    primary_agent = Agent.properties.through.objects.filter(
+        property=models.OuterRef('pk'),
+    ).order_by('agent_id').values('agent_id')[:1]
+    primary_image_variants = PropertyImage.objects.filter(
+        property=models.OuterRef('pk'), is_primary=True,
+    ).order_by('id').values('variants')[:1]
+    return {
+        'primary_image_url': models.Subquery(primary_image),
+        'primary_image_variants': models.Subquery(primary_image_variants, output_field=models.JSONField()),
+        'feature_count': Coalesce(models.Subquery(feature_count), 0),
+        'primary_agent': models.Subquery(primary_agent),
+    }
+
+class ChangeLoggedModel(models.Model):
+    """
+    Saves inside a transaction together with the post_save handlers, so the
+    change log entries they write (properties.changelog) commit or roll
+    back with the row. Deletes and m2m changes already run that way.
+    """
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+class Property(ChangeLoggedModel):
     PROPERTY_TYPES = [
         ('Terrain', 'Terrain'),
         ('Appartement', 'Appartement'), 
@@ -33,13 +98,42 @@ class Property(models.Model):
     description = models.TextField(blank=True, null=True)
     lat = models.FloatField(null=True, blank=True)
     lng = models.FloatField(null=True, blank=True)
-    is_favorite = models.BooleanField(default=False)
+    # Denormalized listing-card columns, kept in sync by properties.signals
+    # and checked with `manage.py sync_listing_cards --verify`.
+    primary_image_url = models.CharField(max_length=255, blank=True, null=True, editable=False)
+    primary_image_variants = models.JSONField(blank=True, null=True, editable=False)
+    feature_count = models.PositiveIntegerField(default=0, editable=False)
+    primary_agent = models.ForeignKey(
+        'Agent', related_name='primary_properties', on_delete=models.SET_NULL,
+        blank=True, null=True, editable=False,
+    )
+    # Search document, maintained by properties.search.
+    search_text = models.TextField(blank=True, default='', editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PropertyQuerySet.as_manager()
+    
     class Meta:
         verbose_name_plural = 'Properties'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination indexes; btree scans serve both directions.
+            models.Index(fields=['created_at', 'id'], name='property_created_id_idx'),
+            models.Index(fields=['price_value', 'id'], name='property_price_id_idx'),
+            # ?type= listings in either ordering, and the type facet.
+            models.Index(fields=['property_type', 'created_at', 'id'], name='property_type_created_id_idx'),
+            models.Index(fields=['property_type', 'price_value', 'id'], name='property_type_price_id_idx'),
+            # Location facet (GROUP BY). ?location= is a substring match,
+            # which a btree cannot serve.
+            models.Index(fields=['location'], name='property_location_idx'),
+            # Max(updated_at) for collection ETags (see properties.cache).
+            models.Index(fields=['updated_at'], name='property_updated_at_idx'),
+            # Map viewport/radius prefilter (see properties.geo).
+            models.Index(fields=['lat', 'lng'], name='property_lat_lng_idx'),
+            *([GinIndex(fields=['search_vector'], name='property_search_vector_idx')] if USES_POSTGRES else []),
+        ]
     
     def __str__(self):
         return self.title
@@ -61,33 +155,187 @@ class Property(models.Model):
         self.full_clean()  # Ensure validation runs on save
         super().save(*args, **kwargs)
 
-class PropertyFeature(models.Model):
+class PropertyFeature(ChangeLoggedModel):
     property = models.ForeignKey(Property, related_name='features', on_delete=models.CASCADE)
     feature = models.CharField(max_length=255)
     
     def __str__(self):
         return f"{self.property.title} - {self.feature}"
 
-class PropertyImage(models.Model):
+class PropertyImage(ChangeLoggedModel):
+    PROCESSING_STATUSES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
     property = models.ForeignKey(Property, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to=get_image_path)
+    # Never the uploaded original, which still carries its EXIF metadata:
+    # properties.images sets it to a variant once they have been generated.
     image_url = models.CharField(max_length=255, blank=True, null=True)
     is_primary = models.BooleanField(default=False)
+    # Gallery order after the primary image; see properties.galleries.
+    position = models.PositiveIntegerField(default=0)
+    # Resized copies generated by properties.images for uploaded files:
+    # {"card": {"webp": url, "jpeg": url, "width": w, "height": h}, ...}.
+    # Images given only by URL have no variants and an empty status.
+    variants = models.JSONField(default=dict, blank=True)
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUSES, blank=True, default='')
+    
+    class Meta:
+        constraints = [
+            # At most one primary image per property.
+            models.UniqueConstraint(
+                fields=['property'], condition=models.Q(is_primary=True), name='propertyimage_single_primary',
+            ),
+        ]
+        indexes = [
+            # Gallery order; the single-primary index above already serves
+            # the (property, is_primary=True) card lookup.
+            models.Index(fields=['property', '-is_primary', 'position', 'id'], name='propertyimage_gallery_idx'),
+            # Images still waiting for variants (process_images).
+            models.Index(
+                fields=['processing_status'], name='propertyimage_pending_idx',
+                condition=models.Q(processing_status__in=['pending', 'processing', 'failed']),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.property.title} - {'Primary' if self.is_primary else 'Secondary'}"
-    
-    def save(self, *args, **kwargs):
-        if self.image and not self.image_url:
-            self.image_url = self.image.url
-        super().save(*args, **kwargs)
 
-class Agent(models.Model):
+class ImageUpload(models.Model):
+    """
+    A resumable image upload in progress (see properties.uploads). The bytes
+    received so far are in a staging file; the PropertyImage is created
+    when the last chunk arrives.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    property = models.ForeignKey(Property, related_name='uploads', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    is_primary = models.BooleanField(default=False)
+    # Set once the leading bytes have been identified as an accepted image.
+    image_format = models.CharField(max_length=10, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    def staging_path(self):
+        return os.path.join(settings.IMAGE_UPLOAD_STAGING_DIR, f'{self.id}.part')
+
+class Agent(ChangeLoggedModel):
     name = models.CharField(max_length=255)
     phone = models.CharField(max_length=50)
     email = models.EmailField()
     image_url = models.CharField(max_length=255, blank=True, null=True)
-    properties = models.ManyToManyField(Property, related_name='agents', blank=True)
+    properties = models.ManyToManyField(Property, related_name='agents', blank=True, through='AgentProperty')
     
     def __str__(self):
         return self.name
+
+class AgentProperty(models.Model):
+    """
+    The Agent.properties link table, declared to control its indexes: the
+    two composite indexes below serve both join directions from the index
+    alone, replacing the default per-column foreign key indexes.
+    """
+    agent = models.ForeignKey(Agent, on_delete=models.CASCADE, db_index=False)
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        # The table Django created for the implicit link table.
+        db_table = 'properties_agent_properties'
+        constraints = [
+            # Agent -> properties: the agents directory and its counts.
+            models.UniqueConstraint(fields=['agent', 'property'], name='agentproperty_agent_uniq'),
+        ]
+        indexes = [
+            # Property -> agents: primary_agent, and the directory filtered
+            # by listing (?type=, ?location=).
+            models.Index(fields=['property', 'agent'], name='agentproperty_property_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.agent_id} - {self.property_id}"
+
+class Favorite(models.Model):
+    """A property a user has favorited (see properties.favorites)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='favorites', on_delete=models.CASCADE)
+    property = models.ForeignKey(Property, related_name='favorited_by', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'property'], name='favorite_user_property_unique'),
+        ]
+        indexes = [
+            # "My favorites", newest first (keyset pagination).
+            models.Index(fields=['user', 'created_at', 'id'], name='favorite_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.property}"
+
+class MapCluster(models.Model):
+    """
+    Pre-aggregated map markers: one row per non-empty grid cell per zoom
+    level (see properties.geo.cell_for). Maintained incrementally by
+    properties.clusters as properties are created, moved or deleted.
+    """
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    count = models.IntegerField(default=0)
+    lat_sum = models.FloatField(default=0)
+    lng_sum = models.FloatField(default=0)
+    min_price = models.IntegerField(null=True)
+    max_price = models.IntegerField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zoom', 'cell_x', 'cell_y'], name='mapcluster_cell_unique'),
+        ]
+
+    def __str__(self):
+        return f"z{self.zoom} ({self.cell_x}, {self.cell_y}): {self.count}"
+
+class PropertyChange(models.Model):
+    """
+    Append-only log behind the change feed (properties.changelog): one row
+    per change of a property, or a tombstone for its deletion. The id is
+    the feed cursor.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTIONS = [(UPSERT, 'Created or updated'), (DELETE, 'Deleted')]
+
+    # Not a foreign key: tombstones outlive the property.
+    property_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Compaction: the latest entry per property.
+            models.Index(fields=['property_id', 'id'], name='propertychange_property_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.property_id}"
+
+class PropertyChangeCompaction(models.Model):
+    """
+    A compaction run of the change log. Tombstones up to `horizon` were
+    dropped, so feed cursors below it can no longer be resumed.
+    """
+    horizon = models.BigIntegerField(default=0)
+    removed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"compaction up to {self.horizon}"
@@ -0,0 +1,193 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .search import RANK_ANNOTATION
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed set of orderings.
+
+    Every ordering ends with the primary key so the sort is total, and the
+    cursor stores the values of the last row returned. The next page is then
+    selected with a row-value comparison against those values, which lets the
+    database walk the matching composite index instead of counting through an
+    OFFSET - page N costs the same as page 1.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+
+    # Map of accepted ?ordering= values to (field, descending) tuples.
+    orderings = {
+        '-created_at': (('created_at', True), ('id', True)),
+    }
+    default_ordering = '-created_at'
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_key = self.get_ordering_key(request, queryset)
+        ordering = self.orderings[self.ordering_key]
+
+        queryset = queryset.order_by(*[
+            f"-{field}" if descending else field for field, descending in ordering
+        ])
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            position = self.parse_position(ordering, position, queryset)
+            queryset = queryset.filter(self.build_seek_filter(ordering, position))
+
+        # Fetch one extra row to know whether there is a next page.
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering_key(self, request, queryset):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in self.orderings and self.ordering_available(ordering, queryset):
+            return ordering
+        return self.get_default_ordering(queryset)
+
+    def get_default_ordering(self, queryset):
+        return self.default_ordering
+
+    def ordering_available(self, ordering, queryset):
+        """Orderings on annotations are only usable when the annotation exists."""
+        model_fields = {field.attname for field in queryset.model._meta.concrete_fields}
+        return all(
+            field in model_fields or field in queryset.query.annotations
+            for field, _ in self.orderings[ordering]
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = [
+            self._serialize_value(getattr(last, field))
+            for field, _ in self.orderings[self.ordering_key]
+        ]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position))
+
+    def parse_position(self, ordering, position, queryset):
+        """
+        Convert the cursor's values with their fields' to_python(), so a
+        tampered cursor is rejected here instead of failing in the query.
+        """
+        fields = {field.attname: field for field in queryset.model._meta.concrete_fields}
+        parsed = []
+        for (name, _), value in zip(ordering, position):
+            field = fields.get(name) or queryset.query.annotations[name].output_field
+            if value is None or isinstance(value, (list, dict)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                parsed.append(field.to_python(value))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return parsed
+
+    def build_seek_filter(self, ordering, position):
+        """
+        Expand (a, b, c) > (x, y, z) into the equivalent OR-of-ANDs filter,
+        honouring the direction of each column.
+        """
+        seek = Q()
+        equal = Q()
+        for (field, descending), value in zip(ordering, position):
+            lookup = 'lt' if descending else 'gt'
+            seek |= equal & Q(**{f"{field}__{lookup}": value})
+            equal &= Q(**{field: value})
+        return seek
+
+    def encode_cursor(self, position):
+        payload = json.dumps({'o': self.ordering_key, 'p': position}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            ordering_key = payload['o']
+            position = payload['p']
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor is only meaningful for the ordering it was issued for.
+        if ordering_key != self.ordering_key or not isinstance(position, list) \
+                or len(position) != len(self.orderings[self.ordering_key]):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def _serialize_value(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+
+class PropertyCursorPagination(KeysetPagination):
+    """
+    Keyset pagination for the property listing. Each column ordering is
+    backed by a matching composite index declared on Property.Meta; search
+    results default to relevance order.
+    """
+    orderings = {
+        'relevance': ((RANK_ANNOTATION, True), ('id', True)),
+        '-created_at': (('created_at', True), ('id', True)),
+        'created_at': (('created_at', False), ('id', False)),
+        '-price_value': (('price_value', True), ('id', True)),
+        'price_value': (('price_value', False), ('id', False)),
+    }
+    default_ordering = '-created_at'
+
+    def get_default_ordering(self, queryset):
+        if RANK_ANNOTATION in queryset.query.annotations:
+            return 'relevance'
+        return self.default_ordering
+
+
+class AgentPagination(KeysetPagination):
+    """Keyset pagination for the agents directory (properties.agents)."""
+    orderings = {
+        'name': (('name', False), ('id', False)),
+        '-listing_count': (('listing_count', True), ('id', True)),
+    }
+    default_ordering = 'name'
@@ -0,0 +1,6 @@
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('api/ws/properties/', consumers.PropertyEventsConsumer.as_asgi()),
+]
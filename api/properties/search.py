@@ -0,0 +1,225 @@
+"""
+Full-text search over properties.
+
+Each Property stores a search document built from its title, location,
+feature strings and description:
+
+- search_text: the accent-folded, lower-cased text, one line per part
+  (title, location, features, description), used by the fallback matcher
+  on databases without full-text support (SQLite in tests);
+- search_vector: on PostgreSQL, a weighted tsvector (title A, location B,
+  features C, description D) with a GIN index, queried with websearch
+  syntax and ranked with ts_rank.
+
+Queries use websearch syntax on both: words must all match, "quoted
+phrases" match consecutive words, `-word` excludes and `OR` separates
+alternatives. Only the words are accent-folded, so "Residence" matches
+"Résidence" without the unaccent extension while the operators keep their
+meaning. The fallback mirrors the PostgreSQL behaviour with a Python
+function registered on SQLite connections: whole words (French plurals
+folded) rather than substrings, ranked with the same part weights.
+
+Documents are written in the same UPDATE as the Property itself (see
+properties.signals) and refreshed when one of its features changes;
+`manage.py rebuild_search_index` recomputes them all.
+"""
+import functools
+import json
+import re
+import unicodedata
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.models import F, FloatField, Func, TextField, Value
+from django.dispatch import receiver
+from .models import Property
+
+SEARCH_CONFIG = 'french'
+RANK_ANNOTATION = 'search_rank'
+# Part order in search_text, and ts_rank's default weight for each.
+WEIGHTS = ['A', 'B', 'C', 'D']
+WEIGHT_VALUES = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+FEATURES_PART = WEIGHTS.index('C')
+# Columns the document is built from (besides the features).
+DOCUMENT_FIELDS = frozenset(['title', 'location', 'description'])
+
+_TOKEN_RE = re.compile(r'\w+')
+# A quoted phrase (closing quote optional, as in websearch_to_tsquery) or a bare word.
+_QUERY_RE = re.compile(r'(-?)"([^"]*)"?|(\S+)')
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def normalize(text):
+    """Lower-case and strip accents: "Résidence" -> "residence"."""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def document_parts(property_obj, features):
+    """(text, weight) pairs making up a property's search document, best weight first."""
+    return [
+        (normalize(property_obj.title), 'A'),
+        (normalize(property_obj.location), 'B'),
+        (normalize(' '.join(features)), 'C'),
+        (normalize(property_obj.description), 'D'),
+    ]
+
+
+def vector_expression(parts):
+    vector = None
+    for text, weight in parts:
+        part = SearchVector(Value(text, output_field=TextField()), weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def set_document(property_obj, features):
+    """Fill in the search columns of an instance (saved or not) without a query."""
+    parts = document_parts(property_obj, features)
+    # Line breaks inside a part would shift the parts after it.
+    property_obj.search_text = '\n'.join(' '.join(text.split()) for text, _ in parts)
+    if is_postgres():
+        property_obj.search_vector = vector_expression(parts)
+
+
+def stored_features(property_obj):
+    """
+    The features part of the instance's current search_text, or None if it
+    is not known (not loaded, or written before the parts were kept apart).
+    """
+    text = property_obj.__dict__.get('search_text')
+    if text is None:
+        return None
+    parts = text.split('\n')
+    return parts[FEATURES_PART] if len(parts) == len(WEIGHTS) else None
+
+
+def refresh_documents(queryset, batch_size=1000):
+    """Recompute the search document of every property in the queryset."""
+    fields = ['search_text', 'search_vector'] if is_postgres() else ['search_text']
+    batch = []
+    updated = 0
+    properties = queryset.order_by().only('id', 'title', 'location', 'description') \
+        .prefetch_related('features')
+    for property_obj in properties.iterator(chunk_size=batch_size):
+        set_document(property_obj, [feature.feature for feature in property_obj.features.all()])
+        batch.append(property_obj)
+        if len(batch) >= batch_size:
+            updated += _save(batch, fields, batch_size)
+            batch = []
+    if batch:
+        updated += _save(batch, fields, batch_size)
+    return updated
+
+
+def _save(batch, fields, batch_size):
+    Property.objects.bulk_update(batch, fields, batch_size=batch_size)
+    return len(batch)
+
+
+# Queries
+
+def parse_query(terms):
+    """
+    Websearch syntax as alternatives: a list of OR-separated groups, each a
+    list of (negated, words) clauses that must all hold. Words are
+    normalized; `or` is recognized in any case, like websearch_to_tsquery.
+    """
+    groups = [[]]
+    for negated, phrase, word in _QUERY_RE.findall(terms or ''):
+        if word and word.lower() == 'or':
+            if groups[-1]:
+                groups.append([])
+            continue
+        if word:
+            negated, phrase = ('-', word[1:]) if word.startswith('-') else ('', word)
+        words = _TOKEN_RE.findall(normalize(phrase))
+        if words:
+            groups[-1].append((bool(negated), words))
+    return [group for group in groups if group]
+
+
+def websearch_text(groups):
+    """A websearch_to_tsquery string for parsed groups."""
+    return ' OR '.join(
+        ' '.join(f'{"-" if negated else ""}"{" ".join(words)}"' for negated, words in group)
+        for group in groups
+    )
+
+
+def _stem(word):
+    # Just enough stemming to match the French config on plurals.
+    return word[:-1] if len(word) > 3 and word[-1] in 'sx' else word
+
+
+@functools.lru_cache(maxsize=256)
+def _compiled_query(query):
+    return [
+        [(negated, [_stem(word) for word in words]) for negated, words in group]
+        for group in json.loads(query)
+    ]
+
+
+def _occurrences(parts, words):
+    """(weight value, count) for each part containing the consecutive words."""
+    size = len(words)
+    for weight, stems in parts:
+        count = sum(1 for i in range(len(stems) - size + 1) if stems[i:i + size] == words)
+        if count:
+            yield weight, count
+
+
+def fallback_rank(search_text, query):
+    """
+    Rank of a document for a parse_query() result (as JSON), or None if it
+    does not match. Registered on SQLite connections as property_search_rank.
+    """
+    lines = (search_text or '').split('\n')
+    if len(lines) != len(WEIGHTS):
+        # Written before the parts were kept apart: rank it all as D.
+        lines = [''] * (len(WEIGHTS) - 1) + [' '.join(lines)]
+    parts = [
+        (WEIGHT_VALUES[weight], [_stem(word) for word in _TOKEN_RE.findall(line)])
+        for weight, line in zip(WEIGHTS, lines)
+    ]
+    best = None
+    for group in _compiled_query(query):
+        rank = 0.0
+        for negated, words in group:
+            found = list(_occurrences(parts, words))
+            if bool(found) == negated:
+                break
+            rank += sum(weight * count for weight, count in found)
+        else:
+            best = rank if best is None else max(best, rank)
+    return best
+
+
+@receiver(connection_created)
+def register_fallback(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('property_search_rank', 2, fallback_rank, deterministic=True)
+
+
+def apply_search(queryset, terms):
+    """
+    Restrict a Property queryset to matches for `terms` and annotate a
+    relevance score (higher is better) as RANK_ANNOTATION.
+    """
+    groups = parse_query(terms)
+    if not groups:
+        return queryset
+    if is_postgres():
+        query = SearchQuery(websearch_text(groups), config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            **{RANK_ANNOTATION: SearchRank(F('search_vector'), query)}
+        )
+    rank = Func(
+        F('search_text'), Value(json.dumps(groups)), function='property_search_rank', output_field=FloatField(),
+    )
+    return queryset.annotate(**{RANK_ANNOTATION: rank}).filter(**{f'{RANK_ANNOTATION}__isnull': False})
@@ -1,3 +1,4 @@
+from django.db.models import Max
 from rest_framework import serializers
 from .models import Property, PropertyFeature, PropertyImage, Agent
 
@@ -9,7 +10,10 @@ class PropertyFeatureSerializer(serializers.ModelSerializer):
 class PropertyImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = PropertyImage
-        fields = ['id', 'image', 'image_url', 'is_primary']
+        fields = ['id', 'image', 'image_url', 'is_primary', 'position', 'variants', 'processing_status']
+        # The original upload keeps its EXIF metadata; clients get image_url
+        # and the variants instead.
+        extra_kwargs = {'image': {'write_only': True}}
 
 class PropertyImageUploadSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,8 +34,11 @@ class PropertyImageUploadSerializer(serializers.ModelSerializer):
         if validated_data.get('is_primary', False):
             PropertyImage.objects.filter(property=property_obj, is_primary=True).update(is_primary=False)
         
-        # Create the new image
-        return PropertyImage.objects.create(property=property_obj, **validated_data)
+        # Create the new image at the end of the gallery
+        last = PropertyImage.objects.filter(property=property_obj).aggregate(last=Max('position'))['last']
+        return PropertyImage.objects.create(
+            property=property_obj, position=0 if last is None else last + 1, **validated_data
+        )
 
 class AgentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -46,43 +53,70 @@ class PropertyCreateSerializer(serializers.ModelSerializer):
 
 
 class PropertyListSerializer(serializers.ModelSerializer):
-    image = serializers.SerializerMethodField()
+    price = serializers.SerializerMethodField()
+    beds = serializers.IntegerField(source='rooms', read_only=True)
+    type = serializers.CharField(source='property_type', read_only=True)
+    # Denormalized columns: the list is served from the Property table alone.
+    image = serializers.CharField(source='primary_image_url', read_only=True)
+    image_variants = serializers.JSONField(source='primary_image_variants', read_only=True)
+    # Per-user state: false unless the view passes `favorite_ids` in the
+    # context (cached payloads are marked by properties.favorites).
+    is_favorite = serializers.SerializerMethodField()
+    agent_id = serializers.IntegerField(source='primary_agent_id', read_only=True)
     
     class Meta:
         model = Property
-        fields = ['id', 'title', 'price', 'price_value', 'location', 'beds', 'baths', 'sqft', 'type', 'is_favorite', 'image']
+        fields = ['id', 'title', 'price', 'price_value', 'location', 'beds', 'baths', 'sqft', 'type', 'is_favorite', 'image', 'image_variants', 'feature_count', 'agent_id']
     
-    def get_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return primary_image.image_url
-        return None
+    def get_price(self, obj):
+        return f"{obj.price_value:,} TND"
+    
+    def get_is_favorite(self, obj):
+        return obj.pk in self.context.get('favorite_ids', ())
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['price_value'] = instance.price_value
-        representation['is_favorite'] = instance.is_favorite
         return representation
 
 class PropertyDetailSerializer(serializers.ModelSerializer):
+    price = serializers.SerializerMethodField()
+    beds = serializers.IntegerField(source='rooms', read_only=True)
+    type = serializers.CharField(source='property_type', read_only=True)
     features = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     agent = serializers.SerializerMethodField()
+    is_favorite = serializers.SerializerMethodField()
     
     class Meta:
         model = Property
-        fields = ['id', 'title', 'price', 'location', 'beds', 'baths', 'sqft', 'type', 'description', 'lat', 'lng', 'is_favorite', 'features', 'images', 'agent']
+        fields = ['id', 'title', 'price', 'location', 'beds', 'baths', 'sqft', 'type', 'description', 'lat', 'lng', 'is_favorite', 'features', 'images', 'image_variants', 'agent']
+    
+    # The methods below read the relations loaded by
+    # PropertyQuerySet.for_detail() and only sort/filter in Python.
+    
+    def get_price(self, obj):
+        return f"{obj.price_value:,} TND"
+    
+    def get_is_favorite(self, obj):
+        return obj.pk in self.context.get('favorite_ids', ())
     
     def get_features(self, obj):
-        features = obj.features.all()
-        return [feature.feature for feature in features]
+        return [feature.feature for feature in obj.features.all()]
+    
+    def _sorted_images(self, obj):
+        return sorted(obj.images.all(), key=lambda image: not image.is_primary)
     
     def get_images(self, obj):
-        images = obj.images.all().order_by('-is_primary')
-        return [image.image_url for image in images]
+        return [image.image_url for image in self._sorted_images(obj)]
+    
+    def get_image_variants(self, obj):
+        # Same order as `images`; empty for images without generated variants.
+        return [image.variants for image in self._sorted_images(obj)]
     
     def get_agent(self, obj):
-        agent = obj.agents.first()
+        agent = obj.primary_agent
         if agent:
             return {
                 'name': agent.name,
@@ -91,8 +125,23 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
                 'image': agent.image_url
             }
         return None
+
+
+class AgentDirectorySerializer(serializers.ModelSerializer):
+    """An agent with the listing stats of properties.agents.directory()."""
+    image = serializers.CharField(source='image_url', read_only=True)
+    listing_count = serializers.IntegerField(read_only=True)
+    price_min = serializers.IntegerField(read_only=True)
+    price_max = serializers.IntegerField(read_only=True)
+    top_listings = serializers.SerializerMethodField()
     
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['is_favorite'] = instance.is_favorite
-        return representation
+    class Meta:
+        model = Agent
+        fields = ['id', 'name', 'phone', 'email', 'image', 'listing_count', 'price_min', 'price_max', 'top_listings']
+    
+    def get_top_listings(self, obj):
+        listings = PropertyListSerializer(obj.top_listings, many=True).data
+        for listing in listings:
+            # Per-user state stays out of the (shared) directory.
+            listing.pop('is_favorite', None)
+        return listings
@@ -0,0 +1,219 @@
+"""
+Keep data derived from a Property in sync with its rows:
+
+- the denormalized listing-card columns on Property, derived from
+  PropertyImage, PropertyFeature and the Agent.properties link table;
+- Property.updated_at, which backs the ETag/Last-Modified validators
+  (properties.conditional);
+- the versioned response cache (properties.cache), whose counters are
+  bumped for every property that changed;
+- the map marker clusters (properties.clusters);
+- the full-text search documents (properties.search);
+- the change feed log (properties.changelog), written in the same
+  transaction as the change;
+- the live change events sent to WebSocket clients (properties.events).
+
+Every handler recomputes the columns from the database with a single
+UPDATE, so it does not matter which code path changed the related rows.
+QuerySet.update() bypasses signals: callers that bulk-update related rows
+must call Property.objects.filter(...).refresh_card_fields(),
+property_cache.invalidate_properties(), changelog.record() and
+events.updated() themselves.
+Code that saves or deletes many related rows at once can wrap them in
+batched_refresh() so the refresh runs once instead of per row.
+"""
+import threading
+from contextlib import contextmanager
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import changelog, clusters, events, search
+from .cache import property_cache
+from .models import Agent, Property, PropertyFeature, PropertyImage
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_refresh():
+    """
+    Defer the card/cache refreshes requested by the handlers below until the
+    block exits, then run them once for all affected properties. For code
+    that changes many related rows at a time (see properties.galleries).
+    """
+    if getattr(_batch, 'property_ids', None) is not None:
+        yield
+        return
+    _batch.property_ids = set()
+    try:
+        yield
+        property_ids = _batch.property_ids
+    finally:
+        _batch.property_ids = None
+    refresh_cards(property_ids)
+
+
+def refresh_cards(property_ids):
+    property_ids = [pk for pk in property_ids if pk is not None]
+    if getattr(_batch, 'property_ids', None) is not None:
+        _batch.property_ids.update(property_ids)
+        return
+    if property_ids:
+        Property.objects.filter(pk__in=property_ids).refresh_card_fields()
+    invalidate_cache(property_ids)
+    changelog.record(property_ids)
+    events.updated(property_ids)
+
+
+def invalidate_cache(property_ids):
+    property_ids = [pk for pk in property_ids if pk is not None]
+    if property_ids:
+        property_cache.invalidate_properties(property_ids)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_cache_on_property_change(sender, instance, **kwargs):
+    invalidate_cache([instance.pk])
+
+
+@receiver(post_save, sender=Property)
+def record_property_save(sender, instance, created, **kwargs):
+    changelog.record([instance.pk])
+    (events.created if created else events.updated)([instance.pk])
+
+
+@receiver(post_delete, sender=Property)
+def record_property_delete(sender, instance, **kwargs):
+    changelog.record_deleted([instance.pk])
+    events.deleted([instance.pk])
+
+
+@receiver(post_save, sender=Agent)
+def invalidate_cache_on_agent_change(sender, instance, created, **kwargs):
+    # Agent contact details are embedded in property detail responses, and
+    # agents in the agents directory, which is cached with the listings.
+    property_ids = [] if created else list(instance.properties.values_list('pk', flat=True))
+    if not property_ids:
+        property_cache.invalidate_lists()
+        return
+    Property.objects.filter(pk__in=property_ids).touch()
+    invalidate_cache(property_ids)
+    changelog.record(property_ids)
+    events.updated(property_ids)
+
+
+def _deleted_with_property(origin):
+    """Whether a related row's deletion cascades from deleting its property."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return isinstance(model, type) and issubclass(model, Property)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_save, sender=PropertyFeature)
+@receiver(post_delete, sender=PropertyFeature)
+def refresh_card_on_related_change(sender, instance, origin=None, **kwargs):
+    # The property's own delete handlers cover its cascaded images and
+    # features; refreshing the card once per row would be wasted writes.
+    if _deleted_with_property(origin):
+        return
+    refresh_cards([instance.property_id])
+
+
+@receiver(m2m_changed, sender=Agent.properties.through)
+def refresh_card_on_agent_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # pk_set is not provided for clear(); remember what is linked now.
+        instance._cleared_property_ids = list(instance.properties.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        refresh_cards([instance.pk])
+    elif action == 'post_clear':
+        refresh_cards(getattr(instance, '_cleared_property_ids', []))
+    else:
+        refresh_cards(pk_set or [])
+
+
+@receiver(pre_delete, sender=Agent)
+def remember_agent_properties(sender, instance, **kwargs):
+    instance._linked_property_ids = list(instance.properties.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Agent)
+def refresh_card_on_agent_delete(sender, instance, **kwargs):
+    property_ids = getattr(instance, '_linked_property_ids', [])
+    if property_ids:
+        refresh_cards(property_ids)
+    else:
+        property_cache.invalidate_lists()
+
+
+def _located(lat, lng, price):
+    return lat is not None and lng is not None and price is not None
+
+
+MAP_FIELDS = ('lat', 'lng', 'price_value')
+
+
+@receiver(post_init, sender=Property)
+def remember_map_position(sender, instance, **kwargs):
+    # Read instance.__dict__ so deferred fields are not loaded; instances
+    # loaded without them (.only()/.defer()) are not tracked.
+    values = instance.__dict__
+    if all(field in values for field in MAP_FIELDS):
+        instance._map_position = tuple(values[field] for field in MAP_FIELDS)
+    else:
+        instance._map_position = None
+
+
+@receiver(post_save, sender=Property)
+def update_clusters_on_save(sender, instance, created, **kwargs):
+    old = None if created else instance._map_position
+    new = (instance.lat, instance.lng, instance.price_value)
+    if old == new or (old is None and not created):
+        return
+    if old is not None and _located(*old):
+        clusters.remove_point(*old)
+    if _located(*new):
+        clusters.add_point(*new)
+    instance._map_position = new
+
+
+@receiver(post_delete, sender=Property)
+def update_clusters_on_delete(sender, instance, **kwargs):
+    if instance._map_position is not None and _located(*instance._map_position):
+        clusters.remove_point(*instance._map_position)
+
+
+@receiver(pre_save, sender=Property)
+def set_search_document(sender, instance, update_fields=None, **kwargs):
+    # Written by the save's own INSERT/UPDATE. The features part is reused
+    # from the loaded document (features are not saved with the Property).
+    if update_fields is not None and not search.DOCUMENT_FIELDS.intersection(update_fields):
+        instance._search_refresh = False
+        return
+    features = '' if instance._state.adding else search.stored_features(instance)
+    if features is None or update_fields is not None:
+        # Not known, or the search columns are not part of this save.
+        instance._search_refresh = True
+        return
+    search.set_document(instance, [features])
+    instance._search_refresh = False
+
+
+@receiver(post_save, sender=Property)
+def refresh_search_on_save(sender, instance, **kwargs):
+    if getattr(instance, '_search_refresh', True):
+        search.refresh_documents(Property.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=PropertyFeature)
+@receiver(post_delete, sender=PropertyFeature)
+def refresh_search_on_feature_change(sender, instance, origin=None, **kwargs):
+    if _deleted_with_property(origin):
+        return
+    search.refresh_documents(Property.objects.filter(pk=instance.property_id))
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from properties.benchmarks import uncached_responses
+from properties.models import Agent, Property
+
+
+class AgentDirectoryTests(TestCase):
+    QUERIES = 2  # agents with their stats, top listings of the page
+
+    def seed(self, agents, listings):
+        now = timezone.now()
+        created = []
+        for number in range(agents):
+            agent = Agent.objects.create(name=f'Agent {number:02}', phone='+216 00 000 000',
+                                         email=f'agent{number}@example.com')
+            properties = [
+                Property.objects.create(
+                    title=f'Listing {number}-{index}', price_value=100000 * (index + 1),
+                    property_type='Villa' if index % 2 else 'Maison', rooms=3, baths=1,
+                )
+                for index in range(listings)
+            ]
+            for index, property_obj in enumerate(properties):
+                # Newest last.
+                Property.objects.filter(pk=property_obj.pk).update(created_at=now - timedelta(days=listings - index))
+            agent.properties.add(*properties)
+            created.append((agent, properties))
+        return created
+
+    def directory(self, **params):
+        with uncached_responses():
+            response = self.client.get('/api/agents/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_stats_and_newest_listings(self):
+        [(agent, properties)] = self.seed(1, 5)
+        Agent.objects.create(name='Agent without listings', phone='0', email='idle@example.com')
+        entry, idle = self.directory()
+        self.assertEqual((entry['id'], entry['listing_count'], entry['price_min'], entry['price_max']),
+                         (agent.pk, 5, 100000, 500000))
+        self.assertEqual([listing['id'] for listing in entry['top_listings']],
+                         [properties[4].pk, properties[3].pk, properties[2].pk])
+        self.assertEqual((idle['listing_count'], idle['price_min'], idle['top_listings']), (0, None, []))
+
+    def test_listing_filters_narrow_the_stats(self):
+        [(agent, properties)] = self.seed(1, 5)
+        [entry] = self.directory(type='Villa')
+        self.assertEqual((entry['listing_count'], entry['price_min'], entry['price_max']), (2, 200000, 400000))
+        self.assertEqual([listing['id'] for listing in entry['top_listings']], [properties[3].pk, properties[1].pk])
+        self.assertEqual(self.directory(type='Terrain'), [])
+
+    def test_queries_do_not_grow_with_agents_or_listings(self):
+        for agents, listings in ((2, 2), (6, 5)):
+            Agent.objects.all().delete()
+            Property.objects.all().delete()
+            self.seed(agents, listings)
+            with self.assertNumQueries(self.QUERIES):
+                self.assertEqual(len(self.directory()), agents)
+
+    def test_orders_by_listing_count(self):
+        idle = Agent.objects.create(name='Aaron', phone='0', email='idle@example.com')
+        [(busy, _)] = self.seed(1, 3)
+        self.assertEqual([entry['id'] for entry in self.directory()], [idle.pk, busy.pk])
+        self.assertEqual([entry['id'] for entry in self.directory(ordering='-listing_count')], [busy.pk, idle.pk])
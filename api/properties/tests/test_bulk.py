@@ -0,0 +1,49 @@
+import json
+from unittest import mock
+from django.test import TestCase
+from properties import bulk, clusters
+from properties.models import MapCluster, Property
+
+
+def jsonl(rows):
+    return [json.dumps(row) + '\n' for row in rows]
+
+
+def listing(number, lat, lng, price):
+    return {'title': f'Appartement {number}', 'price_value': price, 'property_type': 'Appartement',
+            'rooms': 3, 'baths': 1, 'lat': lat, 'lng': lng}
+
+
+class ImportClusterTests(TestCase):
+    def setUp(self):
+        Property.objects.create(title='Villa', price_value=900000, property_type='Villa',
+                                rooms=5, baths=3, lat=36.80, lng=10.18)
+
+    def import_rows(self, rows, **options):
+        importer = bulk.BulkImporter(batch_size=2, **options)
+        return importer.run(bulk.read_rows(jsonl(rows), 'jsonl'))
+
+    def snapshot(self):
+        return {
+            (c.zoom, c.cell_x, c.cell_y): (c.count, round(c.lat_sum, 6), round(c.lng_sum, 6), c.min_price, c.max_price)
+            for c in MapCluster.objects.all()
+        }
+
+    def test_import_updates_touched_cells_without_a_rebuild(self):
+        rows = [
+            listing(1, 36.81, 10.17, 250000),
+            listing(2, 36.81, 10.17, 1200000),
+            listing(3, 35.83, 10.64, 180000),
+            {**listing(4, None, None, 90000), 'lat': None, 'lng': None},
+        ]
+        with mock.patch.object(clusters, 'rebuild', wraps=clusters.rebuild) as rebuild:
+            self.assertEqual(self.import_rows(rows)['created'], 4)
+        rebuild.assert_not_called()
+        imported = self.snapshot()
+        clusters.rebuild()
+        self.assertEqual(imported, self.snapshot())
+
+    def test_clusters_can_be_left_to_the_caller(self):
+        before = self.snapshot()
+        self.import_rows([listing(1, 33.88, 10.10, 150000)], update_clusters=False)
+        self.assertEqual(before, self.snapshot())
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from properties.cache import property_cache
+from properties.models import Property
+
+
+class InvalidationTests(TestCase):
+    def setUp(self):
+        caches[settings.PROPERTY_CACHE_ALIAS].clear()
+
+    def test_versions_change_when_the_write_commits(self):
+        property_obj = Property.objects.create(
+            title='Maison', price_value=200000, property_type='Maison', rooms=3, baths=1,
+        )
+        self.client.get('/api/properties/')
+        version = property_cache._get_version('list')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                property_obj.price_value = 210000
+                property_obj.save()
+                # Readers during the transaction still use the old version.
+                self.assertEqual(property_cache._get_version('list'), version)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(property_cache._get_version('list'), version)
+        response = self.client.get('/api/properties/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['price_value'], 210000)
+
+
+@override_settings(CACHES={
+    **settings.CACHES,
+    settings.PROPERTY_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'property_response_cache_test',
+        'TIMEOUT': None,
+    },
+})
+class DatabaseBackendTests(TestCase):
+    def setUp(self):
+        call_command('createcachetable', 'property_response_cache_test', verbosity=0)
+        self.request = Request(APIRequestFactory().get('/api/properties/', {'type': 'Villa'}))
+
+    def test_a_cached_read_is_one_query(self):
+        key = property_cache.list_key(self.request)
+        self.assertIsNone(property_cache.get(key))
+        property_cache.set(key, {'results': []})
+        key = property_cache.list_key(self.request)
+        with self.assertNumQueries(1):
+            self.assertEqual(property_cache.get(key), {'results': []})
+
+    def test_entries_do_not_expire_and_stale_ones_are_ignored(self):
+        key = property_cache.list_key(self.request)
+        property_cache.get(key)
+        property_cache.set(key, {'results': []})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT expires FROM property_response_cache_test WHERE cache_key LIKE %s',
+                           ['%' + key.key])
+            (expires,) = cursor.fetchone()
+        self.assertGreater(str(expires), '9999')
+        property_cache._invalidate(())
+        self.assertIsNone(property_cache.get(property_cache.list_key(self.request)))
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from properties import changelog
+from properties.models import Property, PropertyChange
+
+
+class ChangeFeedTests(TestCase):
+    def create(self, title):
+        return Property.objects.create(title=title, price_value=300000, property_type='Maison', rooms=3, baths=1)
+
+    def feed(self, since=0, **params):
+        return self.client.get('/api/properties/changes/', {'since': since, **params})
+
+    def test_pages_through_the_latest_change_of_each_property(self):
+        first, second = self.create('Maison A'), self.create('Maison B')
+        first.price_value = 310000
+        first.save()
+
+        response = self.feed(limit=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['has_more'])
+        self.assertEqual([change['id'] for change in response.data['changes']], [first.pk, second.pk])
+
+        response = self.feed(response.data['cursor'])
+        self.assertFalse(response.data['has_more'])
+        [change] = response.data['changes']
+        self.assertEqual((change['id'], change['action']), (first.pk, PropertyChange.UPSERT))
+        self.assertEqual(change['property']['price_value'], 310000)
+        self.assertEqual(self.feed(response.data['cursor']).data['changes'], [])
+
+        # Within a page only the last change of a property is kept, in log order.
+        response = self.feed(limit=3)
+        self.assertEqual([change['id'] for change in response.data['changes']], [second.pk, first.pk])
+
+    def test_deleted_properties_leave_a_tombstone(self):
+        property_obj = self.create('Maison A')
+        pk = property_obj.pk
+        property_obj.delete()
+        self.assertEqual(self.feed().data['changes'][-1], {'cursor': PropertyChange.objects.latest('pk').pk,
+                                                           'id': pk, 'action': PropertyChange.DELETE})
+
+    def test_rejects_malformed_cursors(self):
+        for params in ({'since': -1}, {'since': 'abc'}, {'limit': 0}):
+            self.assertEqual(self.client.get('/api/properties/changes/', params).status_code, 400)
+
+    def test_cursors_below_the_horizon_are_gone(self):
+        kept = self.create('Maison A')
+        deleted = self.create('Maison B')
+        deleted.delete()
+        old_cursor = PropertyChange.objects.filter(property_id=kept.pk).latest('pk').pk
+        PropertyChange.objects.filter(action=PropertyChange.DELETE).update(
+            created_at=timezone.now() - timedelta(days=31),
+        )
+
+        result = changelog.compact(tombstone_days=30)
+        self.assertEqual(result['tombstones'], 1)
+        self.assertEqual(changelog.horizon(), result['horizon'])
+        self.assertEqual(self.feed(old_cursor).status_code, 410)
+        # Starting over from 0 is always possible and no longer sees the tombstone.
+        response = self.feed(0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([change['id'] for change in response.data['changes']], [kept.pk])
+        self.assertEqual(self.feed(result['horizon']).status_code, 200)
+
+    def test_compaction_keeps_one_entry_per_property(self):
+        property_obj = self.create('Maison A')
+        for price in (310000, 320000):
+            property_obj.price_value = price
+            property_obj.save()
+        result = changelog.compact()
+        self.assertEqual(PropertyChange.objects.filter(property_id=property_obj.pk).count(), 1)
+        self.assertGreaterEqual(result['superseded'], 2)
+        self.assertEqual(result['horizon'], 0)
+
+    def test_backfill_logs_properties_without_entries(self):
+        property_obj = self.create('Maison A')
+        PropertyChange.objects.all().delete()
+        self.assertEqual(changelog.backfill(), 1)
+        self.assertEqual(changelog.backfill(), 0)
+        self.assertEqual([change['id'] for change in self.feed().data['changes']], [property_obj.pk])
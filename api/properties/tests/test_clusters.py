@@ -0,0 +1,46 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from properties import clusters
+from properties.models import MapCluster, Property
+
+
+def listing(title, lat, lng, price):
+    return Property.objects.create(title=title, price_value=price, property_type='Appartement',
+                                   rooms=3, baths=1, lat=lat, lng=lng)
+
+
+class RemovePointTests(TestCase):
+    def setUp(self):
+        # Tunis, La Marsa and Sousse: together only at the coarsest zooms.
+        self.cheap = listing('Studio', 36.80, 10.18, 90000)
+        self.middle = listing('Appartement', 36.88, 10.32, 300000)
+        self.dear = listing('Villa', 35.83, 10.64, 1500000)
+
+    def snapshot(self):
+        return {
+            (c.zoom, c.cell_x, c.cell_y): (c.count, round(c.lat_sum, 6), round(c.lng_sum, 6), c.min_price, c.max_price)
+            for c in MapCluster.objects.all()
+        }
+
+    def assertMatchesRebuild(self):
+        maintained = self.snapshot()
+        clusters.rebuild()
+        self.assertEqual(maintained, self.snapshot())
+
+    def test_removing_extremes_keeps_prices_exact(self):
+        self.dear.delete()
+        self.assertMatchesRebuild()
+        self.cheap.delete()
+        self.assertMatchesRebuild()
+
+    def test_only_the_finest_cell_is_recomputed_from_properties(self):
+        listing('Duplex', 35.8301, 10.6401, 700000)
+        with CaptureQueriesContext(connection) as queries:
+            self.dear.delete()
+        property_scans = [
+            query['sql'] for query in queries
+            if 'FROM "properties_property"' in query['sql'] and 'MIN(' in query['sql']
+        ]
+        self.assertEqual(len(property_scans), 1)
+        self.assertMatchesRebuild()
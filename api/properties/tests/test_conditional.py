@@ -0,0 +1,8 @@
+from django.test import TestCase
+
+
+class InvalidIdTests(TestCase):
+    def test_non_numeric_ids_are_not_found(self):
+        for path in ('/api/properties/abc/', '/api/properties/abc/images/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
@@ -0,0 +1,132 @@
+import asyncio
+import json
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from django.test import TransactionTestCase, override_settings
+from properties import favorites
+from properties.models import Property
+from realestate.asgi import application
+from users.authentication import tokens_for
+from users.models import User
+
+
+class Client(ApplicationCommunicator):
+    """A WebSocket client for the ASGI app (channels.testing needs daphne)."""
+
+    def __init__(self):
+        super().__init__(application, {
+            'type': 'websocket', 'path': '/api/ws/properties/', 'headers': [], 'query_string': b'', 'subprotocols': [],
+        })
+
+    async def connect(self):
+        await self.send_input({'type': 'websocket.connect'})
+        return (await self.receive_output(1))['type'] == 'websocket.accept'
+
+    async def send(self, message):
+        await self.send_input({'type': 'websocket.receive', 'text': json.dumps(message)})
+
+    async def receive(self, timeout=1):
+        return json.loads((await self.receive_output(timeout))['text'])
+
+    async def receive_nothing(self, timeout=0.2):
+        # receive_output() would cancel the app on timeout.
+        await asyncio.sleep(timeout)
+        return self.output_queue.empty()
+
+    async def close(self):
+        await self.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.wait(1)
+
+
+@database_sync_to_async
+def create(title, **fields):
+    return Property.objects.create(**{
+        'title': title, 'price_value': 500000, 'property_type': 'Villa', 'rooms': 4, 'baths': 2, **fields,
+    })
+
+
+@database_sync_to_async
+def update(property_obj, **fields):
+    for name, value in fields.items():
+        setattr(property_obj, name, value)
+    property_obj.save()
+
+
+@override_settings(PROPERTY_EVENTS_FLUSH_SECONDS=0.05, PROPERTY_EVENTS_MAX_BATCH=3)
+class PropertyEventsTests(TransactionTestCase):
+    async def subscribe(self, **subscription):
+        client = Client()
+        self.assertTrue(await client.connect())
+        await client.send({'action': 'subscribe', **subscription})
+        self.assertEqual(await client.receive(), {'type': 'subscribed'})
+        return client
+
+    async def test_changes_follow_the_subscription(self):
+        client = await self.subscribe(filters={'type': ['Villa'], 'price_max': 600000})
+        try:
+            villa = await create('Villa Carthage')
+            await create('Maison Sousse', property_type='Maison')
+            message = await client.receive()
+            self.assertEqual([(c['event'], c['id']) for c in message['changes']], [('created', villa.pk)])
+            self.assertEqual(message['changes'][0]['property']['price_value'], 500000)
+            self.assertNotIn('is_favorite', message['changes'][0]['property'])
+
+            await update(villa, price_value=700000)
+            self.assertEqual(await client.receive(), {'type': 'changes', 'changes': [{'event': 'removed', 'id': villa.pk}]})
+            self.assertTrue(await client.receive_nothing())
+        finally:
+            await client.close()
+
+    @override_settings(PROPERTY_EVENTS_FLUSH_SECONDS=0.5)
+    async def test_rapid_changes_are_coalesced(self):
+        client = await self.subscribe()
+        try:
+            villa = await create('Villa Hammamet')
+            for price in range(400000, 400005):
+                await update(villa, price_value=price)
+            message = await client.receive()
+            self.assertEqual(len(message['changes']), 1)
+            self.assertEqual(message['changes'][0]['property']['price_value'], 400004)
+        finally:
+            await client.close()
+
+    async def test_large_batches_become_a_reload(self):
+        client = await self.subscribe()
+        try:
+            for number in range(4):
+                await create(f'Villa {number}')
+            self.assertEqual(await client.receive(), {'type': 'reload'})
+        finally:
+            await client.close()
+
+    async def test_rejects_filters_that_cannot_be_matched_live(self):
+        client = Client()
+        await client.connect()
+        try:
+            await client.send({'action': 'subscribe', 'filters': {'search': 'piscine'}})
+            self.assertEqual((await client.receive())['type'], 'error')
+            await client.send({'action': 'subscribe', 'filters': {'price_max': 'cheap'}})
+            self.assertEqual((await client.receive())['type'], 'error')
+        finally:
+            await client.close()
+
+    async def test_favorite_changes_reach_only_their_owner(self):
+        owner = await database_sync_to_async(User.objects.create_user)('amira', 'amira@example.com', 'secret-1')
+        other = await database_sync_to_async(User.objects.create_user)('sami', 'sami@example.com', 'secret-1')
+        villa = await create('Villa Hammamet')
+        clients = []
+        try:
+            for user in (owner, other):
+                client = Client()
+                await client.connect()
+                token = await database_sync_to_async(lambda: str(tokens_for(user).access_token))()
+                await client.send({'action': 'authenticate', 'token': token})
+                self.assertEqual(await client.receive(), {'type': 'authenticated', 'user_id': user.pk})
+                clients.append(client)
+            await database_sync_to_async(favorites.add_favorite)(owner, villa.pk)
+            self.assertEqual(await clients[0].receive(),
+                             {'type': 'changes', 'changes': [{'event': 'favorited', 'id': villa.pk}]})
+            self.assertTrue(await clients[1].receive_nothing())
+        finally:
+            for client in clients:
+                await client.close()
@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.conf import settings
+from rest_framework.test import APITestCase
+from properties import favorites
+from properties.models import Favorite, Property
+
+
+class FavoritesOverlayTests(APITestCase):
+    """The per-user favorites overlay only applies to property cards."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'secret')
+        cls.properties = [
+            Property.objects.create(
+                title=f'Villa {number}', price_value=300000 + number, property_type='Villa',
+                rooms=4, baths=2, location='Sousse', lat=35.8 + number / 100, lng=10.6,
+            )
+            for number in range(3)
+        ]
+        Favorite.objects.create(user=cls.user, property=cls.properties[0])
+
+    def setUp(self):
+        caches[settings.PROPERTY_CACHE_ALIAS].clear()
+        self.client.force_authenticate(self.user)
+
+    def test_list_and_detail_are_marked(self):
+        response = self.client.get('/api/properties/')
+        self.assertEqual(response.status_code, 200)
+        marked = {item['id']: item['is_favorite'] for item in response.data['results']}
+        self.assertEqual(marked, {self.properties[0].pk: True, self.properties[1].pk: False, self.properties[2].pk: False})
+
+        response = self.client.get(f'/api/properties/{self.properties[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorite'])
+
+    def test_map_points_while_authenticated(self):
+        response = self.client.get('/api/properties/map/', {'bbox': '10,35,11,36'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_map_clusters_while_authenticated(self):
+        response = self.client.get('/api/properties/map/', {'bbox': '10,35,11,36', 'zoom': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(cluster[2] for cluster in response.data['clusters']), 3)
+
+    def test_facets_while_authenticated(self):
+        # Twice: the second response comes from the cache.
+        for _ in range(2):
+            response = self.client.get('/api/properties/facets/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('is_favorite', response.data)
+
+
+class FavoriteWriteTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'secret')
+        cls.property = Property.objects.create(
+            title='Villa', price_value=300000, property_type='Villa', rooms=4, baths=2,
+        )
+
+    def test_add_is_one_insert_and_idempotent(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(favorites.add_favorite(self.user, self.property.pk))
+        self.assertTrue(favorites.add_favorite(self.user, self.property.pk))
+        self.assertEqual(Favorite.objects.filter(user=self.user).count(), 1)
+
+    def test_missing_property_is_refused_without_an_error(self):
+        self.assertFalse(favorites.add_favorite(self.user, self.property.pk + 1))
+        self.assertIsNone(favorites.toggle_favorite(self.user, self.property.pk + 1))
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_toggle(self):
+        self.assertTrue(favorites.toggle_favorite(self.user, self.property.pk))
+        self.assertTrue(Favorite.objects.filter(user=self.user, property=self.property).exists())
+        self.assertFalse(favorites.toggle_favorite(self.user, self.property.pk))
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_missing_property_is_a_404(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.put(f'/api/properties/{self.property.pk + 1}/favorite/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.put(f'/api/properties/{self.property.pk}/favorite/')
+        self.assertEqual(response.data, {'id': self.property.pk, 'isFavorite': True})
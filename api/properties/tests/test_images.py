@@ -0,0 +1,65 @@
+import io
+import tempfile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+from properties.models import Property, PropertyImage
+from properties.serializers import PropertyImageUploadSerializer
+
+GPS_IFD = 0x8825
+
+
+def jpeg_with_gps():
+    exif = Image.Exif()
+    exif[0x010F] = 'CameraMaker'
+    exif.get_ifd(GPS_IFD)[2] = (36.0, 48.0, 0.0)
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), 'white').save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class ImageMetadataTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name, IMAGE_PROCESSING_SYNC=True))
+        self.property = Property.objects.create(
+            title='Maison', price_value=200000, property_type='Maison', rooms=3, baths=1,
+        )
+
+    def upload(self):
+        response = self.client.post(
+            f'/api/properties/{self.property.pk}/upload_image/',
+            {'image': SimpleUploadedFile('photo.jpg', jpeg_with_gps(), content_type='image/jpeg'),
+             'is_primary': 'true'},
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return PropertyImage.objects.get(pk=response.data['id'])
+
+    def test_the_original_is_not_published(self):
+        serializer = PropertyImageUploadSerializer(
+            data={'image': SimpleUploadedFile('photo.jpg', jpeg_with_gps(), content_type='image/jpeg')},
+            context={'property_id': self.property.pk},
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        image = serializer.save()
+        self.assertIsNone(image.image_url)
+        self.property.refresh_from_db()
+        self.assertIsNone(self.property.primary_image_url)
+
+    def test_processed_images_are_served_without_metadata(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.upload()
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, 'done')
+        self.assertEqual(image.image_url, image.variants['full']['jpeg'])
+        self.assertNotEqual(image.image_url, image.image.url)
+        with default_storage.open(image.image_url[len(default_storage.base_url):]) as served:
+            self.assertEqual(len(Image.open(served).getexif()), 0)
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image_url, image.image_url)
+
+        response = self.client.get(f'/api/properties/{self.property.pk}/images/')
+        self.assertNotIn('image', response.data[0])
+        self.assertEqual(response.data[0]['image_url'], image.image_url)
@@ -0,0 +1,12 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class MigrationTests(TestCase):
+    def test_models_and_migrations_agree(self):
+        # Every model change must ship with its migration.
+        try:
+            call_command('makemigrations', check=True, dry_run=True, stdout=StringIO())
+        except SystemExit:
+            self.fail('Models have changes without a migration; run makemigrations')
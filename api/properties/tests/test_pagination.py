@@ -0,0 +1,36 @@
+import base64
+import json
+from django.test import TestCase
+from properties.models import Property
+
+
+def cursor(ordering, position):
+    payload = json.dumps({'o': ordering, 'p': position})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+class CursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(3):
+            Property.objects.create(
+                title=f'Villa {number}', price_value=400000 + number, property_type='Villa', rooms=4, baths=2,
+            )
+
+    def test_next_link_round_trips(self):
+        response = self.client.get('/api/properties/', {'page_size': 2, 'ordering': 'price_value'})
+        self.assertEqual([item['price_value'] for item in response.data['results']], [400000, 400001])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['price_value'] for item in response.data['results']], [400002])
+
+    def test_tampered_cursors_are_not_found(self):
+        for ordering, position in [
+            ('-created_at', ['yesterday', 1]),
+            ('-created_at', [{'a': 1}, 1]),
+            ('price_value', ['cheap', 1]),
+            ('price_value', [400000, None]),
+            ('price_value', [[1], 1]),
+        ]:
+            with self.subTest(ordering=ordering, position=position):
+                response = self.client.get('/api/properties/', {'ordering': ordering, 'cursor': cursor(ordering, position)})
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,56 @@
+from django.test import TestCase
+from properties.benchmarks import uncached_responses
+from properties.models import Agent, Property, PropertyFeature, PropertyImage
+
+
+class QueryCountTests(TestCase):
+    """
+    List and detail run a fixed number of queries however many properties,
+    images, features and agents there are (no N+1). The response cache is
+    bypassed so every request renders.
+    """
+    LIST_QUERIES = 2  # validator token, page (card columns are denormalized)
+    DETAIL_QUERIES = 4  # validator token, property + primary agent, features, images
+
+    def seed(self, count):
+        agents = [Agent.objects.create(name=f'Agent {n}', phone='+216 00 000 000', email=f'agent{n}@example.com')
+                  for n in range(count)]
+        properties = []
+        for n in range(count):
+            property_obj = Property.objects.create(
+                title=f'Maison {count}-{n}', price_value=100000 + n, property_type='Maison', rooms=3, baths=2,
+            )
+            PropertyImage.objects.bulk_create([
+                PropertyImage(property=property_obj, image_url=f'https://img.example.com/{n}/{i}.jpg',
+                              is_primary=i == 0)
+                for i in range(count)
+            ])
+            PropertyFeature.objects.bulk_create([
+                PropertyFeature(property=property_obj, feature=f'Feature {i}') for i in range(count)
+            ])
+            property_obj.agents.add(*agents[:n + 1])
+            properties.append(property_obj)
+        # bulk_create bypasses the signals that keep the card columns current.
+        Property.objects.filter(pk__in=[p.pk for p in properties]).refresh_card_fields()
+        return properties
+
+    def assert_constant_queries(self, count):
+        properties = self.seed(count)
+        with uncached_responses():
+            with self.assertNumQueries(self.LIST_QUERIES):
+                response = self.client.get('/api/properties/')
+            self.assertEqual(response.status_code, 200)
+            self.assertGreaterEqual(len(response.data['results']), count)
+
+            with self.assertNumQueries(self.DETAIL_QUERIES):
+                response = self.client.get(f'/api/properties/{properties[-1].pk}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['images']), count)
+            self.assertEqual(len(response.data['features']), count)
+            self.assertEqual(response.data['agent']['email'], 'agent0@example.com')
+
+    def test_few_properties(self):
+        self.assert_constant_queries(3)
+
+    def test_more_properties(self):
+        self.assert_constant_queries(12)
@@ -0,0 +1,68 @@
+from unittest import mock
+from django.test import TestCase
+from properties import search
+from properties.benchmarks import uncached_responses
+from properties.models import Property, PropertyFeature
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.title_match = Property.objects.create(
+            title='Villa avec piscine', location='Hammamet', price_value=900000, property_type='Villa',
+            rooms=5, baths=3, description='Grand jardin.',
+        )
+        cls.description_match = Property.objects.create(
+            title='Maison familiale', location='Sousse', price_value=400000, property_type='Maison',
+            rooms=4, baths=2, description='Jardin arboré et une petite piscine.',
+        )
+        cls.accented = Property.objects.create(
+            title='Résidence Les Pins', location='La Marsa', price_value=350000, property_type='Appartement',
+            rooms=3, baths=1, description='',
+        )
+
+    def search(self, terms):
+        # Test transactions never commit, so cached listings are never invalidated.
+        with uncached_responses():
+            response = self.client.get('/api/properties/', {'search': terms})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('piscine'), [self.title_match.pk, self.description_match.pk])
+
+    def test_accents_are_ignored_on_both_sides(self):
+        self.assertEqual(self.search('residence'), [self.accented.pk])
+        self.assertEqual(self.search('Hammamét'), [self.title_match.pk])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('piscine sousse'), [self.description_match.pk])
+        self.assertEqual(self.search('piscine marsa'), [])
+
+    def test_feature_changes_refresh_the_document(self):
+        self.assertEqual(self.search('ascenseur'), [])
+        feature = PropertyFeature.objects.create(property=self.accented, feature='Ascenseur')
+        self.assertEqual(self.search('ascenseur'), [self.accented.pk])
+        feature.delete()
+        self.assertEqual(self.search('ascenseur'), [])
+
+    def test_websearch_operators(self):
+        self.assertEqual(self.search('"les pins"'), [self.accented.pk])
+        self.assertEqual(self.search('"pins les"'), [])
+        self.assertEqual(self.search('piscine -sousse'), [self.title_match.pk])
+        self.assertEqual(sorted(self.search('Résidence OR hammamet')), [self.title_match.pk, self.accented.pk])
+        self.assertEqual(search.parse_query('Piscine OR "Les Pins" -Étage'),
+                         [[(False, ['piscine'])], [(False, ['les', 'pins']), (True, ['etage'])]])
+
+    def test_whole_words_match_not_substrings(self):
+        self.assertEqual(self.search('pisc'), [])
+        self.assertEqual(self.search('piscines'), [self.title_match.pk, self.description_match.pk])
+
+    def test_saving_a_property_writes_its_document_in_the_same_update(self):
+        PropertyFeature.objects.create(property=self.accented, feature='Ascenseur')
+        property_obj = Property.objects.get(pk=self.accented.pk)
+        property_obj.title = 'Résidence Jasmin'
+        with mock.patch.object(search, 'refresh_documents') as refresh:
+            property_obj.save()
+        refresh.assert_not_called()
+        self.assertEqual(self.search('jasmin ascenseur'), [self.accented.pk])
@@ -0,0 +1,41 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from properties.models import Property, PropertyChange, PropertyFeature, PropertyImage
+
+
+class PropertyDeleteTests(TestCase):
+    def create(self, children):
+        property_obj = Property.objects.create(
+            title=f'Villa {children}', price_value=500000, property_type='Villa', rooms=5, baths=3,
+        )
+        for number in range(children):
+            PropertyImage.objects.create(property=property_obj, image_url=f'https://img.example.com/{number}.jpg',
+                                         is_primary=number == 0, position=number)
+            PropertyFeature.objects.create(property=property_obj, feature=f'Feature {number}')
+        return property_obj
+
+    def delete_queries(self, property_obj):
+        with CaptureQueriesContext(connection) as queries:
+            property_obj.delete()
+        return len(queries)
+
+    def test_cascaded_children_are_not_refreshed_one_by_one(self):
+        few, many = self.create(1), self.create(6)
+        self.assertEqual(self.delete_queries(few), self.delete_queries(many))
+
+    def test_delete_logs_only_a_tombstone(self):
+        property_obj = self.create(3)
+        last = PropertyChange.objects.order_by('-pk').values_list('pk', flat=True).first()
+        pk = property_obj.pk
+        property_obj.delete()
+        self.assertEqual(
+            list(PropertyChange.objects.filter(pk__gt=last).values_list('property_id', 'action')),
+            [(pk, PropertyChange.DELETE)],
+        )
+
+    def test_deleting_a_child_still_refreshes_the_card(self):
+        property_obj = self.create(2)
+        PropertyFeature.objects.filter(property=property_obj).first().delete()
+        property_obj.refresh_from_db()
+        self.assertEqual(property_obj.feature_count, 1)
@@ -0,0 +1,71 @@
+import fcntl
+import io
+import os
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from PIL import Image
+from properties import uploads
+from properties.models import ImageUpload, Property
+
+
+class StartUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.property = Property.objects.create(
+            title='Terrain', price_value=50000, property_type='Terrain', surface=300,
+        )
+
+    def test_creates_the_staging_directory(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            staging = os.path.join(media_root, 'uploads')
+            with override_settings(IMAGE_UPLOAD_STAGING_DIR=staging):
+                upload = uploads.start_upload(self.property, 'photo.jpg', 1024)
+                self.assertTrue(os.path.isfile(upload.staging_path()))
+
+    def test_failed_staging_file_leaves_no_upload(self):
+        with tempfile.TemporaryDirectory() as staging, override_settings(IMAGE_UPLOAD_STAGING_DIR=staging):
+            with mock.patch('properties.uploads.open', side_effect=OSError('disk full'), create=True):
+                with self.assertRaises(OSError):
+                    uploads.start_upload(self.property, 'photo.jpg', 1024)
+        self.assertFalse(ImageUpload.objects.exists())
+
+
+class AppendChunkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.property = Property.objects.create(
+            title='Terrain', price_value=50000, property_type='Terrain', surface=300,
+        )
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'white').save(buffer, 'PNG')
+        cls.png = buffer.getvalue()
+
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        self.enterContext(override_settings(IMAGE_UPLOAD_STAGING_DIR=staging.name))
+        self.upload = uploads.start_upload(self.property, 'photo.png', len(self.png))
+
+    def append(self, start, data):
+        content_range = f'bytes {start}-{start + len(data) - 1}/{len(self.png)}'
+        return uploads.append_chunk(self.upload.pk, content_range, len(data), io.BytesIO(data))
+
+    def test_chunks_advance_the_offset(self):
+        self.assertEqual(self.append(0, self.png[:20]).received, 20)
+        upload = self.append(20, self.png[20:])
+        self.assertEqual((upload.received, upload.image_format), (len(self.png), 'PNG'))
+        with open(upload.staging_path(), 'rb') as staged:
+            self.assertEqual(staged.read(), self.png)
+        with self.assertRaises(uploads.UploadError) as raised:
+            self.append(0, self.png[:20])
+        self.assertEqual((raised.exception.status, raised.exception.extra), (409, {'offset': len(self.png)}))
+
+    def test_a_chunk_being_written_blocks_a_concurrent_one(self):
+        with open(self.upload.staging_path(), 'r+b') as staged:
+            fcntl.flock(staged, fcntl.LOCK_EX)
+            with self.assertRaises(uploads.UploadError) as raised:
+                self.append(0, self.png[:20])
+        self.assertEqual(raised.exception.status, 409)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.received, 0)
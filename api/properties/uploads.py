@@ -0,0 +1,339 @@
+"""
+Streaming and resumable image uploads.
+
+Both paths write the body to disk as it arrives, in the staging directory
+under MEDIA_ROOT, so saving the final image to storage is a rename rather
+than a copy. The type and dimensions of an image are read from its first
+bytes (see sniff_image), and size limits are enforced before and while the
+body is read. A bad upload is therefore rejected without buffering it.
+
+- upload_image installs StreamingImageUploadHandler in place of Django's
+  memory/temporary-file handlers for its multipart body.
+- Resumable uploads are an ImageUpload session: the client declares the
+  size, PUTs raw chunks with a Content-Range header and asks for the
+  current offset to resume after a dropped connection.
+
+Limits come from IMAGE_UPLOAD_MAX_BYTES, IMAGE_UPLOAD_MAX_PIXELS and
+IMAGE_UPLOAD_CHUNK_MAX_BYTES.
+"""
+import fcntl
+import io
+import os
+import re
+import tempfile
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+from PIL import Image
+from .models import ImageUpload
+
+# Signature -> Pillow format. Only formats the variant pipeline can read.
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+]
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+# JPEG dimensions come after the EXIF block, which can be up to 64KB.
+HEADER_MAX_BYTES = 128 * 1024
+# Allowance for multipart boundaries and the non-file fields.
+MULTIPART_OVERHEAD = 64 * 1024
+READ_CHUNK = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.extra = extra
+
+
+def max_bytes():
+    return settings.IMAGE_UPLOAD_MAX_BYTES
+
+
+def staging_dir():
+    path = settings.IMAGE_UPLOAD_STAGING_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def sniff_image(header, complete=False):
+    """
+    Identify an image from its leading bytes.
+
+    Returns (format, width, height), or None when more bytes are needed.
+    Raises UploadError for anything that is not an acceptable image.
+    """
+    if len(header) < 12 and not complete:
+        return None
+    image_format = None
+    for signature, name in SIGNATURES:
+        if header.startswith(signature):
+            image_format = name
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        image_format = 'WEBP'
+    if image_format is None:
+        raise UploadError('Unsupported image type; upload a JPEG, PNG or WebP file')
+
+    try:
+        # Image.open only parses the header; pixel data is never decoded here.
+        with Image.open(io.BytesIO(header), formats=[image_format]) as image:
+            width, height = image.size
+    except Exception:
+        if complete or len(header) >= HEADER_MAX_BYTES:
+            raise UploadError('The file is not a valid image')
+        return None
+
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise UploadError(
+            f'Image is too large ({width}x{height}); the limit is '
+            f'{settings.IMAGE_UPLOAD_MAX_PIXELS:,} pixels',
+            status=413,
+        )
+    return image_format, width, height
+
+
+def stored_name(filename, image_format):
+    """Client file name with the extension of the detected format."""
+    base = os.path.splitext(os.path.basename(filename))[0] or 'image'
+    return f'{base}.{EXTENSIONS[image_format]}'
+
+
+class StagedUploadedFile(UploadedFile):
+    """
+    An uploaded file that already lives on disk in the staging directory.
+
+    FileSystemStorage moves files that have a temporary_file_path() instead
+    of copying them, and ImageField validation reads them from the path.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # Already moved into storage.
+            pass
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    """
+    Upload handler for the `image` field of upload_image.
+
+    The request is refused from its Content-Length when that is already over
+    the limit. Otherwise chunks go straight to a staging file; the header is
+    checked as soon as enough bytes have arrived and the size on every
+    chunk. A refused upload stops parsing and leaves its reason in `error`.
+    """
+    field_name = 'image'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.image_format = None
+        self.header = b''
+
+    def fail(self, error):
+        self.error = error
+        if getattr(self, 'file', None) is not None:
+            self.file.close()
+            self.file = None
+        raise StopUpload(connection_reset=False)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > max_bytes() + MULTIPART_OVERHEAD:
+            self.error = UploadError(self.too_large_message(), status=413)
+            # Returning data skips parsing, so none of the body is read.
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != self.field_name:
+            return
+        self.file = StagedUploadedFile(
+            tempfile.NamedTemporaryFile(suffix='.upload', dir=staging_dir()),
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra,
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if getattr(self, 'file', None) is None:
+            # Other file fields are ignored.
+            return None
+        if start + len(raw_data) > max_bytes():
+            self.fail(UploadError(self.too_large_message(), status=413))
+        if self.image_format is None:
+            self.header += raw_data[:HEADER_MAX_BYTES - len(self.header)]
+            self.check_header(complete=False)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if getattr(self, 'file', None) is None:
+            return None
+        if self.image_format is None:
+            self.check_header(complete=True)
+        self.file.name = stored_name(self.file_name, self.image_format)
+        self.file.size = file_size
+        self.file.seek(0)
+        return self.file
+
+    def check_header(self, complete):
+        try:
+            sniffed = sniff_image(self.header, complete=complete)
+        except UploadError as e:
+            self.fail(e)
+        if sniffed is not None:
+            self.image_format = sniffed[0]
+            self.header = b''
+
+    def upload_interrupted(self):
+        if getattr(self, 'file', None) is not None:
+            self.file.close()
+
+    def too_large_message(self):
+        return f'File is too large; the limit is {max_bytes() // (1024 * 1024)}MB'
+
+
+# Resumable uploads
+
+def start_upload(property, filename, size, is_primary=False):
+    if not filename:
+        raise UploadError('filename is required')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size must be an integer')
+    if size <= 0:
+        raise UploadError('size must be positive')
+    if size > max_bytes():
+        raise UploadError(
+            f'File is too large; the limit is {max_bytes() // (1024 * 1024)}MB', status=413,
+        )
+    staging_dir()
+    # A staging file that cannot be created rolls the row back with it.
+    with transaction.atomic():
+        upload = ImageUpload.objects.create(
+            property=property, filename=os.path.basename(filename)[:255], size=size, is_primary=is_primary,
+        )
+        # Create the (empty) staging file up front so appends can open it 'r+b'.
+        open(upload.staging_path(), 'wb').close()
+    return upload
+
+
+def parse_content_range(header, content_length):
+    """Parse `bytes start-end/total` and check it against the body length."""
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        raise UploadError('A Content-Range header of the form "bytes start-end/total" is required')
+    start, end, total = (int(value) for value in match.groups())
+    if end < start or end - start + 1 != content_length:
+        raise UploadError('Content-Range does not match the request body length')
+    return start, end, total
+
+
+def append_chunk(upload_id, content_range, content_length, stream):
+    """
+    Write one chunk at its offset and return the updated session.
+
+    Chunks must arrive in order: a chunk that does not start at the current
+    offset is refused with 409 and the offset to resume from. The body is
+    read and written under an exclusive lock on the staging file, outside any
+    transaction, so a slow client holds no database lock; a concurrent chunk
+    for the same upload is refused with 409 rather than waiting for it. The
+    offset is then advanced by one short conditional UPDATE.
+    """
+    if content_length is None:
+        raise UploadError('Content-Length is required', status=411)
+    if content_length > settings.IMAGE_UPLOAD_CHUNK_MAX_BYTES:
+        raise UploadError(
+            f'Chunk is too large; send at most {settings.IMAGE_UPLOAD_CHUNK_MAX_BYTES} bytes per request',
+            status=413,
+        )
+    start, end, total = parse_content_range(content_range, content_length)
+
+    staging_path = ImageUpload(pk=upload_id).staging_path()
+    try:
+        staged = open(staging_path, 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Upload not found', status=404)
+    with staged:
+        try:
+            fcntl.flock(staged, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another chunk of this upload is being written; retry shortly', status=409)
+        # Read under the file lock, so the offset cannot move until we release it.
+        upload = ImageUpload.objects.filter(pk=upload_id).first()
+        if upload is None:
+            raise UploadError('Upload not found', status=404)
+        if total != upload.size:
+            raise UploadError('Content-Range total does not match the declared size')
+        if start != upload.received:
+            raise UploadError('Chunk does not start at the current offset', status=409, offset=upload.received)
+
+        written = 0
+        # Drop whatever an interrupted earlier attempt left past the offset.
+        staged.truncate(start)
+        staged.seek(start)
+        while written < content_length:
+            data = stream.read(min(READ_CHUNK, content_length - written))
+            if not data:
+                break
+            staged.write(data)
+            written += len(data)
+        staged.flush()
+
+        upload.received = start + written
+        try:
+            if not upload.image_format:
+                upload.image_format = check_staged_header(upload)
+        except UploadError as e:
+            rejected = e
+        else:
+            rejected = None
+            # Conditional on the offset we started from: a session that was
+            # discarded or completed meanwhile is left alone.
+            updated = ImageUpload.objects.filter(pk=upload_id, received=start).update(
+                received=upload.received, image_format=upload.image_format, updated_at=timezone.now(),
+            )
+            if not updated:
+                raise UploadError('Upload not found', status=404)
+
+    if rejected is not None:
+        discard_upload(upload)
+        raise rejected
+    if written < content_length:
+        raise UploadError('Request body ended early; resume from the returned offset', offset=upload.received)
+    return upload
+
+
+def check_staged_header(upload):
+    """The detected format once enough of the file has arrived, else ''."""
+    with open(upload.staging_path(), 'rb') as staged:
+        header = staged.read(HEADER_MAX_BYTES)
+    sniffed = sniff_image(header, complete=upload.received >= upload.size)
+    return sniffed[0] if sniffed else ''
+
+
+def staged_file(upload):
+    """The completed upload as a file that storage can move into place."""
+    return StagedUploadedFile(
+        open(upload.staging_path(), 'rb'), stored_name(upload.filename, upload.image_format),
+        content_type=f'image/{upload.image_format.lower()}', size=upload.size,
+    )
+
+
+def discard_upload(upload):
+    try:
+        os.remove(upload.staging_path())
+    except FileNotFoundError:
+        pass
+    upload.delete()
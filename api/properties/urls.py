@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PropertyViewSet, ContactViewSet
+from .views import AgentViewSet, PropertyViewSet, ContactViewSet
 
 router = DefaultRouter()
 router.register(r'properties', PropertyViewSet)
+router.register(r'agents', AgentViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -2,11 +2,51 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Property, PropertyImage
-from .serializers import PropertyListSerializer, PropertyDetailSerializer, PropertyCreateSerializer, PropertyImageSerializer, PropertyImageUploadSerializer
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django_filters.rest_framework import DjangoFilterBackend
+from users.authentication import FreshJWTAuthentication
+from . import agents, bulk, changelog, clusters, favorites, galleries, images, uploads
+from .cache import property_cache
+from .conditional import collection_token, make_etag, not_modified_response, object_token, set_validator_headers
+from .facets import compute_facets
+from .filters import PropertyFilter
+from .geo import BoundsError, haversine_km, parse_bbox, parse_radius, radius_bbox
+from .models import Agent, Favorite, ImageUpload, Property, PropertyImage
+from .pagination import AgentPagination, KeysetPagination, PropertyCursorPagination
+from .serializers import AgentDirectorySerializer, PropertyListSerializer, PropertyDetailSerializer, PropertyCreateSerializer, PropertyImageSerializer, PropertyImageUploadSerializer
+
+MAP_MAX_POINTS = 5000
+# Row errors returned by the import endpoint; the counts are always complete.
+IMPORT_MAX_ERRORS = 1000
+# Bulk writes re-check the admin's account on every request instead of
+# within AUTH_USER_CACHE_TTL.
+ADMIN_AUTHENTICATION = [FreshJWTAuthentication, SessionAuthentication]
 
 class PropertyViewSet(viewsets.ModelViewSet):
     queryset = Property.objects.all()
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = PropertyFilter
+    pagination_class = PropertyCursorPagination
+    
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        if self.action == 'upload_image':
+            # Must be in place before anything reads the body (e.g. the CSRF
+            # check of SessionAuthentication).
+            self.upload_handler = uploads.StreamingImageUploadHandler(request)
+            request.upload_handlers = [self.upload_handler]
+        return drf_request
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            return queryset.for_detail()
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -15,16 +55,287 @@ class PropertyViewSet(viewsets.ModelViewSet):
             return PropertyCreateSerializer
         return PropertyListSerializer
     
-    @action(detail=True, methods=['post'])
+    def list(self, request, *args, **kwargs):
+        return self._conditional_cached_response(
+            request,
+            property_cache.list_key(request),
+            lambda: collection_token(self.filter_queryset(self.get_queryset())),
+            lambda: super(PropertyViewSet, self).list(request, *args, **kwargs),
+            mark=True,
+        )
+    
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        return self._conditional_cached_response(
+            request,
+            property_cache.detail_key(request, pk),
+            lambda: object_token(Property.objects.all(), pk),
+            lambda: super(PropertyViewSet, self).retrieve(request, *args, **kwargs),
+            mark=True,
+        )
+    
+    def _conditional_cached_response(self, request, cache_key, get_token, render, mark=False):
+        """
+        Serve a GET from the response cache and answer conditional requests.
+        
+        On a cache hit the stored validator token is used, so a 304 costs no
+        query at all; on a miss the token comes from one aggregate query and
+        the body is only serialized when the client's copy is stale.
+        
+        Cached bodies are the same for every user. With mark=True (property
+        cards: list and detail) the user's favorites are marked on the way
+        out (properties.favorites) and are part of the ETag.
+        """
+        cached = property_cache.get(cache_key)
+        if cached is not None:
+            token, last_modified = cached['token'], cached['last_modified']
+        else:
+            token, last_modified = get_token()
+        
+        parts = [favorites.favorites_token(request.user)] if mark else []
+        etag = make_etag(request, token, *parts) if token is not None else None
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            patch_vary_headers(not_modified, ('Authorization', 'Cookie'))
+            return not_modified
+        
+        if cached is not None:
+            response = Response(cached['data'], headers={'X-Cache': 'HIT'})
+        else:
+            response = render()
+            property_cache.set(cache_key, {
+                'data': response.data,
+                'token': token,
+                'last_modified': last_modified,
+            })
+            response['X-Cache'] = 'MISS'
+        if mark and response.status_code == status.HTTP_200_OK:
+            response.data = favorites.mark_favorites(response.data, request.user)
+        set_validator_headers(response, etag, last_modified)
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def map(self, request):
+        """
+        Compact marker data for the properties inside a map viewport.
+        
+        Query parameters (one of):
+        - bbox=min_lng,min_lat,max_lng,max_lat
+        - lat=..&lng=..&radius=.. (radius in km)
+        
+        The regular listing filters (type, price_min, ...) also apply.
+        Returns {"results": [[id, lat, lng, price_value, property_type], ...],
+        "truncated": bool}.
+        
+        With zoom=<0..15> the response is {"zoom": z, "clusters": [[lat, lng,
+        count, min_price, max_price], ...]} instead, one entry per grid
+        cell. Unfiltered requests read the pre-aggregated MapCluster rows;
+        filtered ones cluster the matching rows on the fly.
+        """
+        try:
+            if 'bbox' in request.query_params:
+                bounds = parse_bbox(request.query_params['bbox'])
+                center = None
+            elif 'radius' in request.query_params:
+                center = parse_radius(
+                    request.query_params.get('lat'),
+                    request.query_params.get('lng'),
+                    request.query_params.get('radius'),
+                )
+                bounds = radius_bbox(*center)
+            else:
+                raise BoundsError('Either bbox or lat/lng/radius is required')
+            zoom = request.query_params.get('zoom')
+            if zoom is not None:
+                zoom = int(zoom) if zoom.isdigit() else -1
+                if zoom > clusters.MAX_CLUSTER_ZOOM or zoom < 0:
+                    raise BoundsError(f'zoom must be between 0 and {clusters.MAX_CLUSTER_ZOOM}')
+        except BoundsError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        min_lat, min_lng, max_lat, max_lng = bounds
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            lat__range=(min_lat, max_lat),
+            lng__range=(min_lng, max_lng),
+        )
+        return self._conditional_cached_response(
+            request,
+            property_cache.list_key(request, name='map'),
+            lambda: collection_token(queryset),
+            lambda: Response(
+                self._map_points(queryset, center) if zoom is None
+                else self._map_clusters(request, queryset, bounds, zoom)
+            ),
+        )
+    
+    def _map_clusters(self, request, queryset, bounds, zoom):
+        filterset = self.filterset_class(request.query_params, queryset=Property.objects.none())
+        is_filtered = any(name in request.query_params for name in filterset.filters)
+        if is_filtered:
+            rows = queryset.order_by().values_list('lat', 'lng', 'price_value').iterator()
+            return {'zoom': zoom, 'clusters': clusters.aggregate_points(rows, zoom)}
+        return {'zoom': zoom, 'clusters': clusters.clusters_in(bounds, zoom)}
+    
+    def _map_points(self, queryset, center):
+        rows = queryset.order_by().values_list('id', 'lat', 'lng', 'price_value', 'property_type')
+        points = []
+        truncated = False
+        for row in rows.iterator():
+            # The bbox prefilter is a square; drop its corners for radius queries.
+            if center and haversine_km(center[0], center[1], row[1], row[2]) > center[2]:
+                continue
+            if len(points) == MAP_MAX_POINTS:
+                truncated = True
+                break
+            points.append(list(row))
+        return {'results': points, 'truncated': truncated}
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Facet counts for the filter panel, for the current filter set:
+        property types, price buckets, rooms/baths values and top locations.
+        Accepts the same query parameters as the listing.
+        """
+        return self._conditional_cached_response(
+            request,
+            property_cache.list_key(request, name='facets'),
+            lambda: collection_token(self.filter_queryset(self.get_queryset())),
+            lambda: Response(compute_facets(request)),
+        )
+    
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        """
+        Changes since a cursor, for clients keeping a local copy of the
+        listing: ?since=<cursor>&limit=<n>. Start from since=0 and pass the
+        returned cursor next time; see properties.changelog.
+        """
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', settings.PROPERTY_CHANGES_PAGE_SIZE))
+        except ValueError:
+            since = limit = -1
+        if since < 0 or limit < 1:
+            return Response(
+                {"error": "since must be a cursor (a non-negative integer) and limit a positive integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if since and since < changelog.horizon():
+            return Response(
+                {"error": "This cursor has expired; sync again from since=0"},
+                status=status.HTTP_410_GONE
+            )
+        changes, cursor, has_more = changelog.changes_since(
+            since, min(limit, settings.PROPERTY_CHANGES_MAX_PAGE_SIZE),
+        )
+        return Response({'changes': changes, 'cursor': cursor, 'has_more': has_more})
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """Hit/miss/eviction counters of the response cache in this worker process"""
+        return Response({
+            'backend': property_cache.alias,
+            **property_cache.stats.as_dict(),
+        })
+    
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser],
+            authentication_classes=ADMIN_AUTHENTICATION)
+    def bulk_import(self, request):
+        """
+        Import properties from a CSV or JSON Lines request body.
+        
+        The format comes from `?file_format=csv|jsonl` or the Content-Type
+        (text/csv, application/x-ndjson). `?dry_run=true` only validates.
+        Rows are read from the body as it streams in; see properties.bulk.
+        """
+        file_format = request.query_params.get('file_format')
+        if file_format is None:
+            content_type = request.content_type.split(';')[0].strip()
+            file_format = 'jsonl' if content_type in ('application/x-ndjson', 'application/jsonl') else 'csv'
+        if file_format not in bulk.FORMATS:
+            return Response(
+                {"error": f"file_format must be one of: {', '.join(bulk.FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        importer = bulk.BulkImporter(
+            dry_run=request.query_params.get('dry_run', '').lower() == 'true',
+            max_errors=IMPORT_MAX_ERRORS,
+        )
+        # request.stream is read line by line; request.data is never built.
+        lines = bulk.decode_lines(request.stream or [])
+        try:
+            result = importer.run(bulk.read_rows(lines, file_format))
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"error": str(e), **importer.result()}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAdminUser],
+            authentication_classes=ADMIN_AUTHENTICATION)
+    def bulk_export(self, request):
+        """
+        Stream the (filtered) properties as CSV or JSON Lines.
+        
+        Accepts the list filters plus `?file_format=csv|jsonl`; the body is
+        produced batch by batch, in the format bulk_import reads.
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in bulk.FORMATS:
+            return Response(
+                {"error": f"file_format must be one of: {', '.join(bulk.FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            bulk.render_rows(bulk.export_rows(queryset), file_format),
+            content_type='text/csv; charset=utf-8' if file_format == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="properties.{file_format}"'
+        return response
+    
+    @action(detail=True, methods=['post', 'put', 'delete'], permission_classes=[IsAuthenticated])
     def favorite(self, request, pk=None):
-        property = self.get_object()
-        property.is_favorite = not property.is_favorite
-        property.save()
+        """
+        The current user's favorite flag for a property.
+        
+        PUT adds and DELETE removes it (both idempotent, one statement each);
+        POST toggles it.
+        """
+        try:
+            property_id = int(pk)
+        except ValueError:
+            return Response({"error": "Property not found"}, status=status.HTTP_404_NOT_FOUND)
+        
+        if request.method == 'DELETE':
+            favorites.remove_favorite(request.user, property_id)
+            is_favorite = False
+        elif request.method == 'PUT':
+            is_favorite = True if favorites.add_favorite(request.user, property_id) else None
+        else:
+            is_favorite = favorites.toggle_favorite(request.user, property_id)
+        
+        if is_favorite is None:
+            return Response({"error": "Property not found"}, status=status.HTTP_404_NOT_FOUND)
         return Response({
-            'id': property.id,
-            'isFavorite': property.is_favorite
+            'id': property_id,
+            'isFavorite': is_favorite
         })
     
+    @action(detail=False, methods=['get'], url_path='favorites', permission_classes=[IsAuthenticated])
+    def my_favorites(self, request):
+        """The current user's favorite properties, most recently added first."""
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(
+            Favorite.objects.filter(user_id=request.user.pk).select_related('property'), request, view=self,
+        )
+        properties = [favorite.property for favorite in page]
+        serializer = PropertyListSerializer(
+            properties, many=True, context={'favorite_ids': {property.pk for property in properties}},
+        )
+        return paginator.get_paginated_response(serializer.data)
+    
     @action(detail=True, methods=['post'])
     def update_main_image(self, request, pk=None):
         """
@@ -76,40 +387,69 @@ class PropertyViewSet(viewsets.ModelViewSet):
             "images": ["https://example.com/image1.jpg", "https://example.com/image2.jpg", ...]
         }
         In this case, the first image will be set as primary.
+        
+        Images that are already stored under the same URL are kept; see
+        properties.galleries.
         """
         property = self.get_object()
-        images_data = request.data.get('images', [])
+        try:
+            gallery = galleries.parse_gallery(request.data.get('images', []))
+        except galleries.GalleryError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        galleries.replace_galleries({property.pk: gallery})
         
-        if not images_data:
+        # Return updated property with images
+        property = Property.objects.for_detail().get(pk=property.pk)
+        serializer = PropertyDetailSerializer(property)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], url_path='update_images')
+    def update_images_batch(self, request):
+        """
+        Replace the images of several properties in one transaction.
+        
+        Expected payload:
+        {
+            "properties": [
+                {"id": 1, "images": [...]},
+                ...
+            ]
+        }
+        where each `images` list takes the formats of update_images.
+        """
+        items = request.data.get('properties')
+        if not isinstance(items, list) or not items:
             return Response(
-                {"error": "At least one image is required"}, 
+                {"error": "A non-empty properties list is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Delete existing images
-        property.images.all().delete()
-        
-        # Handle different input formats
-        if isinstance(images_data[0], str):
-            # Simple list of URLs
-            for i, url in enumerate(images_data):
-                PropertyImage.objects.create(
-                    property=property,
-                    image_url=url,
-                    is_primary=(i == 0)  # First image is primary
-                )
-        else:
-            # List of objects with image_url and is_primary
-            for image_data in images_data:
-                PropertyImage.objects.create(
-                    property=property,
-                    image_url=image_data.get('image_url'),
-                    is_primary=image_data.get('is_primary', False)
-                )
+        gallery_by_id = {}
+        errors = {}
+        for index, item in enumerate(items):
+            property_id = item.get('id') if isinstance(item, dict) else None
+            if not isinstance(property_id, int):
+                errors[str(index)] = 'Each entry needs an integer id'
+                continue
+            if property_id in gallery_by_id:
+                errors[str(property_id)] = 'Property listed more than once'
+                continue
+            try:
+                gallery_by_id[property_id] = galleries.parse_gallery(item.get('images', []))
+            except galleries.GalleryError as e:
+                errors[str(property_id)] = str(e)
         
-        # Return updated property with images
-        serializer = PropertyDetailSerializer(property)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        missing = set(gallery_by_id) - set(
+            Property.objects.filter(pk__in=list(gallery_by_id)).values_list('pk', flat=True)
+        )
+        for property_id in missing:
+            errors[str(property_id)] = 'Property not found'
+        if errors:
+            # Nothing is written unless every entry is valid.
+            return Response({"error": "Invalid images", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(galleries.replace_galleries(gallery_by_id), status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def upload_image(self, request, pk=None):
@@ -122,6 +462,10 @@ class PropertyViewSet(viewsets.ModelViewSet):
         """
         property = self.get_object()
         
+        # Rejected by StreamingImageUploadHandler while the body was read
+        if 'image' not in request.data and self.upload_handler.error is not None:
+            return self._upload_error(self.upload_handler.error)
+        
         # Check if an image file was provided
         if 'image' not in request.data:
             return Response(
@@ -144,21 +488,139 @@ class PropertyViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             image = serializer.save()
+            # Variants are generated in the background; see properties.images.
+            images.enqueue(image)
             return Response({
                 'id': image.id,
                 'image_url': image.image_url,
-                'is_primary': image.is_primary
+                'is_primary': image.is_primary,
+                'processing_status': image.processing_status
             }, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'], url_path='uploads')
+    def start_upload(self, request, pk=None):
+        """
+        Start a resumable image upload.
+        
+        Expects JSON with `filename`, `size` (bytes) and optionally
+        `is_primary`. The file is then sent with PUT requests to the returned
+        upload URL, each carrying a `Content-Range: bytes start-end/size`
+        header; GET on that URL returns the offset to resume from.
+        """
+        property = self.get_object()
+        try:
+            upload = uploads.start_upload(
+                property,
+                request.data.get('filename'),
+                request.data.get('size'),
+                is_primary=str(request.data.get('is_primary', '')).lower() == 'true',
+            )
+        except uploads.UploadError as e:
+            return self._upload_error(e)
+        return Response({
+            **self._upload_state(upload),
+            'chunk_size': settings.IMAGE_UPLOAD_CHUNK_MAX_BYTES,
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]{36})')
+    def upload_chunk(self, request, pk=None, upload_id=None):
+        """Report (GET), continue (PUT a chunk) or abort (DELETE) a resumable upload."""
+        property = self.get_object()
+        try:
+            upload = ImageUpload.objects.get(pk=upload_id, property=property)
+        except (ImageUpload.DoesNotExist, ValidationError):
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        
+        if request.method == 'GET':
+            return Response(self._upload_state(upload))
+        if request.method == 'DELETE':
+            uploads.discard_upload(upload)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        # The body is read from the stream in pieces, never through request.data.
+        content_length = request.META.get('CONTENT_LENGTH')
+        try:
+            upload = uploads.append_chunk(
+                upload.pk,
+                request.META.get('HTTP_CONTENT_RANGE'),
+                int(content_length) if content_length else None,
+                request.stream,
+            )
+        except uploads.UploadError as e:
+            return self._upload_error(e)
+        
+        if upload.received < upload.size:
+            return Response(self._upload_state(upload))
+        
+        serializer = PropertyImageUploadSerializer(
+            data={'image': uploads.staged_file(upload), 'is_primary': upload.is_primary},
+            context={'property_id': property.id}
+        )
+        if not serializer.is_valid():
+            uploads.discard_upload(upload)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        image = serializer.save()
+        upload.delete()
+        images.enqueue(image)
+        return Response({
+            'id': image.id,
+            'image_url': image.image_url,
+            'is_primary': image.is_primary,
+            'processing_status': image.processing_status
+        }, status=status.HTTP_201_CREATED)
+    
+    def _upload_state(self, upload):
+        return {'upload_id': str(upload.pk), 'offset': upload.received, 'size': upload.size}
+    
+    def _upload_error(self, error):
+        return Response({"error": error.message, **error.extra}, status=error.status)
+    
     @action(detail=True, methods=['get'])
     def images(self, request, pk=None):
         """Get all images for a property"""
+        token, last_modified = object_token(Property.objects.all(), pk)
+        etag = make_etag(request, token, 'images') if token is not None else None
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
         property = self.get_object()
-        images = property.images.all()
+        images = property.images.order_by('-is_primary', 'position', 'id')
         serializer = PropertyImageSerializer(images, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        set_validator_headers(response, etag, last_modified)
+        return response
+
+class AgentViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Agents directory with listing counts, price ranges and top listings
+    (see properties.agents). Responses are cached like the property
+    listing: any property or agent assignment change invalidates them.
+    """
+    queryset = Agent.objects.all()
+    serializer_class = AgentDirectorySerializer
+    pagination_class = AgentPagination
+    
+    def get_queryset(self):
+        return agents.directory(super().get_queryset(), self.request)
+    
+    def paginate_queryset(self, queryset):
+        return agents.attach_top_listings(super().paginate_queryset(queryset), self.request)
+    
+    def get_object(self):
+        return agents.attach_top_listings([super().get_object()], self.request)[0]
+    
+    def list(self, request, *args, **kwargs):
+        cache_key = property_cache.list_key(request, name='agents')
+        cached = property_cache.get(cache_key)
+        if cached is not None:
+            return Response(cached, headers={'X-Cache': 'HIT'})
+        response = super().list(request, *args, **kwargs)
+        property_cache.set(cache_key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
 
 class ContactViewSet(viewsets.ViewSet):
     def create(self, request):
@@ -4,4 +4,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'realestate.settings')
 
-application = get_asgi_application()
+# Set up Django before importing anything that uses models.
+django_application = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+from properties.routing import websocket_urlpatterns  # noqa: E402
+
+# HTTP goes to Django as before; WebSockets carry live property changes
+# (properties.consumers).
+application = ProtocolTypeRouter({
+    'http': django_application,
+    'websocket': AllowedHostsOriginValidator(URLRouter(websocket_urlpatterns)),
+})
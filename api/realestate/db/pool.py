@@ -0,0 +1,240 @@
+"""
+A small thread-safe DB-API connection pool.
+
+Used by the pooled_postgresql database backend, but independent of it: the
+pool only needs a factory that opens a connection, plus optional callables
+that reset a connection before it is reused and check that it is alive.
+
+- Connections are handed out most-recently-used first, so surplus idle
+  connections age out through max_idle.
+- A connection older than max_lifetime is closed instead of being reused,
+  which spreads reconnects out and picks up server-side changes.
+- A connection idle for longer than health_check_interval is checked before
+  being handed out; broken ones are replaced transparently.
+- When max_size connections are in use, callers wait up to `timeout`
+  seconds for one to be released, then get PoolTimeout.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ('connection', 'created_at', 'last_used')
+
+    def __init__(self, connection, created_at):
+        self.connection = connection
+        self.created_at = created_at
+        self.last_used = created_at
+
+
+class ConnectionPool:
+    def __init__(self, max_size=10, max_lifetime=1800, max_idle=300, timeout=10,
+                 health_check_interval=30, reset=None, health_check=None, close=None):
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._reset = reset
+        self._health_check = health_check
+        self._close = close or (lambda connection: connection.close())
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0  # idle + in use + being opened
+        self._waiting = 0
+
+        self.created = 0
+        self.closed = 0
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+        self.health_check_failures = 0
+
+    def acquire(self, factory):
+        """Check out a connection, opening one with factory() if needed."""
+        deadline = time.monotonic() + self.timeout
+        waited = None
+        while True:
+            entry = None
+            with self._cond:
+                self._prune_idle()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f'No database connection available within {self.timeout}s '
+                            f'({self.max_size} in use)'
+                        )
+                    if waited is None:
+                        waited = time.monotonic()
+                        self.wait_count += 1
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                    self._prune_idle()
+                if waited is not None:
+                    elapsed = time.monotonic() - waited
+                    self.wait_time_total += elapsed
+                    self.wait_time_max = max(self.wait_time_max, elapsed)
+                    waited = None
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1  # reserve a slot, open outside the lock
+
+            if entry is None:
+                try:
+                    connection = factory()
+                except BaseException:
+                    self._forget()
+                    raise
+                entry = _Entry(connection, time.monotonic())
+                with self._cond:
+                    self.created += 1
+            elif not self._is_healthy(entry):
+                self._discard(entry.connection)
+                continue
+
+            with self._cond:
+                self._in_use[id(entry.connection)] = entry
+            return entry.connection
+
+    def release(self, connection):
+        """Return a connection; it is closed instead if it is broken or too old."""
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            # Not ours (e.g. opened before a fork); just close it.
+            self._close_quietly(connection)
+            return
+        now = time.monotonic()
+        if now - entry.created_at >= self.max_lifetime:
+            self._discard(connection)
+            return
+        if self._reset is not None:
+            try:
+                self._reset(connection)
+            except Exception:
+                self._discard(connection)
+                return
+        entry.last_used = now
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry.connection)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'size': self._size,
+                'max_size': self.max_size,
+                'waiting': self._waiting,
+                'created': self.created,
+                'closed': self.closed,
+                'wait_count': self.wait_count,
+                'wait_time_total': round(self.wait_time_total, 6),
+                'wait_time_max': round(self.wait_time_max, 6),
+                'timeouts': self.timeouts,
+                'health_check_failures': self.health_check_failures,
+            }
+
+    def _prune_idle(self):
+        """Close idle connections past max_idle/max_lifetime. Caller holds the lock."""
+        now = time.monotonic()
+        keep = deque()
+        stale = []
+        for entry in self._idle:
+            if now - entry.last_used >= self.max_idle or now - entry.created_at >= self.max_lifetime:
+                stale.append(entry)
+            else:
+                keep.append(entry)
+        if stale:
+            self._idle = keep
+            self._size -= len(stale)
+            self.closed += len(stale)
+            for entry in stale:
+                self._close_quietly(entry.connection)
+
+    def _is_healthy(self, entry):
+        if self._health_check is None:
+            return True
+        if time.monotonic() - entry.last_used < self.health_check_interval:
+            return True
+        try:
+            healthy = self._health_check(entry.connection)
+        except Exception:
+            healthy = False
+        if not healthy:
+            with self._cond:
+                self.health_check_failures += 1
+        return healthy
+
+    def _discard(self, connection):
+        self._close_quietly(connection)
+        with self._cond:
+            self.closed += 1
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _close_quietly(self, connection):
+        try:
+            self._close(connection)
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, **options):
+    """The process-wide pool for a database alias, created on first use."""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = ConnectionPool(**options)
+    return pool
+
+
+def pool_stats():
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+def _reset_after_fork():
+    # Sockets inherited from the parent must not be shared with it: drop the
+    # pools without closing their connections (which would end the parent's
+    # sessions) and let the child open its own.
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,92 @@
+"""
+PostgreSQL backend that draws connections from a process-wide pool.
+
+Django opens a connection lazily per thread and closes it at the end of
+each request when CONN_MAX_AGE is 0. This backend turns that "open" into
+a checkout from realestate.db.pool and that "close" into a check-in, so
+requests reuse warm connections without holding one per idle thread. It
+works the same way for the threaded gunicorn workers and for the ASGI
+entry point, where Django runs ORM calls in sync_to_async threads.
+
+Pool settings live under DATABASES[alias]['POOL']:
+
+    MAX_SIZE               connections per process (default 10)
+    MAX_LIFETIME           seconds before a connection is retired (default 1800)
+    MAX_IDLE               seconds an idle connection is kept (default 300)
+    TIMEOUT                seconds to wait for a free connection (default 10)
+    HEALTH_CHECK_INTERVAL  idle seconds after which a connection is pinged
+                           before reuse (default 30)
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from realestate.db.pool import get_pool
+
+POOL_DEFAULTS = {
+    'MAX_SIZE': 10,
+    'MAX_LIFETIME': 1800,
+    'MAX_IDLE': 300,
+    'TIMEOUT': 10,
+    'HEALTH_CHECK_INTERVAL': 30,
+}
+
+
+def _reset(connection):
+    """
+    Leave no transaction or session state behind for the next user: SET
+    parameters, temporary tables, advisory locks, LISTEN registrations and
+    prepared statements all go with DISCARD ALL. Django re-applies its own
+    session settings (time zone, role) whenever it checks a connection out.
+    """
+    if connection.closed:
+        raise ValueError('connection is closed')
+    if connection.info.transaction_status != base.Database.extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    # DISCARD ALL cannot run inside a transaction block.
+    autocommit = connection.autocommit
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('DISCARD ALL')
+    finally:
+        connection.autocommit = autocommit
+
+
+def _health_check(connection):
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    # Do not leave the ping's implicit transaction open.
+    if not connection.autocommit:
+        connection.rollback()
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        options = {**POOL_DEFAULTS, **self.settings_dict.get('POOL', {})}
+        return get_pool(
+            self.alias,
+            max_size=options['MAX_SIZE'],
+            max_lifetime=options['MAX_LIFETIME'],
+            max_idle=options['MAX_IDLE'],
+            timeout=options['TIMEOUT'],
+            health_check_interval=options['HEALTH_CHECK_INTERVAL'],
+            reset=_reset,
+            health_check=_health_check,
+        )
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # The parent sets isolation_level while opening a connection; a pooled
+        # one may be reused without going through that path.
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
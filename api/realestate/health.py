@@ -0,0 +1,30 @@
+import logging
+from django.db import connection
+from django.db.utils import DatabaseError
+from rest_framework import status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from realestate.db.pool import PoolTimeout, pool_stats
+
+logger = logging.getLogger(__name__)
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def health(request):
+    """Liveness/readiness probe: checks the database and reports pool metrics."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        database = 'ok'
+    except (DatabaseError, PoolTimeout):
+        # The endpoint is public: the details (hosts, users) only go to the log.
+        logger.exception('Health check: database unavailable')
+        database = 'unavailable'
+    
+    return Response({
+        'status': 'ok' if database == 'ok' else 'error',
+        'database': database,
+        'pool': pool_stats(),
+    }, status=status.HTTP_200_OK if database == 'ok' else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,382 @@
+"""
+Request-level performance instrumentation.
+
+InstrumentationMiddleware measures every request and tags it with its route:
+"<ViewSet>.<action>" for viewsets (e.g. "PropertyViewSet.list") and
+"<module>.<view>" for function views (e.g. "auth.login_user"). It records:
+
+- wall time;
+- time spent in the database and the number of queries, through an
+  execute wrapper on every connection, so it works without DEBUG;
+- time spent in DRF serializers (serializer.data, including any queries it
+  triggers);
+- response size.
+
+Each response gets a Server-Timing header, which browser dev tools show
+next to the request. Per-route totals are kept in process and exposed in
+the Prometheus text format by the `metrics` view. With several worker
+processes, each one reports its own totals.
+
+A request slower than METRICS_SLOW_REQUEST_MS, or one that runs the same
+statement METRICS_DUPLICATE_QUERY_THRESHOLD or more times (typically an
+N+1 loop), is logged with its slowest or repeated SQL. Only a fraction of
+them (METRICS_LOG_SAMPLE_RATE) is logged, so a hot bad path cannot flood
+the logs.
+
+The middleware is sync and async capable, so async views (login and
+registration) stay async under ASGI. The measurements follow the request
+through a context variable. Query timing works the same way: the wrapper is
+installed on each connection once and charges the request whose context
+runs the query, including the sync_to_async threads of async views.
+
+The per-request cost is a few timer calls per query plus one dict update,
+so this is meant to stay on in production.
+"""
+import contextvars
+import ipaddress
+import logging
+import random
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from realestate.db.pool import pool_stats
+from users.hashing import pool as hashing_pool
+
+logger = logging.getLogger('realestate.performance')
+
+# Upper bounds of the request duration histogram, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# SQL statements shown in a slow-request log entry.
+LOGGED_QUERIES = 5
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RequestMetrics:
+    """What one request spent its time on."""
+    __slots__ = ('db_time', 'query_count', 'queries', 'serializer_time', 'serializing')
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.query_count = 0
+        # sql (with placeholders) -> [executions, total seconds]
+        self.queries = {}
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_time += elapsed
+            self.query_count += 1
+            entry = self.queries.get(sql)
+            if entry is None:
+                self.queries[sql] = [1, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+
+
+def _record_query(execute, sql, params, many, context):
+    # Execute wrapper installed on every connection; outside a request it only
+    # passes the query through.
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install, dispatch_uid='realestate.instrumentation.install')
+
+
+def route_name(request):
+    """Low-cardinality label for the view that handled the request."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view = match.func
+    cls = getattr(view, 'cls', None) or getattr(view, 'view_class', None)
+    actions = getattr(view, 'actions', None)
+    if cls is not None and actions:
+        return f'{cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+    if cls is not None:
+        # @api_view functions become a class named after the function.
+        return f'{cls.__module__.rsplit(".", 1)[-1]}.{cls.__name__}'
+    if hasattr(view, '__name__'):
+        return f'{view.__module__.rsplit(".", 1)[-1]}.{view.__name__}'
+    return match._func_path
+
+
+# Metrics registry
+
+class _RouteStats:
+    __slots__ = ('requests', 'buckets', 'duration', 'db_time', 'queries', 'serializer_time',
+                 'response_bytes', 'slow', 'duplicate')
+
+    def __init__(self):
+        self.requests = {}  # (method, status) -> count
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.duration = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.serializer_time = 0.0
+        self.response_bytes = 0
+        self.slow = 0
+        self.duplicate = 0
+
+
+class MetricsRegistry:
+    """Per-process totals by route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, method, status, duration, metrics, response_bytes, slow, duplicate):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = _RouteStats()
+            key = (method, status)
+            stats.requests[key] = stats.requests.get(key, 0) + 1
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[index] += 1
+                    break
+            stats.duration += duration
+            stats.db_time += metrics.db_time
+            stats.queries += metrics.query_count
+            stats.serializer_time += metrics.serializer_time
+            stats.response_bytes += response_bytes
+            stats.slow += slow
+            stats.duplicate += duplicate
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        """The totals in the Prometheus text exposition format."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+            family('http_requests_total', 'counter', 'Requests by route, method and status.')
+            for route, stats in routes:
+                for (method, status), count in sorted(stats.requests.items()):
+                    lines.append(f'http_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+            family('http_request_duration_seconds', 'histogram', 'Wall time of requests by route.')
+            for route, stats in routes:
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+                total = sum(stats.requests.values())
+                lines.append(f'http_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {total}')
+                lines.append(f'http_request_duration_seconds_sum{{route="{route}"}} {stats.duration:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{route="{route}"}} {total}')
+
+            for name, attribute, help_text, fmt in (
+                ('http_request_db_seconds_total', 'db_time', 'Time spent in database queries.', '.6f'),
+                ('http_request_db_queries_total', 'queries', 'Database queries executed.', 'd'),
+                ('http_request_serializer_seconds_total', 'serializer_time', 'Time spent in serializers.', '.6f'),
+                ('http_response_bytes_total', 'response_bytes', 'Bytes of (non-streaming) response bodies.', 'd'),
+                ('http_slow_requests_total', 'slow', 'Requests over METRICS_SLOW_REQUEST_MS.', 'd'),
+                ('http_duplicate_query_requests_total', 'duplicate', 'Requests that repeated a statement.', 'd'),
+            ):
+                family(name, 'counter', help_text)
+                for route, stats in routes:
+                    lines.append(f'{name}{{route="{route}"}} {getattr(stats, attribute):{fmt}}')
+
+        pools = sorted(pool_stats().items())
+        family('db_pool_connections', 'gauge', 'Pooled database connections by state.')
+        for alias, stats in pools:
+            for state in ('idle', 'in_use'):
+                lines.append(f'db_pool_connections{{alias="{alias}",state="{state}"}} {stats[state]}')
+        family('db_pool_timeouts_total', 'counter', 'Requests for a pooled connection that timed out.')
+        for alias, stats in pools:
+            lines.append(f'db_pool_timeouts_total{{alias="{alias}"}} {stats["timeouts"]}')
+
+        hashing = hashing_pool.stats()
+        family('password_hash_in_flight', 'gauge', 'Password hashes running or queued.')
+        lines.append(f'password_hash_in_flight {hashing["in_flight"]}')
+        family('password_hash_rejected_total', 'counter', 'Logins and registrations refused because the queue was full.')
+        lines.append(f'password_hash_rejected_total {hashing["rejected"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+# Serializer timing
+
+def _instrument_serializers():
+    """Time BaseSerializer.data, which every DRF serializer's .data goes through."""
+    from rest_framework import serializers
+
+    if getattr(serializers.BaseSerializer, '_instrumented', False):
+        return
+    data = serializers.BaseSerializer.data
+
+    def timed_data(self):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            # Outside a request, or nested inside another serializer's .data.
+            return data.fget(self)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return data.fget(self)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics.serializing = False
+
+    serializers.BaseSerializer.data = property(timed_data, doc=data.__doc__)
+    serializers.BaseSerializer._instrumented = True
+
+
+# Middleware
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.enabled = _setting('METRICS_ENABLED', True)
+        self.server_timing = _setting('METRICS_SERVER_TIMING', True)
+        self.slow_seconds = _setting('METRICS_SLOW_REQUEST_MS', 500) / 1000
+        self.duplicate_threshold = _setting('METRICS_DUPLICATE_QUERY_THRESHOLD', 5)
+        self.sample_rate = _setting('METRICS_LOG_SAMPLE_RATE', 0.1)
+        if self.enabled:
+            _instrument_serializers()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        # Connections opened before this module was imported missed the signal.
+        for connection in connections.all():
+            _install(connection)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, metrics, duration):
+        route = route_name(request)
+        response_bytes = 0 if response.streaming else len(response.content)
+        slow = duration >= self.slow_seconds
+        repeated = [
+            (sql, entry) for sql, entry in metrics.queries.items() if entry[0] >= self.duplicate_threshold
+        ]
+        registry.record(
+            route, request.method, response.status_code, duration, metrics, response_bytes, slow, bool(repeated),
+        )
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.query_count} '
+                f'{"query" if metrics.query_count == 1 else "queries"}", '
+                f'serialize;dur={metrics.serializer_time * 1000:.1f}, '
+                f'app;dur={duration * 1000:.1f}'
+            )
+        if (slow or repeated) and random.random() < self.sample_rate:
+            self.log(request, route, duration, metrics, slow, repeated)
+        return response
+
+    def log(self, request, route, duration, metrics, slow, repeated):
+        summary = (
+            f'{request.method} {request.get_full_path()} ({route}): {duration * 1000:.0f} ms, '
+            f'{metrics.query_count} queries in {metrics.db_time * 1000:.0f} ms, '
+            f'serializers {metrics.serializer_time * 1000:.0f} ms'
+        )
+        if slow:
+            slowest = sorted(metrics.queries.items(), key=lambda item: item[1][1], reverse=True)[:LOGGED_QUERIES]
+            logger.warning('Slow request %s\n%s', summary, '\n'.join(
+                f'  {entry[1] * 1000:.1f} ms x{entry[0]}: {sql}' for sql, entry in slowest
+            ))
+        if repeated:
+            logger.warning('Repeated queries in %s\n%s', summary, '\n'.join(
+                f'  x{entry[0]} ({entry[1] * 1000:.1f} ms): {sql}' for sql, entry in repeated
+            ))
+
+
+# Metrics endpoint
+
+def _in_networks(address, setting):
+    return any(address in ipaddress.ip_network(network) for network in _setting(setting, ()))
+
+
+def _client_address(request):
+    """
+    The client's address: REMOTE_ADDR, unless that is a trusted proxy (nginx),
+    in which case the nearest X-Forwarded-For hop not added by a trusted
+    proxy. Hops further left are client-supplied and never believed.
+    """
+    forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    address = None
+    for hop in [request.META.get('REMOTE_ADDR', '')] + forwarded[::-1]:
+        try:
+            address = ipaddress.ip_address(hop)
+        except ValueError:
+            return None
+        if not _in_networks(address, 'TRUSTED_PROXY_NETWORKS'):
+            break
+    return address
+
+
+def _allowed(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    address = _client_address(request)
+    return address is not None and _in_networks(address, 'METRICS_ALLOWED_NETWORKS')
+
+
+def metrics(request):
+    """Per-process request metrics in the Prometheus text format."""
+    if not _allowed(request):
+        return HttpResponseForbidden('Metrics are only served to allowed networks and staff users\n')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,10 +10,19 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-h7^$0!9xb@uy$^&*%^&*%^&*%^&*%^&*%^&*%^&*%^&*%^&*%'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY',
+    'django-insecure-h7^$0!9xb@uy$^&*%^&*%^&*%^&*%^&*%^&*%^&*%^&*%^&*%',
+)
+
+# How the API is served: runserver (development), wsgi or asgi (gunicorn);
+# see entrypoint.sh.
+DJANGO_SERVER = os.environ.get('DJANGO_SERVER', 'runserver')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG also makes Django keep every executed query in memory, so it is only
+# on by default under runserver; DJANGO_DEBUG overrides it either way.
+DEBUG = (os.environ.get('DJANGO_DEBUG') or str(DJANGO_SERVER == 'runserver')).lower() in ('1', 'true', 'yes')
 
 ALLOWED_HOSTS = ['*']
 
@@ -26,11 +36,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'corsheaders',
+    'django_filters',
+    'channels',
     'properties',
     'users',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole middleware stack.
+    'realestate.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -60,19 +74,122 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'realestate.wsgi.application'
+ASGI_APPLICATION = 'realestate.asgi.application'
+
+# Live property changes over WebSockets (properties.events and
+# properties.consumers; ASGI only). The in-memory layer only reaches
+# clients connected to the process that made the change: fine for a single
+# ASGI worker and for tests. With several workers or hosts, set
+# CHANNEL_REDIS_URL (requires the channels-redis package).
+if os.environ.get('CHANNEL_REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.environ['CHANNEL_REDIS_URL']]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+# Each connection sends its pending changes this often, one message per
+# interval; more than PROPERTY_EVENTS_MAX_BATCH changed properties become
+# a single "reload" message.
+PROPERTY_EVENTS_FLUSH_SECONDS = float(os.environ.get('PROPERTY_EVENTS_FLUSH_SECONDS', 0.25))
+PROPERTY_EVENTS_MAX_BATCH = int(os.environ.get('PROPERTY_EVENTS_MAX_BATCH', 100))
+
+# Change feed (/api/properties/changes/, properties.changelog): entries per
+# page by default and at most, and how long `compact_property_changes`
+# keeps tombstones of deleted properties. Clients must sync at least this
+# often to resume from their cursor.
+PROPERTY_CHANGES_PAGE_SIZE = int(os.environ.get('PROPERTY_CHANGES_PAGE_SIZE', 100))
+PROPERTY_CHANGES_MAX_PAGE_SIZE = int(os.environ.get('PROPERTY_CHANGES_MAX_PAGE_SIZE', 1000))
+PROPERTY_CHANGES_TOMBSTONE_DAYS = int(os.environ.get('PROPERTY_CHANGES_TOMBSTONE_DAYS', 30))
 
 # Database
+# With DB_POOL enabled (the default) connections come from an
+# application-owned pool (realestate/db/pooled_postgresql); Django hands
+# them back at the end of every request, so CONN_MAX_AGE must stay 0.
+# Without it, DB_CONN_MAX_AGE keeps per-thread persistent connections.
+DB_POOL = os.environ.get('DB_POOL', 'true').lower() in ('1', 'true', 'yes')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'realestate.db.pooled_postgresql' if DB_POOL else 'django.db.backends.postgresql',
         'NAME': os.environ.get('DB_NAME', 'realestatedb'),
         'USER': os.environ.get('DB_USER', 'postgres'),
         'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
         'HOST': os.environ.get('DB_HOST', 'db'),
         'PORT': '5432',
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'MAX_IDLE': int(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'HEALTH_CHECK_INTERVAL': int(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30)),
+        },
     }
 }
 
+# Cache
+# The property response cache is versioned and invalidated on writes (see
+# properties.cache). Its version counters must be shared by every process
+# serving the API: with a per-process backend, a write only invalidates the
+# worker that handled it and the other workers keep serving stale pages. So
+# the process-local 'locmem' backend is only allowed under runserver; gunicorn
+# (DJANGO_SERVER=wsgi/asgi) defaults to 'db', whose table entrypoint.sh
+# creates with `manage.py createcachetable`. 'redis' needs the redis package
+# and PROPERTY_CACHE_LOCATION=redis://host:6379/1.
+PROPERTY_CACHE_BACKEND = os.environ.get(
+    'PROPERTY_CACHE_BACKEND', 'locmem' if DJANGO_SERVER == 'runserver' else 'db',
+)
+PROPERTY_CACHE_ALIAS = 'properties'
+
+_PROPERTY_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'properties',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('PROPERTY_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'properties')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('PROPERTY_CACHE_LOCATION', 'property_response_cache'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('PROPERTY_CACHE_LOCATION', 'redis://localhost:6379/1'),
+    },
+}
+if PROPERTY_CACHE_BACKEND not in _PROPERTY_CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"Unknown PROPERTY_CACHE_BACKEND '{PROPERTY_CACHE_BACKEND}' (expected {', '.join(_PROPERTY_CACHE_BACKENDS)})"
+    )
+if PROPERTY_CACHE_BACKEND == 'locmem' and DJANGO_SERVER != 'runserver':
+    raise ImproperlyConfigured(
+        f"PROPERTY_CACHE_BACKEND 'locmem' is per process and cannot be used with DJANGO_SERVER={DJANGO_SERVER}: "
+        "choose 'db', 'redis' or 'file'"
+    )
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    PROPERTY_CACHE_ALIAS: {
+        **_PROPERTY_CACHE_BACKENDS[PROPERTY_CACHE_BACKEND],
+        # Entries are invalidated by version, never by age. Redis has no
+        # MAX_ENTRIES: give it a maxmemory with an allkeys-lru policy.
+        'TIMEOUT': None,
+        **({} if PROPERTY_CACHE_BACKEND == 'redis' else {
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('PROPERTY_CACHE_MAX_ENTRIES', 10000)),
+            },
+        }),
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -106,6 +223,41 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploaded image variants (properties/images.py): generated on a background
+# thread pool, or inline after commit when IMAGE_PROCESSING_SYNC is set.
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+IMAGE_PROCESSING_SYNC = os.environ.get('IMAGE_PROCESSING_SYNC', 'false').lower() in ('1', 'true', 'yes')
+
+# Image uploads (properties/uploads.py) are streamed to disk and refused as
+# soon as they exceed these limits. Staged files live under MEDIA_ROOT so
+# moving a finished upload into storage is a rename.
+IMAGE_UPLOAD_MAX_BYTES = int(os.environ.get('IMAGE_UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+IMAGE_UPLOAD_MAX_PIXELS = int(os.environ.get('IMAGE_UPLOAD_MAX_PIXELS', 50_000_000))
+IMAGE_UPLOAD_CHUNK_MAX_BYTES = int(os.environ.get('IMAGE_UPLOAD_CHUNK_MAX_BYTES', 5 * 1024 * 1024))
+IMAGE_UPLOAD_STAGING_DIR = os.path.join(MEDIA_ROOT, 'uploads')
+
+# Request instrumentation (realestate/instrumentation.py): Server-Timing
+# headers, Prometheus metrics at /api/metrics/ and sampled logs of slow
+# requests and repeated queries.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+METRICS_SLOW_REQUEST_MS = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+METRICS_DUPLICATE_QUERY_THRESHOLD = int(os.environ.get('METRICS_DUPLICATE_QUERY_THRESHOLD', 5))
+METRICS_LOG_SAMPLE_RATE = float(os.environ.get('METRICS_LOG_SAMPLE_RATE', 0.1))
+# Besides staff users, only these networks may read the metrics.
+METRICS_ALLOWED_NETWORKS = [
+    network.strip()
+    for network in os.environ.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128').split(',')
+    if network.strip()
+]
+# Reverse proxies (nginx) whose X-Forwarded-For hop is believed when telling
+# where a request came from; empty when the API is reached directly.
+TRUSTED_PROXY_NETWORKS = [
+    network.strip()
+    for network in os.environ.get('TRUSTED_PROXY_NETWORKS', '').split(',')
+    if network.strip()
+]
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -137,13 +289,32 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Bearer tokens are checked first and without a per-request user query
+    # (users/authentication.py). Basic auth is not accepted: it would hash
+    # the password on every request.
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
 }
 
+# Token users are checked against their User row at most this often per
+# process, so deactivations and password changes apply within the TTL.
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 10000))
+
+# Login and registration hash passwords in a bounded pool per process
+# (users/hashing.py): PASSWORD_HASH_WORKERS at once, with at most
+# PASSWORD_HASH_QUEUE more waiting; further attempts get a 503 at once.
+# Under WSGI a waiting login holds a request thread, so by default logins
+# take at most half of the GUNICORN_THREADS; under ASGI waiting is free.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+PASSWORD_HASH_QUEUE = int(os.environ.get(
+    'PASSWORD_HASH_QUEUE',
+    32 if DJANGO_SERVER == 'asgi'
+    else max(0, int(os.environ.get('GUNICORN_THREADS', 4)) // 2 - PASSWORD_HASH_WORKERS),
+))
+
 # JWT Settings
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -0,0 +1,32 @@
+from unittest import mock
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase
+from realestate.db.pooled_postgresql import base as pooled
+
+
+class HealthTests(TestCase):
+    def test_database_errors_are_logged_not_returned(self):
+        error = OperationalError('could not connect to server at "db.internal" as user "admin"')
+        with mock.patch('realestate.health.connection.cursor', side_effect=error):
+            with self.assertLogs('realestate.health', 'ERROR'):
+                response = self.client.get('/api/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['database'], 'unavailable')
+        self.assertNotIn('db.internal', response.content.decode())
+
+
+class PoolResetTests(SimpleTestCase):
+    def connection(self, status):
+        connection = mock.MagicMock(closed=False, autocommit=False)
+        connection.info.transaction_status = status
+        return connection
+
+    def test_discards_session_state_outside_a_transaction(self):
+        extensions = pooled.base.Database.extensions
+        connection = self.connection(extensions.TRANSACTION_STATUS_INTRANS)
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.execute.side_effect = lambda sql: self.assertTrue(connection.autocommit)
+        pooled._reset(connection)
+        connection.rollback.assert_called_once_with()
+        cursor.execute.assert_called_once_with('DISCARD ALL')
+        self.assertFalse(connection.autocommit)
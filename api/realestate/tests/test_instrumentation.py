@@ -0,0 +1,23 @@
+from django.test import TestCase, override_settings
+
+
+@override_settings(METRICS_ALLOWED_NETWORKS=['127.0.0.1/32'], TRUSTED_PROXY_NETWORKS=['172.16.0.0/12'])
+class MetricsAllowlistTests(TestCase):
+    def status(self, remote_addr, forwarded_for=None):
+        headers = {'REMOTE_ADDR': remote_addr}
+        if forwarded_for is not None:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded_for
+        return self.client.get('/api/metrics/', **headers).status_code
+
+    def test_direct_requests_use_the_peer_address(self):
+        self.assertEqual(self.status('127.0.0.1'), 200)
+        self.assertEqual(self.status('203.0.113.9'), 403)
+        # Only a trusted proxy's header is believed.
+        self.assertEqual(self.status('203.0.113.9', '127.0.0.1'), 403)
+
+    def test_proxied_requests_use_the_forwarded_address(self):
+        self.assertEqual(self.status('172.18.0.5', '127.0.0.1'), 200)
+        self.assertEqual(self.status('172.18.0.5', '203.0.113.9'), 403)
+        # A client cannot prepend an allowed address of its own.
+        self.assertEqual(self.status('172.18.0.5', '127.0.0.1, 203.0.113.9'), 403)
+        self.assertEqual(self.status('172.18.0.5', 'not-an-address'), 403)
@@ -2,11 +2,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .health import health
+from .instrumentation import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('properties.urls')),
     path('api/', include('users.urls')),
+    path('api/health/', health, name='health'),
+    path('api/metrics/', metrics, name='metrics'),
 ]
 
 # Serve media files in development
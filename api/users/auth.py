@@ -1,59 +1,115 @@
+"""
+Login and registration.
+
+These are async Django views rather than DRF views (DRF's views are sync
+only). Under ASGI, a request waiting for its password hash (see
+users/hashing.py) then holds no worker thread; under WSGI, Django runs
+them to completion on the request thread as usual. The JSON they return
+matches the rest of the API.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseNotAllowed, JsonResponse
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
-from django.contrib.auth.hashers import make_password
+from . import hashing
+from .authentication import tokens_for
 from .models import User
 from .serializers import UserSerializer
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def register_user(request):
-    data = request.data
-    
-    # Check if username or email already exists
-    if User.objects.filter(username=data.get('username')).exists():
-        return Response({'error': 'Username already exists'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    if User.objects.filter(email=data.get('email')).exists():
-        return Response({'error': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Create user
-    user = User.objects.create(
-        username=data.get('username'),
-        email=data.get('email'),
-        password=make_password(data.get('password'))
-    )
-    
-    # Generate tokens
-    refresh = RefreshToken.for_user(user)
-    
-    # Return user data and tokens
+
+def _error(message, status_code):
+    return JsonResponse({'error': message}, status=status_code)
+
+
+def _busy():
+    response = _error('The server is busy; please retry in a moment', status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _request_data(request):
+    """The JSON body, or form fields for non-JSON requests; None if the JSON is invalid."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+@sync_to_async
+def _create_user(username, email, password):
+    # In its own atomic block, so a clash leaves an enclosing transaction usable.
+    with transaction.atomic():
+        return User.objects.create(username=username, email=email, password=password)
+
+
+def _token_response(user, status_code):
+    refresh = tokens_for(user)
     serializer = UserSerializer(user)
-    return Response({
+    return JsonResponse({
         'user': serializer.data,
         'token': str(refresh.access_token),
         'refresh': str(refresh)
-    }, status=status.HTTP_201_CREATED)
-
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def login_user(request):
-    username = request.data.get('username')
-    password = request.data.get('password')
-    
-    user = authenticate(username=username, password=password)
-    
-    if user is not None:
-        refresh = RefreshToken.for_user(user)
-        serializer = UserSerializer(user)
-        
-        return Response({
-            'user': serializer.data,
-            'token': str(refresh.access_token),
-            'refresh': str(refresh)
-        }, status=status.HTTP_200_OK)
-    else:
-        return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+    }, status=status_code)
+
+
+async def register_user(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _request_data(request)
+    if data is None:
+        return _error('Invalid JSON body', status.HTTP_400_BAD_REQUEST)
+    username, email, password = data.get('username'), data.get('email'), data.get('password')
+    if not username or not email or not password:
+        return _error('Username, email and password are required', status.HTTP_400_BAD_REQUEST)
+
+    try:
+        encoded = await hashing.make_password(password)
+    except hashing.PoolBusy:
+        return _busy()
+
+    # One INSERT; the unique constraints catch duplicates. Which one failed
+    # is only looked up on that (rare) path.
+    try:
+        user = await _create_user(username, email, encoded)
+    except IntegrityError:
+        if await User.objects.filter(username=username).aexists():
+            return _error('Username already exists', status.HTTP_400_BAD_REQUEST)
+        return _error('Email already exists', status.HTTP_400_BAD_REQUEST)
+
+    return _token_response(user, status.HTTP_201_CREATED)
+
+
+async def login_user(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _request_data(request)
+    if data is None:
+        return _error('Invalid JSON body', status.HTTP_400_BAD_REQUEST)
+    username, password = data.get('username'), data.get('password')
+    if not username or not password:
+        return _error('Invalid credentials', status.HTTP_401_UNAUTHORIZED)
+
+    # What authenticate() does with ModelBackend, with the hashing in the pool.
+    user = await User.objects.filter(username=username).afirst()
+    try:
+        valid, outdated = await hashing.check_password(password, user.password if user else None)
+        if valid and outdated:
+            # Upgrade the hash to the current hasher settings.
+            user.password = await hashing.make_password(password)
+            await user.asave(update_fields=['password'])
+    except hashing.PoolBusy:
+        return _busy()
+
+    if not valid or not user.is_active:
+        return _error('Invalid credentials', status.HTTP_401_UNAUTHORIZED)
+    return _token_response(user, status.HTTP_200_OK)
+
+
+# DRF's APIView is csrf_exempt; these take no session either.
+# (Django 4.2's csrf_exempt decorator does not support async views.)
+register_user.csrf_exempt = True
+login_user.csrf_exempt = True
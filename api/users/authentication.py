@@ -0,0 +1,167 @@
+"""
+Stateless JWT authentication.
+
+Tokens issued by tokens_for() carry the user's id, username, is_staff and
+is_superuser. They also carry a fingerprint of the password hash.
+ClaimsJWTAuthentication builds a ClaimsUser from those claims, without
+loading the User row on every request. The row is only needed to notice
+revocation: a deactivated user, a changed password, or changed staff
+flags. It is read through UserCache, a small per-process cache whose
+entries are reloaded after AUTH_USER_CACHE_TTL seconds. A revoked token
+therefore stops working within that time, and a busy user costs one
+primary-key query per TTL per process.
+
+Views choose how fresh the check must be through authentication_classes:
+- ClaimsJWTAuthentication is the default;
+- FreshJWTAuthentication reloads the row on every request, for sensitive
+  endpoints;
+- simplejwt's JWTAuthentication returns the real User model instance.
+ClaimsUser.user gives views the full (cached) row when they really need
+it.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+PASSWORD_CLAIM = 'pwd'
+FLAG_CLAIMS = ('is_staff', 'is_superuser')
+
+
+def password_fingerprint(user):
+    """Short digest of the password hash; changes whenever the password does."""
+    return hashlib.sha256(user.password.encode('utf-8')).hexdigest()[:16]
+
+
+def tokens_for(user):
+    """A refresh token (and through it, access tokens) carrying the user's claims."""
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.get_username()
+    for claim in FLAG_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    refresh[PASSWORD_CLAIM] = password_fingerprint(user)
+    return refresh
+
+
+class UserCache:
+    """
+    Thread-safe LRU of User rows by pk, each trusted for `ttl` seconds.
+    A missing user is cached too (as None), so a token for a deleted user
+    is not a query per request.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id, ttl):
+        # Token claims hold the id as a string; signals give the pk itself.
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[0] < ttl:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        user = get_user_model().objects.filter(pk=user_id).first()
+        with self._lock:
+            self._entries[user_id] = (now, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return user
+
+    def evict(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000))
+
+
+def _evict_user(sender, instance, **kwargs):
+    # Changes made in this process apply at once; other processes wait for the TTL.
+    user_cache.evict(instance.pk)
+
+
+post_save.connect(_evict_user, sender=settings.AUTH_USER_MODEL, dispatch_uid='users.authentication.evict_user')
+post_delete.connect(_evict_user, sender=settings.AUTH_USER_MODEL, dispatch_uid='users.authentication.evict_user_delete')
+
+
+class ClaimsUser(TokenUser):
+    """
+    A user built from token claims. `user` is the full User row, read
+    through the cache; it is a copy, so it can be modified and saved.
+    """
+
+    def __init__(self, token, row):
+        super().__init__(token)
+        self._row = row
+
+    @cached_property
+    def id(self):
+        return self._row.pk
+
+    @cached_property
+    def username(self):
+        # Tokens issued before the claims existed fall back to the row.
+        return self.token.get('username', self._row.get_username())
+
+    @cached_property
+    def is_staff(self):
+        return self.token.get('is_staff', self._row.is_staff)
+
+    @cached_property
+    def is_superuser(self):
+        return self.token.get('is_superuser', self._row.is_superuser)
+
+    @property
+    def user(self):
+        return copy.copy(self._row)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the token's claims, with cached revocation checks."""
+
+    def max_age(self):
+        return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        row = user_cache.get(user_id, self.max_age())
+        if row is None or not row.is_active:
+            raise AuthenticationFailed('User not found or inactive', code='user_inactive')
+        if PASSWORD_CLAIM in validated_token and validated_token[PASSWORD_CLAIM] != password_fingerprint(row):
+            raise AuthenticationFailed('The password has changed; log in again', code='token_revoked')
+        for claim in FLAG_CLAIMS:
+            if claim in validated_token and validated_token[claim] != getattr(row, claim):
+                raise AuthenticationFailed('Permissions have changed; log in again', code='token_revoked')
+        return ClaimsUser(validated_token, row)
+
+
+class FreshJWTAuthentication(ClaimsJWTAuthentication):
+    """ClaimsJWTAuthentication that reloads the user on every request."""
+
+    def max_age(self):
+        return 0
@@ -0,0 +1,111 @@
+"""
+Password hashing off the request path.
+
+Checking or creating a password runs the configured hasher (PBKDF2 by
+default), which is deliberately slow. Run on the request worker, a burst
+of logins ties up every worker and property browsing stalls behind it.
+
+HashingPool runs the hashing in a few dedicated threads instead:
+- the async login and register views await the result without blocking
+  the event loop (ASGI) or holding up other requests;
+- at most PASSWORD_HASH_WORKERS hashes run at once, leaving the remaining
+  CPU to other requests;
+- at most PASSWORD_HASH_QUEUE more may wait. Past that, submit() raises
+  PoolBusy and the view answers 503 right away instead of queueing
+  without limit.
+
+Threads are enough: hashlib's PBKDF2 (like the bcrypt and argon2
+libraries) releases the GIL while it hashes, so the hashes run in
+parallel with each other and with Python code in other threads. A process
+pool would also have to set up Django in every child.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PoolBusy(Exception):
+    """Raised when the pool already has its maximum of queued hashes."""
+
+
+class HashingPool:
+    """A bounded thread pool for password hashing."""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+        self._rejected = 0
+
+    def _get_executor(self):
+        # Created on first use, so each gunicorn worker starts its own
+        # threads even if the app was imported before forking.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            return self._executor
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args); returns a concurrent.futures.Future."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PoolBusy()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self._in_flight,
+                'rejected': self._rejected,
+            }
+
+
+pool = HashingPool(getattr(settings, 'PASSWORD_HASH_WORKERS', 1), getattr(settings, 'PASSWORD_HASH_QUEUE', 1))
+
+
+def _check(password, encoded):
+    if encoded is None:
+        # Unknown user: hash anyway, so the response time does not tell
+        # which usernames exist (as ModelBackend does).
+        hashers.make_password(password)
+        return False, False
+    outdated = []
+    valid = hashers.check_password(password, encoded, setter=lambda raw: outdated.append(True))
+    return valid, bool(outdated)
+
+
+async def check_password(password, encoded):
+    """
+    (valid, outdated) for a raw password against an encoded one; pass
+    encoded=None for an unknown user. `outdated` means the hash uses an old
+    hasher or iteration count and should be replaced.
+    """
+    return await pool.run(_check, password, encoded)
+
+
+async def make_password(password):
+    return await pool.run(hashers.make_password, password)
@@ -0,0 +1,57 @@
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from users.authentication import (
+    ClaimsJWTAuthentication, ClaimsUser, FreshJWTAuthentication, tokens_for, user_cache,
+)
+from users.models import User
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='amira', email='amira@example.com', password='secret-1')
+        self.header = f'Bearer {tokens_for(self.user).access_token}'
+
+    def authenticate(self, authentication=ClaimsJWTAuthentication):
+        request = APIRequestFactory().get('/api/properties/', HTTP_AUTHORIZATION=self.header)
+        user, _ = authentication().authenticate(request)
+        return user
+
+    def test_user_comes_from_the_claims(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.id, user.username, user.is_staff), (self.user.pk, 'amira', False))
+
+    def test_password_change_revokes_the_token(self):
+        self.authenticate()
+        self.user.set_password('secret-2')
+        self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, 'password has changed'):
+            self.authenticate()
+
+    def test_deactivated_and_deleted_users_are_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_staff_flag_change_revokes_the_token(self):
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, 'Permissions have changed'):
+            self.authenticate()
+
+    @override_settings(AUTH_USER_CACHE_TTL=3600)
+    def test_changes_from_other_processes_wait_for_the_ttl(self):
+        self.authenticate()
+        # A queryset update sends no signal, like a write made by another process.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.authenticate().id, self.user.pk)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(FreshJWTAuthentication)
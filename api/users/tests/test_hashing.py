@@ -0,0 +1,51 @@
+import threading
+from unittest import mock
+from django.test import TestCase
+from users import hashing
+from users.models import User
+
+
+class HashingPoolTests(TestCase):
+    def test_rejects_past_workers_plus_queue(self):
+        pool = hashing.HashingPool(workers=1, queue_size=1)
+        release = threading.Event()
+        running = pool.submit(release.wait)
+        queued = pool.submit(lambda: 'done')
+        with self.assertRaises(hashing.PoolBusy):
+            pool.submit(lambda: 'refused')
+        self.assertEqual(pool.stats()['in_flight'], 2)
+        self.assertEqual(pool.stats()['rejected'], 1)
+
+        release.set()
+        running.result(timeout=5)
+        self.assertEqual(queued.result(timeout=5), 'done')
+        # Finished hashes free their slots.
+        self.assertEqual(pool.submit(lambda: 'again').result(timeout=5), 'again')
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='amira', email='amira@example.com', password='secret-1')
+
+    def login(self, password):
+        return self.client.post('/api/auth/login/', {'username': 'amira', 'password': password},
+                                content_type='application/json')
+
+    def test_login_and_register(self):
+        self.assertEqual(self.login('secret-1').status_code, 200)
+        self.assertEqual(self.login('wrong').status_code, 401)
+        response = self.client.post('/api/auth/register/', {'username': 'amira', 'email': 'other@example.com',
+                                                             'password': 'secret-2'}, content_type='application/json')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Username already exists'}))
+
+    def test_saturated_pool_answers_503_with_retry_after(self):
+        release = threading.Event()
+        busy = hashing.HashingPool(workers=1, queue_size=0)
+        busy.submit(release.wait)
+        try:
+            with mock.patch.object(hashing, 'pool', busy):
+                response = self.login('secret-1')
+        finally:
+            release.set()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
@@ -6,7 +6,7 @@ import { Label } from "../ui/label";
 import { Card } from "../ui/card";
 import { AlertCircle, X, Upload, Image as ImageIcon } from "lucide-react";
 import { Alert, AlertDescription } from "../ui/alert";
-import { Property, updatePropertyMainImage, updatePropertyImages } from "@/services/api";
+import { Property, updatePropertyMainImage, updatePropertyImages, uploadPropertyImage } from "@/services/api";
 
 interface PropertyImageManagerProps {
   property: Property;
@@ -21,6 +21,7 @@ const PropertyImageManager = ({ property, onSuccess }: PropertyImageManagerProps
   const [error, setError] = useState<string | null>(null);
   const [imageError, setImageError] = useState<string | null>(null);
   const [successMessage, setSuccessMessage] = useState<string | null>(null);
+  const [uploadProgress, setUploadProgress] = useState<number | null>(null);
 
   useEffect(() => {
     if (property) {
@@ -127,6 +128,37 @@ const PropertyImageManager = ({ property, onSuccess }: PropertyImageManagerProps
     }
   };
 
+  const handleFileUpload = async (e: React.ChangeEvent<HTMLInputElement>) => {
+    const file = e.target.files?.[0];
+    e.target.value = "";
+    if (!file) return;
+
+    setLoading(true);
+    setError(null);
+    setImageError(null);
+    setSuccessMessage(null);
+    setUploadProgress(0);
+
+    try {
+      const result = await uploadPropertyImage(
+        property.id,
+        file,
+        previewImages.length === 0,
+        (sent, total) => setUploadProgress(Math.round((sent / total) * 100))
+      );
+      if (result) {
+        setPreviewImages(prev => [...prev, result.image_url]);
+        setSuccessMessage("Image uploaded successfully");
+        if (onSuccess) onSuccess();
+      } else {
+        setError("Failed to upload image. Please try again.");
+      }
+    } finally {
+      setLoading(false);
+      setUploadProgress(null);
+    }
+  };
+
   const handleUpdateAllImages = async () => {
     setLoading(true);
     setError(null);
@@ -202,6 +234,20 @@ const PropertyImageManager = ({ property, onSuccess }: PropertyImageManagerProps
           />
         </div>
 
+        <div>
+          <Label htmlFor="imageFile">Upload Image From Device</Label>
+          <Input
+            id="imageFile"
+            type="file"
+            accept="image/jpeg,image/png,image/webp"
+            onChange={handleFileUpload}
+            disabled={loading}
+          />
+          {uploadProgress !== null && (
+            <p className="text-sm text-gray-500 mt-1">Uploading... {uploadProgress}%</p>
+          )}
+        </div>
+
         {imageError && (
           <Alert variant="destructive">
             <AlertCircle className="h-4 w-4" />
@@ -2,10 +2,37 @@ import { useState, useEffect } from "react";
 import {
   getProperties,
   getProperty,
+  subscribeToPropertyChanges,
   toggleFavorite,
   Property,
+  PropertyChange,
 } from "@/services/api";
 
+// Apply pushed changes to the loaded list instead of refetching it.
+const applyChanges = (properties: Property[], changes: PropertyChange[]): Property[] => {
+  let next = properties;
+  for (const change of changes) {
+    const id = change.id;
+    const index = next.findIndex((property) => String(property.id) === id);
+    if (change.event === "created" || change.event === "updated") {
+      if (index >= 0) {
+        // Pushed cards carry no per-user favorite state; keep ours.
+        next = next.map((property, i) =>
+          i === index ? { ...change.property, isFavorite: property.isFavorite } : property,
+        );
+      } else if (change.event === "created") {
+        next = [change.property, ...next];
+      }
+    } else if (change.event === "deleted" || change.event === "removed") {
+      if (index >= 0) next = next.filter((_, i) => i !== index);
+    } else if (index >= 0) {
+      const isFavorite = change.event === "favorited";
+      next = next.map((property, i) => (i === index ? { ...property, isFavorite } : property));
+    }
+  }
+  return next;
+};
+
 export const useProperties = () => {
   const [properties, setProperties] = useState<Property[]>([]);
   const [loading, setLoading] = useState(true);
@@ -70,6 +97,13 @@ export const useProperties = () => {
 
   useEffect(() => {
     fetchProperties();
+    // Live updates replace polling: patch the list, refetch only on "reload".
+    return subscribeToPropertyChanges({}, {
+      onChanges: (changes) => setProperties((prev) => applyChanges(prev, changes)),
+      onReload: () => {
+        fetchProperties().catch(() => undefined);
+      },
+    });
   }, []);
 
   return {
@@ -43,10 +43,16 @@ export interface Property {
 }
 
 export interface Agent {
+  id?: number;
   name: string;
   phone: string;
   email: string;
   image: string;
+  // Agents directory only (GET /agents/)
+  listing_count?: number;
+  price_min?: number | null;
+  price_max?: number | null;
+  top_listings?: Property[];
 }
 
 export interface User {
@@ -63,17 +69,51 @@ export interface ContactForm {
   message: string;
 }
 
+// Listing cards as the API sends them (snake_case, optional fields).
+const normalizeProperty = (property: Property): Property => {
+  // Ensure priceValue is a number
+  let priceValue = property.priceValue;
+  
+  // If priceValue is missing or not a number, try to extract it from price string
+  if (typeof priceValue !== 'number' && property.price) {
+    const priceMatch = property.price.match(/\d+/g);
+    if (priceMatch) {
+      priceValue = parseInt(priceMatch.join(''), 10);
+    } else {
+      priceValue = 0;
+    }
+  }
+  
+  return {
+    ...property,
+    priceValue: priceValue || 0,
+    beds: property.beds || 0,
+    baths: property.baths || 0,
+    sqft: property.sqft || 0,
+    type: property.type || "Unknown",
+    isFavorite: (property as Property & { is_favorite?: boolean }).is_favorite || property.isFavorite || false
+  };
+};
+
 // Properties API
 export const getProperties = async (): Promise<Property[]> => {
   try {
     console.log(`Fetching properties from ${API_URL}/properties/`);
-    const response = await fetch(`${API_URL}/properties/`, {
+    const token = localStorage.getItem("authToken");
+    const fetchList = (withToken: boolean) => fetch(`${API_URL}/properties/`, {
       method: 'GET',
       headers: {
         'Accept': 'application/json',
         'Content-Type': 'application/json',
+        // Lets the API mark the signed-in user's favorites.
+        ...(withToken && token ? { 'Authorization': `Bearer ${token}` } : {}),
       },
     });
+    let response = await fetchList(true);
+    if (response.status === 401 && token) {
+      // Expired token: the listing itself is public.
+      response = await fetchList(false);
+    }
     
     if (!response.ok) {
       const errorText = await response.text().catch(() => 'No error text available');
@@ -82,34 +122,13 @@ export const getProperties = async (): Promise<Property[]> => {
       throw new Error(`Failed to fetch properties: ${response.status} ${response.statusText}`);
     }
     
-    const data = await response.json();
+    const payload = await response.json();
+    // The listing is keyset-paginated: { next, results }
+    const data = Array.isArray(payload) ? payload : payload.results;
     console.log(`Successfully fetched ${data.length} properties`);
     
     // Normalize the data
-    const normalizedData = data.map((property: Property) => {
-      // Ensure priceValue is a number
-      let priceValue = property.priceValue;
-      
-      // If priceValue is missing or not a number, try to extract it from price string
-      if (typeof priceValue !== 'number' && property.price) {
-        const priceMatch = property.price.match(/\d+/g);
-        if (priceMatch) {
-          priceValue = parseInt(priceMatch.join(''), 10);
-        } else {
-          priceValue = 0;
-        }
-      }
-      
-      return {
-        ...property,
-        priceValue: priceValue || 0,
-        beds: property.beds || 0,
-        baths: property.baths || 0,
-        sqft: property.sqft || 0,
-        type: property.type || "Unknown",
-        isFavorite: property.isFavorite || false
-      };
-    });
+    const normalizedData = data.map(normalizeProperty);
     
     console.log("Normalized property data:", normalizedData);
     return normalizedData;
@@ -157,12 +176,20 @@ export const toggleFavorite = async (
   id: string,
 ): Promise<{ id: string; isFavorite: boolean } | null> => {
   try {
+    // Favorites are per user, so the request must be authenticated.
+    const token = localStorage.getItem("authToken");
+    if (!token) {
+      console.error("Authentication required for favorites");
+      throw new Error("Authentication required");
+    }
+
     console.log(`Toggling favorite for property ${id}`);
     const response = await fetch(`${API_URL}/properties/${id}/favorite/`, {
       method: "POST",
       headers: {
         "Accept": "application/json",
         "Content-Type": "application/json",
+        "Authorization": `Bearer ${token}`,
       },
     });
     
@@ -284,28 +311,117 @@ export const deleteProperty = async (id: string): Promise<boolean> => {
 export const getAgents = async (): Promise<Agent[]> => {
   try {
     console.log(`Fetching agents from ${API_URL}/agents/`);
-    const response = await fetch(`${API_URL}/agents/`, {
-      method: 'GET',
-      headers: {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-      },
-    });
-    
-    if (!response.ok) {
-      console.error(`API error: ${response.status} ${response.statusText}`);
-      throw new Error(`Failed to fetch agents: ${response.status} ${response.statusText}`);
+    // The directory is keyset-paginated: { next, results }; follow it to the end.
+    const agents: Agent[] = [];
+    let url: string | null = `${API_URL}/agents/?page_size=100`;
+    while (url) {
+      const response = await fetch(url, {
+        method: 'GET',
+        headers: {
+          'Accept': 'application/json',
+          'Content-Type': 'application/json',
+        },
+      });
+      
+      if (!response.ok) {
+        console.error(`API error: ${response.status} ${response.statusText}`);
+        throw new Error(`Failed to fetch agents: ${response.status} ${response.statusText}`);
+      }
+      
+      const page = await response.json();
+      agents.push(
+        ...page.results.map((agent: Agent) => ({
+          ...agent,
+          top_listings: agent.top_listings?.map(normalizeProperty),
+        }))
+      );
+      url = page.next;
     }
-    
-    const data = await response.json();
-    console.log(`Successfully fetched ${data.length} agents`);
-    return data;
+    console.log(`Successfully fetched ${agents.length} agents`);
+    return agents;
   } catch (error) {
     console.error("Error fetching agents:", error);
     return [];
   }
 };
 
+// Live property changes (WebSocket, see api/properties/consumers.py)
+export type PropertyChange =
+  | { event: "created" | "updated"; id: string; property: Property }
+  | { event: "deleted" | "removed" | "favorited" | "unfavorited"; id: string };
+
+export interface PropertyChangeHandlers {
+  // Batches of changes, at most a few per second.
+  onChanges: (changes: PropertyChange[]) => void;
+  // Too many changes to list (e.g. a bulk import): fetch the list again.
+  onReload: () => void;
+}
+
+// Listing filters (same names as the list endpoint, except search) and/or
+// a map viewport "min_lng,min_lat,max_lng,max_lat".
+export interface PropertySubscription {
+  filters?: Record<string, string | number | string[]>;
+  bbox?: string;
+}
+
+// Subscribe to changes of the properties matching `subscription`; returns
+// a function that closes the connection. Reconnects after network errors
+// and asks for a reload then, since changes may have been missed.
+export const subscribeToPropertyChanges = (
+  subscription: PropertySubscription,
+  handlers: PropertyChangeHandlers,
+): (() => void) => {
+  const url = `${API_URL.replace(/^http/, "ws")}/ws/properties/`;
+  let socket: WebSocket | null = null;
+  let closed = false;
+  let retryDelay = 1000;
+  let reconnecting = false;
+
+  const connect = () => {
+    socket = new WebSocket(url);
+    socket.onopen = () => {
+      retryDelay = 1000;
+      const token = localStorage.getItem("authToken");
+      if (token) {
+        // Favorite changes of the signed-in user.
+        socket?.send(JSON.stringify({ action: "authenticate", token }));
+      }
+      socket?.send(JSON.stringify({ action: "subscribe", ...subscription }));
+      if (reconnecting) {
+        handlers.onReload();
+      }
+    };
+    socket.onmessage = (message) => {
+      const data = JSON.parse(message.data);
+      if (data.type === "changes") {
+        handlers.onChanges(
+          data.changes.map((change: PropertyChange) =>
+            "property" in change
+              ? { ...change, id: String(change.id), property: normalizeProperty(change.property) }
+              : { ...change, id: String(change.id) },
+          ),
+        );
+      } else if (data.type === "reload") {
+        handlers.onReload();
+      } else if (data.type === "error") {
+        console.error("Live property updates:", data.error);
+      }
+    };
+    socket.onclose = () => {
+      if (closed) return;
+      reconnecting = true;
+      setTimeout(connect, retryDelay);
+      retryDelay = Math.min(retryDelay * 2, 30000);
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    socket?.close();
+  };
+};
+
 // Authentication API
 export const registerUser = async (
   username: string,
@@ -466,3 +582,81 @@ export const updatePropertyImages = async (
     return null;
   }
 };
+
+export interface UploadedImage {
+  id: number;
+  image_url: string;
+  is_primary: boolean;
+  processing_status: string;
+}
+
+// Resumable upload: the file is sent in chunks and, after a dropped
+// connection, resumed from the offset the server reports.
+export const uploadPropertyImage = async (
+  id: string,
+  file: File,
+  isPrimary: boolean,
+  onProgress?: (sent: number, total: number) => void,
+  maxRetries = 3
+): Promise<UploadedImage | null> => {
+  try {
+    const token = localStorage.getItem("authToken");
+    if (!token) {
+      console.error("Authentication required for uploading property images");
+      throw new Error("Authentication required");
+    }
+    const headers = { "Accept": "application/json", "Authorization": `Bearer ${token}` };
+
+    const start = await fetch(`${API_URL}/properties/${id}/uploads/`, {
+      method: "POST",
+      headers: { ...headers, "Content-Type": "application/json" },
+      body: JSON.stringify({ filename: file.name, size: file.size, is_primary: isPrimary }),
+    });
+    if (!start.ok) {
+      const error = await start.json().catch(() => ({}));
+      throw new Error(error.error || `Failed to start upload: ${start.status} ${start.statusText}`);
+    }
+    const session = await start.json();
+    const uploadUrl = `${API_URL}/properties/${id}/uploads/${session.upload_id}/`;
+
+    let offset: number = session.offset;
+    let retries = 0;
+    while (true) {
+      const end = Math.min(offset + session.chunk_size, file.size);
+      let response: Response;
+      try {
+        response = await fetch(uploadUrl, {
+          method: "PUT",
+          headers: {
+            ...headers,
+            "Content-Type": "application/octet-stream",
+            "Content-Range": `bytes ${offset}-${end - 1}/${file.size}`,
+          },
+          body: file.slice(offset, end),
+        });
+      } catch (networkError) {
+        if (++retries > maxRetries) throw networkError;
+        // Ask the server how much it has and continue from there.
+        const state = await fetch(uploadUrl, { headers }).then((r) => r.json());
+        offset = state.offset;
+        continue;
+      }
+
+      const data = await response.json();
+      if (response.status === 201) {
+        onProgress?.(file.size, file.size);
+        console.log(`Successfully uploaded image for property ${id}`);
+        return data;
+      }
+      if (response.status === 409 || (response.ok && typeof data.offset === "number")) {
+        offset = data.offset;
+        onProgress?.(offset, file.size);
+        continue;
+      }
+      throw new Error(data.error || `Failed to upload image: ${response.status} ${response.statusText}`);
+    }
+  } catch (error) {
+    console.error(`Error uploading image for property ${id}:`, error);
+    return null;
+  }
+};